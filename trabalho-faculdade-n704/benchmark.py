@@ -0,0 +1,263 @@
+"Benchmarks do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Gera acervos e históricos sintéticos e mede as operações principais, com saída em JSON"
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from biblioteca import Biblioteca, calcular_estatisticas_livros, criar_biblioteca
+
+
+PALAVRAS = ("amor", "tempo", "casa", "noite", "mar", "sertão", "cidade", "memórias", "guerra", "sonho",
+            "caminho", "vento", "rio", "estrela", "jardim", "segredo", "ilha", "fogo", "viagem", "coração",
+            "ficção", "sombra", "história", "porto", "céu", "silêncio", "máquina", "reino", "lua", "pedra")
+NOMES = ("Ana", "Bruno", "Carla", "Davi", "Elisa", "Fábio", "Gabriela", "Heitor", "Iara", "João",
+         "Lúcia", "Mateus", "Nair", "Otávio", "Paula", "Raul", "Sofia", "Tiago", "Vera", "Yuri")
+SOBRENOMES = ("Silva", "Souza", "Costa", "Oliveira", "Pereira", "Lima", "Carvalho", "Ribeiro", "Almeida",
+              "Gomes", "Martins", "Araújo", "Barbosa", "Rocha", "Dias", "Moreira", "Cardoso", "Teixeira")
+CATEGORIAS = ("Ficção", "Ficção Científica", "Fantasia", "Romance", "Literatura Brasileira", "Poesia",
+              "História", "Biografia", "Filosofia", "Ciências", "Tecnologia", "Infantil", "Suspense",
+              "Terror", "Autoajuda", "Religião", "Arte", "Culinária", "Viagem", "Economia")
+# Formatos de arquivo medidos em salvar_dados, carregar_dados e no tempo até o primeiro menu
+FORMATOS = ('json', 'jsonl', 'bin', 'seg')
+
+
+def gerar_catalogo(quantidade: int, semente: int = 42) -> List[Tuple[str, str, int, str]]:
+    "Gera livros sintéticos (titulo, autor, ano, categoria) de forma reprodutível"
+    aleatorio = random.Random(semente)
+    return [
+        (" ".join(aleatorio.choice(PALAVRAS) for _ in range(aleatorio.randint(2, 5))).capitalize(),
+         f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}",
+         aleatorio.randint(1800, 2024),
+         aleatorio.choice(CATEGORIAS))
+        for _ in range(quantidade)
+    ]
+
+
+def gerar_biblioteca(quantidade_livros: int, quantidade_emprestimos: Optional[int] = None,
+                     semente: int = 42, backend: str = 'memoria', **opcoes) -> Biblioteca:
+    "Monta uma biblioteca com acervo e histórico de empréstimos sintéticos"
+    biblioteca = criar_biblioteca(backend, **opcoes)
+    biblioteca.cadastrar_livros_em_lote(gerar_catalogo(quantidade_livros, semente))
+
+    if quantidade_emprestimos is None:
+        quantidade_emprestimos = quantidade_livros // 2
+    aleatorio = random.Random(semente + 1)
+    pessoas = [f"{nome} {sobrenome}" for nome in NOMES for sobrenome in SOBRENOMES]
+    abertos = []
+    for _ in range(quantidade_emprestimos):
+        # Mantém cerca de 10% do acervo emprestado; o resto vira histórico de devoluções
+        if abertos and (len(abertos) > quantidade_livros // 10 or aleatorio.random() < 0.5):
+            biblioteca.devolver_livro(abertos.pop(aleatorio.randrange(len(abertos)))['id'])
+            continue
+        livro_id = aleatorio.randint(1, quantidade_livros)
+        try:
+            abertos.append(biblioteca.emprestar_livro(livro_id, aleatorio.choice(pessoas)))
+        except ValueError:
+            pass
+    return biblioteca
+
+
+def _percentil(ordenados: List[float], fracao: float) -> float:
+    "Percentil por interpolação linear de uma lista já ordenada"
+    if len(ordenados) == 1:
+        return ordenados[0]
+    posicao = (len(ordenados) - 1) * fracao
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def medir(operacao: Callable[[int], Any], repeticoes: int, medir_memoria: bool = True) -> Dict[str, Any]:
+    "Executa a operação várias vezes e resume vazão, latências (ms) e pico de memória"
+    latencias = []
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        operacao(i)
+        latencias.append(time.perf_counter() - inicio)
+
+    pico = None
+    if medir_memoria:
+        # Pico medido numa execução separada, para o tracemalloc não distorcer as latências
+        tracemalloc.start()
+        operacao(repeticoes)
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    ordenadas = sorted(latencias)
+    total = sum(latencias)
+    return {
+        'repeticoes': repeticoes,
+        'ops_por_segundo': repeticoes / total if total else None,
+        'media_ms': statistics.fmean(latencias) * 1000,
+        'p50_ms': _percentil(ordenadas, 0.50) * 1000,
+        'p95_ms': _percentil(ordenadas, 0.95) * 1000,
+        'p99_ms': _percentil(ordenadas, 0.99) * 1000,
+        'max_ms': ordenadas[-1] * 1000,
+        'pico_memoria_bytes': pico,
+    }
+
+
+def _carregar_e_fechar(backend: str, arquivo: str, **opcoes):
+    "Carrega um arquivo num backend novo e libera conexões ou processos dele"
+    biblioteca = criar_biblioteca(backend, **opcoes)
+    biblioteca.carregar_dados(arquivo)
+    if hasattr(biblioteca, 'fechar'):
+        biblioteca.fechar()
+
+
+def medir_primeiro_menu(arquivo: str, repeticoes: int = 3) -> Dict[str, Any]:
+    "Tempo até o menu aparecer (carga síncrona ou em segundo plano) e até a carga terminar"
+    sincrono, menu, completa = [], [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        Biblioteca().carregar_dados(arquivo)
+        sincrono.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        carga = Biblioteca().carregar_em_segundo_plano(arquivo)
+        menu.append(time.perf_counter() - inicio)
+        carga.aguardar()
+        completa.append(time.perf_counter() - inicio)
+        # A biblioteca da repetição anterior é liberada pela própria thread; não pode concorrer com a próxima
+        carga.juntar()
+    return {
+        'sincrono_ms': statistics.fmean(sincrono) * 1000,
+        'segundo_plano_ms': statistics.fmean(menu) * 1000,
+        'carga_completa_ms': statistics.fmean(completa) * 1000,
+    }
+
+
+def executar_cenario(quantidade_livros: int, repeticoes: int = 200, semente: int = 42,
+                     backend: str = 'memoria', medir_memoria: bool = True,
+                     fragmentos: Optional[int] = None) -> Dict[str, Any]:
+    "Mede todas as operações sobre uma biblioteca sintética do tamanho pedido"
+    aleatorio = random.Random(semente + 2)
+    pasta = tempfile.TemporaryDirectory()
+    opcoes: Dict[str, Any] = {}
+    if backend == 'sqlite':
+        opcoes['caminho'] = os.path.join(pasta.name, 'biblioteca.db')
+    elif backend == 'fragmentado':
+        opcoes['fragmentos'] = fragmentos
+
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    biblioteca = gerar_biblioteca(quantidade_livros, semente=semente, backend=backend, **opcoes)
+    resultado: Dict[str, Any] = {
+        'livros': quantidade_livros,
+        'backend': backend if backend != 'fragmentado' else f'fragmentado/{biblioteca.total}',
+        'montagem_s': time.perf_counter() - inicio,
+    }
+    if medir_memoria:
+        resultado['memoria_acervo_bytes'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    livros = biblioteca.livros
+    consultas = [(criterio, livro[criterio][:aleatorio.randint(3, 8)])
+                 for criterio, livro in ((aleatorio.choice(('titulo', 'autor')), aleatorio.choice(livros))
+                                         for _ in range(repeticoes + 1))]
+    categorias = [aleatorio.choice(CATEGORIAS) for _ in range(repeticoes + 1)]
+    disponiveis = [livro['id'] for livro in livros if livro['disponivel']]
+    aleatorio.shuffle(disponiveis)
+    emprestimos: List[Dict[str, Any]] = []
+    pesadas = max(1, min(repeticoes, 20))
+
+    operacoes = {
+        'buscar_livros': (lambda i: biblioteca.buscar_livros(*consultas[i]), repeticoes),
+        'buscar_ranqueado': (lambda i: biblioteca.buscar_ranqueado(*consultas[i]), repeticoes),
+        'filtrar_livros_por_categoria': (lambda i: biblioteca.filtrar_livros_por_categoria(categorias[i]),
+                                         repeticoes),
+        'emprestar_livro': (lambda i: emprestimos.append(biblioteca.emprestar_livro(disponiveis[i], "Benchmark")),
+                            min(repeticoes, len(disponiveis) - 1)),
+        'devolver_livro': (lambda i: biblioteca.devolver_livro(emprestimos[i]['id']),
+                           min(repeticoes, len(disponiveis) - 1)),
+        'gerar_relatorio': (lambda i: biblioteca.gerar_relatorio(), pesadas),
+        'calcular_estatisticas_livros': (lambda i: calcular_estatisticas_livros(biblioteca.livros), pesadas),
+        'calcular_estatisticas': (lambda i: biblioteca.calcular_estatisticas(), repeticoes),
+    }
+    for formato in FORMATOS:
+        arquivo = os.path.join(pasta.name, f'biblioteca.{formato}')
+        operacoes[f'salvar_dados_{formato}'] = (lambda i, arquivo=arquivo: biblioteca.salvar_dados(arquivo), 3)
+        operacoes[f'carregar_dados_{formato}'] = (
+            lambda i, arquivo=arquivo: _carregar_e_fechar(backend, arquivo, **opcoes), 3)
+
+    resultado['operacoes'] = {nome: medir(operacao, vezes, medir_memoria)
+                              for nome, (operacao, vezes) in operacoes.items() if vezes > 0}
+    if backend == 'memoria':
+        # Os arquivos já foram gravados pelas operações salvar_dados_*
+        resultado['primeiro_menu'] = {formato: medir_primeiro_menu(os.path.join(pasta.name, f'biblioteca.{formato}'))
+                                      for formato in FORMATOS}
+    if hasattr(biblioteca, 'fechar'):
+        biblioteca.fechar()
+    pasta.cleanup()
+    return resultado
+
+
+def executar_benchmarks(tamanhos: List[int], repeticoes: int = 200, semente: int = 42,
+                        backend: str = 'memoria', medir_memoria: bool = True,
+                        fragmentos: Optional[List[int]] = None) -> Dict[str, Any]:
+    "Executa os cenários para cada tamanho de acervo (e cada número de fragmentos, se houver)"
+    return {
+        'python': sys.version.split()[0],
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cenarios': [executar_cenario(tamanho, repeticoes, semente, backend, medir_memoria, quantidade)
+                     for tamanho in tamanhos for quantidade in (fragmentos or [None])],
+    }
+
+
+def comparar_resultados(anterior: Dict[str, Any], atual: Dict[str, Any]) -> List[str]:
+    "Compara dois resultados salvos (ex.: de commits diferentes) pela latência p50"
+    linhas = []
+    cenarios_anteriores = {(c['livros'], c['backend']): c for c in anterior['cenarios']}
+    for cenario in atual['cenarios']:
+        base = cenarios_anteriores.get((cenario['livros'], cenario['backend']))
+        if not base:
+            continue
+        for nome, medida in cenario['operacoes'].items():
+            if nome in base['operacoes']:
+                antes, depois = base['operacoes'][nome]['p50_ms'], medida['p50_ms']
+                razao = antes / depois if depois else float('inf')
+                linhas.append(f"{cenario['livros']:>8} {nome:<30} {antes:10.3f} ms -> {depois:10.3f} ms  ({razao:.2f}x)")
+    return linhas
+
+
+def main(argumentos: Optional[List[str]] = None):
+    "Interface de linha de comando dos benchmarks"
+    parser = argparse.ArgumentParser(description="Benchmarks da biblioteca")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="quantidades de livros dos cenários (ex.: 1000 10000 1000000)")
+    parser.add_argument('--repeticoes', type=int, default=200, help="execuções por operação")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--backend', choices=('memoria', 'sqlite', 'fragmentado'), default='memoria')
+    parser.add_argument('--fragmentos', type=int, nargs='+',
+                        help="com --backend fragmentado, números de processos a comparar (ex.: 1 2 4 8)")
+    parser.add_argument('--sem-memoria', action='store_true', help="não mede picos de memória (mais rápido)")
+    parser.add_argument('--saida', help="arquivo JSON para gravar o resultado")
+    parser.add_argument('--comparar', help="resultado JSON anterior para comparar com esta execução")
+    opcoes = parser.parse_args(argumentos)
+
+    resultado = executar_benchmarks(opcoes.tamanhos, opcoes.repeticoes, opcoes.semente,
+                                    opcoes.backend, not opcoes.sem_memoria, opcoes.fragmentos)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if opcoes.saida:
+        with open(opcoes.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        print("\n".join(comparar_resultados(anterior, resultado)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,315 @@
 
 
-from datetime import datetime, timedelta
-from typing import List, Dict, Callable, Any
+from typing import List, Dict, Callable, Any, Optional, Set, Tuple, Iterable, Iterator, Union, Mapping
+from collections import Counter
+import contextlib
+import csv
+import heapq
+import inspect
 import json
+import os
+import threading
+
+from busca import montar_pagina, normalizar, normalizar_pessoa, ranquear, validar_pagina
+from carga import Carga
+from consulta import Consulta
+from datas import FORMATO_DATAS, SEGUNDOS_POR_DIA, agora, migrar_datas, para_instante
+from estatisticas import EstatisticasAcervo
+from historico import HistoricoEmprestimos
+from metricas import Metricas, desinstrumentar, instrumentar
+from precos import LivroComPreco
+from registros import Livro, Emprestimo, Registro
+from segmentos import carregar_segmentos, eh_armazem_segmentado, salvar_segmentos
+from snapshot import RegistrosMapeados, SnapshotBinario, _extras, eh_snapshot_binario, escrever_snapshot
+
+
+CAMPOS_BUSCA = ('titulo', 'autor', 'categoria')
+CAMPOS_LIVRO = Livro.CAMPOS
+CAMPOS_EMPRESTIMO = Emprestimo.CAMPOS
+# Campo ausente no meio de uma linha do .jsonl; nenhum campo guarda um objeto vazio
+AUSENTE_JSONL: Dict[str, Any] = {}
+# Além dos métodos públicos, as métricas medem estas gravações e leituras de arquivo
+METODOS_PERSISTENCIA = ('_escrever_json_lines', '_ler_json_lines', '_registrar_lote_no_diario', '_reproduzir_diario')
+
+
+class IndiceNgramas:
+    "Índice invertido de n-gramas das chaves normalizadas, para busca por substring sem acentos"
+    
+    def __init__(self, n: int = 3):
+        self.n = n
+        self._postagens: Dict[str, Set[int]] = {}
+    
+    def _ngramas(self, texto: str) -> Set[str]:
+        "Extrai os n-gramas distintos de um texto já normalizado"
+        return {texto[i:i + self.n] for i in range(len(texto) - self.n + 1)}
+    
+    def adicionar(self, posicao: int, chave: str):
+        "Indexa a chave normalizada do registro que está na posição informada"
+        for ngrama in self._ngramas(chave):
+            self._postagens.setdefault(ngrama, set()).add(posicao)
+    
+    def adicionar_lote(self, chaves: Iterable[Tuple[int, str]]):
+        "Indexa vários registros, agrupando as posições por n-grama antes de juntar ao índice"
+        lote: Dict[str, List[int]] = {}
+        for posicao, chave in chaves:
+            for ngrama in self._ngramas(chave):
+                posicoes = lote.get(ngrama)
+                if posicoes is None:
+                    lote[ngrama] = [posicao]
+                else:
+                    posicoes.append(posicao)
+        
+        for ngrama, posicoes in lote.items():
+            postagem = self._postagens.get(ngrama)
+            if postagem is None:
+                self._postagens[ngrama] = set(posicoes)
+            else:
+                postagem.update(posicoes)
+    
+    def candidatos(self, valor: str) -> Optional[List[int]]:
+        "Posições que contêm todos os n-gramas do valor, ou None se o valor for curto demais"
+        ngramas = self._ngramas(normalizar(valor))
+        if not ngramas:
+            return None
+        
+        postagens = sorted((self._postagens.get(ngrama, set()) for ngrama in ngramas), key=len)
+        resultado = set(postagens[0])
+        for postagem in postagens[1:]:
+            if not resultado:
+                break
+            resultado &= postagem
+        return sorted(resultado)
+
+
+def _eh_json_lines(arquivo: str) -> bool:
+    "Indica se o arquivo usa o formato JSON Lines"
+    return arquivo.endswith('.jsonl')
+
+
+def _ler_entradas_de_arquivo(arquivo: str) -> Iterator[Dict[str, Any]]:
+    "Lê, uma linha por vez, os livros de um CSV com cabeçalho ou de um arquivo JSON Lines"
+    with open(arquivo, 'r', encoding='utf-8', newline='') as f:
+        if _eh_json_lines(arquivo):
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+        elif arquivo.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            raise ValueError("Formato de arquivo não suportado (use .csv ou .jsonl)")
+
+
+def _percorrer_json_lines(f) -> Tuple[Dict[str, Any], Iterator[Tuple[str, Registro]]]:
+    "Lê o cabeçalho do arquivo JSON Lines aberto; devolve o cabeçalho e os registros, montados um por vez"
+    cabecalho = json.loads(f.readline() or '{}')
+    campos = {'livro': tuple(cabecalho.get('livro', CAMPOS_LIVRO)),
+              'emprestimo': tuple(cabecalho.get('emprestimo', CAMPOS_EMPRESTIMO))}
+    migrar = cabecalho.get('formato_datas') != FORMATO_DATAS
+    classes = {'livro': Livro, 'emprestimo': Emprestimo}
+    
+    def registros():
+        for linha in f:
+            if not linha.strip():
+                continue
+            tipo, *valores = json.loads(linha)
+            classe = classes[tipo]
+            extras = valores.pop() if len(valores) > len(campos[tipo]) else None
+            if campos[tipo] == classe.CAMPOS and AUSENTE_JSONL not in valores:
+                registro = classe(*valores)
+            else:
+                registro = classe.de_dict({campo: valor for campo, valor in zip(campos[tipo], valores)
+                                           if valor != AUSENTE_JSONL})
+            if extras:
+                registro.update(extras)
+            if migrar:
+                migrar_datas((registro,))
+            yield tipo, registro
+    
+    return cabecalho, registros()
+
+
+def _normalizar_entradas(entradas: Iterable[Any]) -> Iterator[Tuple[str, str, int, str]]:
+    "Converte cada entrada (dicionário ou tupla titulo, autor, ano, categoria) em tupla validada"
+    for numero, entrada in enumerate(entradas, 1):
+        if isinstance(entrada, Mapping):
+            titulo, autor, ano, categoria = (entrada[campo] for campo in ('titulo', 'autor', 'ano', 'categoria'))
+        else:
+            titulo, autor, ano, categoria = entrada
+        try:
+            ano = int(ano)
+        except (TypeError, ValueError):
+            raise ValueError(f"Ano inválido na entrada {numero}: {ano!r}") from None
+        yield titulo, autor, ano, categoria
+
+
+def _copiar_relatorio(relatorio: Dict[str, Any], **alteracoes) -> Dict[str, Any]:
+    "Cópia do relatório com listas de títulos próprias, para quem recebe poder alterá-las"
+    copia = dict(relatorio, **alteracoes)
+    copia['livros_por_categoria'] = {categoria: list(titulos)
+                                     for categoria, titulos in relatorio['livros_por_categoria'].items()}
+    return copia
 
 
 class Biblioteca:
 
     
-    def __init__(self):
+    def __init__(self, indexar_busca: bool = True, concorrente: bool = False, listras: int = 64,
+                 limite_emprestimos: Optional[int] = None):
         self.livros = []
         self.emprestimos = []
         self.contador_id = 1
+        self.indexar_busca = indexar_busca
+        self.concorrente = concorrente
+        # Máximo de empréstimos em aberto por pessoa (None: sem limite)
+        self.limite_emprestimos = limite_emprestimos
+        # No modo concorrente, empréstimo e devolução travam só a listra do livro; a trava de
+        # registros protege apenas o heap, os contadores e a alocação de ids
+        self._travas_livros = [threading.Lock() for _ in range(listras)] if concorrente else None
+        self._trava_registros = threading.RLock() if concorrente else contextlib.nullcontext()
+        self._trava_diario = threading.Lock() if concorrente else contextlib.nullcontext()
+        self._proximo_emprestimo_id = 1
+        # Próximo id de empréstimo gravado no arquivo carregado: ids de empréstimos que já foram
+        # para o histórico não voltam a ser usados, mesmo sem o histórico ativo
+        self._emprestimo_id_salvo = 1
+        self._livros_por_id = {}
+        self._emprestimos_por_id = {}
+        # Falso logo depois de abrir um snapshot binário: os índices só são montados na
+        # primeira operação que precisa deles (busca, relatório...), não na abertura
+        self._indices_prontos = True
+        self._indices_busca: Dict[str, IndiceNgramas] = {}
+        # Chaves normalizadas de cada campo de busca, na mesma ordem de self.livros
+        self._chaves_busca: Dict[str, List[str]] = {}
+        self._posicoes_por_categoria: Dict[str, List[int]] = {}
+        self._livros_disponiveis = 0
+        self._vencimentos: List[Tuple[int, int]] = []
+        self._emprestimos_atrasados: Set[int] = set()
+        # Empréstimos da lista de trabalho por pessoa (chave de normalizar_pessoa) e quantos estão abertos
+        self._emprestimos_por_pessoa: Dict[str, List[Dict[str, Any]]] = {}
+        self._abertos_por_pessoa = Counter()
+        self._arquivo_snapshot: Optional[str] = None
+        # Armazenamento segmentado em sincronia com a memória (pasta, geração do manifesto) e ids
+        # de registros já salvos que mudaram desde então; só os segmentos deles são regravados
+        self._sincronia: Optional[Tuple[str, str]] = None
+        self._alterados: Dict[str, Set[int]] = {'livros': set(), 'emprestimos': set()}
+        # Empréstimos devolvidos há mais que o horizonte vão para o histórico ao salvar
+        self.historico: Optional[HistoricoEmprestimos] = None
+        self._horizonte_historico = 365 * SEGUNDOS_POR_DIA
+        self._diario = None
+        self._fsync_diario = False
+        # Toda alteração incrementa a versão; relatório e estatísticas ficam em cache por versão
+        self.versao = 0
+        self._relatorio_em_cache: Optional[Tuple[int, float, Dict[str, Any]]] = None
+        self._estatisticas_em_cache: Optional[Tuple[int, Dict[str, Any]]] = None
+        self._contagem_cache = Counter()
+        self.metricas: Optional[Metricas] = None
+        self._carga: Optional[Carga] = None
+        self._reconstruir_indices()
     
     def cadastrar_livro(self, titulo: str, autor: str, ano: int, categoria: str) -> Dict[str, Any]:
-         "Cadastrar"
-        livro = {
-            'id': self.contador_id,
-            'titulo': titulo,
-            'autor': autor,
-            'ano': ano,
-            'categoria': categoria,
-            'disponivel': True,
-            'data_cadastro': datetime.now().isoformat()
-        }
-        
-        self.livros.append(livro)
-        self.contador_id += 1
+        "Cadastrar"
+        self._aguardar_carga('dados')
+        with self._trava_registros:
+            livro = Livro(
+                id=self.contador_id,
+                titulo=titulo,
+                autor=autor,
+                ano=ano,
+                categoria=categoria,
+                disponivel=True,
+                data_cadastro=agora()
+            )
+            
+            self._inserir_livro(livro)
+            self._registrar_no_diario({'op': 'cadastrar', 'livro': livro})
         
         return livro
     
+    def cadastrar_livros_em_lote(self, fonte: Union[str, Iterable[Any]]) -> List[Dict[str, Any]]:
+        "Cadastra vários livros de um iterável ou de um arquivo .csv/.jsonl, lendo um por vez"
+        entradas = _ler_entradas_de_arquivo(fonte) if isinstance(fonte, str) else fonte
+        
+        self._aguardar_carga('dados')
+        with self._trava_registros:
+            return self._cadastrar_entradas(entradas)
+    
+    def _cadastrar_entradas(self, entradas: Iterable[Any]) -> List[Dict[str, Any]]:
+        "Cadastra as entradas de um lote e indexa todas de uma vez no final"
+        if self._indices_prontos:
+            self._verificar_indices()
+        inicio = len(self.livros)
+        proximo_id = self.contador_id
+        data_cadastro = agora()
+        try:
+            for titulo, autor, ano, categoria in _normalizar_entradas(entradas):
+                self.livros.append(Livro(proximo_id, titulo, autor, ano, categoria, True, data_cadastro))
+                proximo_id += 1
+        except Exception:
+            # Nada do lote fica cadastrado se alguma entrada for inválida
+            del self.livros[inicio:]
+            raise
+        
+        self.contador_id = proximo_id
+        novos = self.livros[inicio:]
+        if self._indices_prontos:
+            self._indexar_lote(inicio)
+        else:
+            self._livros_por_id.update((livro['id'], livro) for livro in novos)
+        self.versao += 1
+        self._registrar_lote_no_diario({'op': 'cadastrar', 'livro': livro} for livro in novos)
+        
+        return novos
+    
     def buscar_livros(self, criterio: str, valor: str) -> List[Dict[str, Any]]:
         "Busca livros"
         
-        filtro_lambda = lambda livro: valor.lower() in livro[criterio].lower()
+        self._verificar_indices()
+        termo = normalizar(valor)
+        indice = self._indices_busca.get(criterio)
+        if indice:
+            chaves = self._chaves_busca[criterio]
+            posicoes = indice.candidatos(valor)
+            if posicoes is None:
+                posicoes = range(len(self.livros))
+            return [self.livros[posicao] for posicao in posicoes if termo in chaves[posicao]]
+        
+        filtro_lambda = lambda livro: termo in normalizar(livro[criterio])
         
         return list(filter(filtro_lambda, self.livros))
     
+    def buscar_ranqueado(self, criterio: str, valor: str, limite: int = 10, pagina: int = 1) -> Dict[str, Any]:
+        "Uma página dos livros mais relevantes: prefixo, depois palavra inteira, depois substring"
+        validar_pagina(limite, pagina)
+        total, melhores = self._ranquear(criterio, valor, limite * pagina)
+        return montar_pagina(total, melhores, limite, pagina)
+    
+    def _ranquear(self, criterio: str, valor: str, quantidade: int) -> Tuple[int, List[Tuple[Tuple, Dict[str, Any]]]]:
+        "Total de ocorrências e as melhores, sem montar nem ordenar a lista inteira"
+        self._verificar_indices()
+        termo = normalizar(valor)
+        livros = self.livros
+        indice = self._indices_busca.get(criterio)
+        if indice:
+            chaves = self._chaves_busca[criterio]
+            posicoes = indice.candidatos(valor)
+            if posicoes is None:
+                posicoes = range(len(livros))
+            pares = ((chaves[posicao], livros[posicao]) for posicao in posicoes)
+        else:
+            pares = ((normalizar(livro[criterio]), livro) for livro in livros)
+        return ranquear(pares, termo, quantidade)
+    
     def filtrar_livros_por_categoria(self, categoria: str) -> List[Dict[str, Any]]:
         "Filtra livros por categoria"
         
-        return list(filter(lambda livro: livro['categoria'] == categoria, self.livros))
+        self._verificar_indices()
+        posicoes = self._posicoes_por_categoria.get(categoria, [])
+        
+        return list(map(lambda posicao: self.livros[posicao], posicoes))
+    
+    def consultar(self) -> Consulta:
+        "Começa uma consulta preguiçosa sobre o acervo, planejada com os índices"
+        
+        return Consulta(biblioteca=self)
     
     def obter_titulos_livros(self, livros: List[Dict[str, Any]]) -> List[str]:
         "Extrai títulos de uma lista"
@@ -67,125 +336,781 @@ class Biblioteca:
     
     def emprestar_livro(self, livro_id: int, pessoa: str) -> Dict[str, Any]:
         "Registra empréstimo de um livro"
-        livro = next((l for l in self.livros if l['id'] == livro_id), None)
+        livro = self._obter_livro(livro_id)
         
         if not livro:
             raise ValueError("Livro não encontrado")
         
-        if not livro['disponivel']:
-            raise ValueError("Livro não está disponível")
-        
-        emprestimo = {
-            'id': len(self.emprestimos) + 1,
-            'livro_id': livro_id,
-            'pessoa': pessoa,
-            'data_emprestimo': datetime.now().isoformat(),
-            'data_vencimento': (datetime.now() + timedelta(days=15)).isoformat(),
-            'devolvido': False
-        }
-        
-        self.emprestimos.append(emprestimo)
-        livro['disponivel'] = False
+        limite = self.limite_emprestimos
+        if limite is not None:
+            # A contagem por pessoa é um dos índices; com limite, o empréstimo espera por eles
+            self._verificar_indices()
+        # Com limite, conferir e inserir acontecem sob a mesma trava, para duas retiradas
+        # simultâneas da mesma pessoa não passarem as duas
+        with self._trava_livro(livro_id), (self._trava_registros if limite is not None else contextlib.nullcontext()):
+            if not livro['disponivel']:
+                raise ValueError("Livro não está disponível")
+            if limite is not None and self._abertos_por_pessoa[normalizar_pessoa(pessoa)] >= limite:
+                raise ValueError(f"Limite de {limite} empréstimos em aberto atingido")
+            
+            instante = agora()
+            emprestimo = Emprestimo(
+                id=self._alocar_id_emprestimo(),
+                livro_id=livro_id,
+                pessoa=pessoa,
+                data_emprestimo=instante,
+                data_vencimento=instante + 15 * SEGUNDOS_POR_DIA,
+                devolvido=False
+            )
+            
+            self._inserir_emprestimo(emprestimo)
+            self._registrar_no_diario({'op': 'emprestar', 'emprestimo': emprestimo})
         
         return emprestimo
     
     def devolver_livro(self, emprestimo_id: int) -> Dict[str, Any]:
         "Registra devolução de um livro"
         
-        emprestimo = next((e for e in self.emprestimos if e['id'] == emprestimo_id), None)
+        emprestimo = self._obter_emprestimo(emprestimo_id)
         
         if not emprestimo:
             raise ValueError("Empréstimo não encontrado")
         
-        if emprestimo['devolvido']:
-            raise ValueError("Livro já foi devolvido")
-        
-       
-        data_vencimento = datetime.fromisoformat(emprestimo['data_vencimento'])
-        data_devolucao = datetime.now()
-        
-        multa = 0
-        if data_devolucao > data_vencimento:
-            dias_atraso = (data_devolucao - data_vencimento).days
-            multa = dias_atraso * 2.0  
+        with self._trava_livro(emprestimo['livro_id']):
+            if emprestimo['devolvido']:
+                raise ValueError("Livro já foi devolvido")
+            
+           
+            data_vencimento = emprestimo['data_vencimento']
+            data_devolucao = agora()
+            
+            multa = 0
+            if data_devolucao > data_vencimento:
+                dias_atraso = (data_devolucao - data_vencimento) // SEGUNDOS_POR_DIA
+                multa = dias_atraso * 2.0  
+            
+            self._concluir_devolucao(emprestimo, data_devolucao, multa)
+            self._registrar_no_diario({'op': 'devolver', 'id': emprestimo_id,
+                                       'data_devolucao': emprestimo['data_devolucao'], 'multa': multa})
         
+        return emprestimo
+    
+    def _trava_livro(self, livro_id: int):
+        "Trava da listra do livro no modo concorrente; fora dele, um contexto vazio"
+        if self._travas_livros is None:
+            return self._trava_registros
+        return self._travas_livros[hash(livro_id) % len(self._travas_livros)]
+    
+    def _alocar_id_emprestimo(self) -> int:
+        "Reserva o próximo id de empréstimo de forma atômica"
+        with self._trava_registros:
+            emprestimo_id = self._proximo_emprestimo_id
+            self._proximo_emprestimo_id += 1
+        return emprestimo_id
+    
+    def _inserir_livro(self, livro: Dict[str, Any]):
+        "Acrescenta um livro já montado à lista e aos índices"
+        livro = Livro.de_dict(livro)
+        self.livros.append(livro)
+        try:
+            if self._indices_prontos:
+                self._indexar_livro(livro, len(self.livros) - 1)
+            else:
+                self._livros_por_id[livro['id']] = livro
+        except ValueError:
+            # Só as estatísticas recusam um livro (ano inválido), e elas vêm antes dos demais índices
+            self.livros.pop()
+            raise
+        self.contador_id = max(self.contador_id, livro['id'] + 1)
+        self.versao += 1
+    
+    def _inserir_emprestimo(self, emprestimo: Dict[str, Any]):
+        "Acrescenta um empréstimo aberto e marca o livro como indisponível"
+        emprestimo = Emprestimo.de_dict(emprestimo)
+        self.emprestimos.append(emprestimo)
+        if self._indices_prontos:
+            self._indexar_emprestimo(emprestimo)
+        else:
+            self._emprestimos_por_id[emprestimo['id']] = emprestimo
+            with self._trava_registros:
+                self._proximo_emprestimo_id = max(self._proximo_emprestimo_id, emprestimo['id'] + 1)
+        livro = self._obter_livro(emprestimo['livro_id'])
+        with self._trava_registros:
+            if livro and livro['disponivel'] and not emprestimo['devolvido']:
+                livro['disponivel'] = False
+                self._alterados['livros'].add(livro['id'])
+                # Sem índices ainda, o contador sai da reconstrução, que lê os próprios registros
+                if self._indices_prontos:
+                    self._livros_disponiveis -= 1
+            self.versao += 1
+    
+    def _concluir_devolucao(self, emprestimo: Dict[str, Any], data_devolucao: int, multa: float):
+        "Marca o empréstimo como devolvido e libera o livro"
         emprestimo['devolvido'] = True
-        emprestimo['data_devolucao'] = data_devolucao.isoformat()
+        emprestimo['data_devolucao'] = data_devolucao
         emprestimo['multa'] = multa
         
+        livro = self._obter_livro(emprestimo['livro_id'])
+        with self._trava_registros:
+            self._emprestimos_atrasados.discard(emprestimo['id'])
+            self._alterados['emprestimos'].add(emprestimo['id'])
+            if self._indices_prontos:
+                self._abertos_por_pessoa[normalizar_pessoa(emprestimo['pessoa'])] -= 1
+            if livro and not livro['disponivel']:
+                livro['disponivel'] = True
+                self._alterados['livros'].add(livro['id'])
+                if self._indices_prontos:
+                    self._livros_disponiveis += 1
+            self.versao += 1
+    
+    def _indexar_livro(self, livro: Dict[str, Any], posicao: int):
+        "Inclui um livro nos índices mantidos pela biblioteca"
+        self._estatisticas.adicionar(livro)
+        self._livros_por_id[livro['id']] = livro
+        self._posicoes_por_categoria.setdefault(livro['categoria'], []).append(posicao)
+        if livro['disponivel']:
+            self._livros_disponiveis += 1
+        for campo, indice in self._indices_busca.items():
+            chave = normalizar(livro[campo])
+            self._chaves_busca[campo].append(chave)
+            indice.adicionar(posicao, chave)
+    
+    def _indexar_lote(self, inicio: int, fim: Optional[int] = None):
+        "Inclui nos índices, de uma só vez, os livros de inicio até fim (ou até o final da lista)"
+        fim = len(self.livros) if fim is None else fim
+        novos = range(inicio, fim)
+        # Uma única cópia do trecho: num snapshot binário cada acesso passa pela decodificação
+        livros = self.livros[inicio:fim]
+        for posicao, livro in zip(novos, livros):
+            self._livros_por_id[livro['id']] = livro
+            self._posicoes_por_categoria.setdefault(livro['categoria'], []).append(posicao)
+            if livro['disponivel']:
+                self._livros_disponiveis += 1
+        self._estatisticas.adicionar_lote(livros)
+        for campo, indice in self._indices_busca.items():
+            chaves = [normalizar(livro[campo]) for livro in livros]
+            self._chaves_busca[campo].extend(chaves)
+            indice.adicionar_lote(zip(novos, chaves))
+    
+    def _reconstruir_indices(self):
+        "Reconstrói os índices a partir das listas públicas"
+        self._livros_por_id = {}
+        self._emprestimos_por_id = {}
+        for _ in self._construir_indices():
+            pass
+    
+    def _construir_indices(self, lote: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        "Monta os índices um lote de livros por passo, informando (feitos, total) a cada passo"
+        # Quem consome segura a trava de registros durante cada passo; entre um passo e outro
+        # podem entrar cadastros e empréstimos, que até o fim só atualizam os índices por id
+        self._indices_prontos = False
+        self._posicoes_por_categoria = {}
+        self._indices_busca = {campo: IndiceNgramas() for campo in CAMPOS_BUSCA} if self.indexar_busca else {}
+        self._chaves_busca = {campo: [] for campo in self._indices_busca}
+        self._livros_disponiveis = 0
+        self._estatisticas = EstatisticasAcervo()
+        feitos = 0
+        while feitos < len(self.livros):
+            fim = len(self.livros) if lote is None else min(feitos + lote, len(self.livros))
+            self._indexar_lote(feitos, fim)
+            feitos = fim
+            if feitos < len(self.livros):
+                yield feitos, len(self.livros)
         
-        livro = next((l for l in self.livros if l['id'] == emprestimo['livro_id']), None)
-        if livro:
-            livro['disponivel'] = True
+        if lote is not None:
+            # Livros já indexados podem ter sido emprestados ou devolvidos entre os passos
+            self._livros_disponiveis = sum(1 for livro in self.livros if livro['disponivel'])
+        self._vencimentos = []
+        self._emprestimos_atrasados = set()
+        self._emprestimos_por_pessoa = {}
+        self._abertos_por_pessoa = Counter()
+        self._proximo_emprestimo_id = self._primeiro_emprestimo_id()
+        for emprestimo in self.emprestimos:
+            self._indexar_emprestimo(emprestimo)
+        self._indices_prontos = True
+        self.versao += 1
+        yield feitos, feitos
+    
+    def _primeiro_emprestimo_id(self) -> int:
+        "Menor id livre para empréstimos, contando os que já foram para o histórico e o id gravado no arquivo"
+        return max(self.historico.maior_id + 1 if self.historico else 1, self._emprestimo_id_salvo)
+    
+    def _indexar_emprestimo(self, emprestimo: Dict[str, Any]):
+        "Inclui um empréstimo no índice por id, no da pessoa e, se aberto, no heap de vencimentos"
+        self._emprestimos_por_id[emprestimo['id']] = emprestimo
+        chave = normalizar_pessoa(emprestimo['pessoa'])
+        with self._trava_registros:
+            self._proximo_emprestimo_id = max(self._proximo_emprestimo_id, emprestimo['id'] + 1)
+            self._emprestimos_por_pessoa.setdefault(chave, []).append(emprestimo)
+            if not emprestimo['devolvido']:
+                self._abertos_por_pessoa[chave] += 1
+                heapq.heappush(self._vencimentos, (emprestimo['data_vencimento'], emprestimo['id']))
+    
+    def _atualizar_atrasos(self, instante: int):
+        "Move do heap para o conjunto de atrasados os empréstimos vencidos até o instante"
+        with self._trava_registros:
+            self._mover_vencidos(instante)
+    
+    def _mover_vencidos(self, instante: int):
+        "Retira do heap as entradas vencidas; chamado com a trava de registros"
+        while self._vencimentos and self._vencimentos[0][0] < instante:
+            _, emprestimo_id = heapq.heappop(self._vencimentos)
+            emprestimo = self._emprestimos_por_id.get(emprestimo_id)
+            # Entradas de empréstimos já devolvidos são descartadas aqui
+            if emprestimo and not emprestimo['devolvido']:
+                self._emprestimos_atrasados.add(emprestimo_id)
+    
+    def _verificar_indices(self):
+        "Reconstrói os índices se as listas públicas foram alteradas diretamente ou ainda não existem"
+        if not self._indices_prontos:
+            self._aguardar_carga('indices')
+            with self._trava_registros:
+                if not self._indices_prontos:
+                    self._reconstruir_indices()
+            return
+        # No modo concorrente as listas só mudam pela API; durante uma inserção os tamanhos
+        # divergem por um instante e isso não pode disparar uma reconstrução
+        if self.concorrente:
+            return
+        if len(self._livros_por_id) != len(self.livros) or len(self._emprestimos_por_id) != len(self.emprestimos):
+            # Sem saber o que mudou, o próximo salvamento segmentado regrava tudo
+            self._sincronia = None
+            self._reconstruir_indices()
+    
+    def _obter_livro(self, livro_id: int) -> Dict[str, Any]:
+        "Busca um livro pelo id em O(1)"
+        if not self._indices_prontos:
+            # Antes dos demais índices, basta o índice do próprio snapshot ou o dicionário por id
+            self._aguardar_carga('dados')
+            if isinstance(self.livros, RegistrosMapeados):
+                return self.livros.por_id(livro_id)
+            return self._livros_por_id.get(livro_id)
+        self._verificar_indices()
+        return self._livros_por_id.get(livro_id)
+    
+    def _obter_emprestimo(self, emprestimo_id: int) -> Dict[str, Any]:
+        "Busca um empréstimo pelo id em O(1)"
+        if not self._indices_prontos:
+            self._aguardar_carga('dados')
+            if isinstance(self.emprestimos, RegistrosMapeados):
+                return self.emprestimos.por_id(emprestimo_id)
+            return self._emprestimos_por_id.get(emprestimo_id)
+        self._verificar_indices()
+        return self._emprestimos_por_id.get(emprestimo_id)
+    
+    @property
+    def estatisticas(self) -> EstatisticasAcervo:
+        "Estatísticas do acervo, atualizadas junto com os índices"
+        self._verificar_indices()
+        return self._estatisticas
+    
+    def calcular_estatisticas(self) -> Dict[str, Any]:
+        "Mesmo resultado de calcular_estatisticas_livros(self.livros), sem percorrer o acervo"
+        self._verificar_indices()
+        cache = self._estatisticas_em_cache
+        if cache is not None and cache[0] == self.versao:
+            self._contagem_cache['estatisticas_acertos'] += 1
+            return dict(cache[1])
         
-        return emprestimo
+        self._contagem_cache['estatisticas_falhas'] += 1
+        versao = self.versao
+        resumo = self._estatisticas.resumo()
+        self._estatisticas_em_cache = (versao, resumo)
+        return dict(resumo)
+    
+    def contagem_cache(self) -> Dict[str, int]:
+        "Acertos e falhas do cache de relatório e de estatísticas"
+        # No modo concorrente as contagens não usam trava e podem perder incrementos
+        return {chave: self._contagem_cache[chave] for chave in
+                ('relatorio_acertos', 'relatorio_falhas', 'estatisticas_acertos', 'estatisticas_falhas')}
     
     def gerar_relatorio(self) -> Dict[str, Any]:
-        "Gera relatório sobre o acervo"
+        "Gera relatório sobre o acervo; sem alterações, devolve uma cópia do último relatório calculado"
+        
+        self._verificar_indices()
+        instante = agora()
+        cache = self._relatorio_em_cache
+        if cache is not None and cache[0] == self.versao and instante <= cache[1]:
+            self._contagem_cache['relatorio_acertos'] += 1
+            return _copiar_relatorio(cache[2], data_relatorio=instante)
         
+        self._contagem_cache['relatorio_falhas'] += 1
+        # A versão é lida antes dos dados: uma alteração no meio do cálculo invalida o resultado
+        versao = self.versao
         total_livros = len(self.livros)
-        livros_disponiveis = len([l for l in self.livros if l['disponivel']])
+        livros_disponiveis = self._livros_disponiveis
         livros_emprestados = total_livros - livros_disponiveis
         
        
-        livros_por_categoria = {}
-        for livro in self.livros:
-            categoria = livro['categoria']
-            if categoria not in livros_por_categoria:
-                livros_por_categoria[categoria] = []
-            livros_por_categoria[categoria].append(livro['titulo'])
+        # list() copia os itens de uma vez, então cadastros simultâneos não quebram a iteração
+        livros_por_categoria = {
+            categoria: [self.livros[posicao]['titulo'] for posicao in list(posicoes)]
+            for categoria, posicoes in list(self._posicoes_por_categoria.items())
+        }
         
       
-        emprestimos_em_atraso = []
-        for emprestimo in self.emprestimos:
-            if not emprestimo['devolvido']:
-                data_vencimento = datetime.fromisoformat(emprestimo['data_vencimento'])
-                if datetime.now() > data_vencimento:
-                    emprestimos_em_atraso.append(emprestimo)
+        # Sem alterações, os atrasos só mudam quando passar o próximo vencimento do heap
+        with self._trava_registros:
+            self._mover_vencidos(instante)
+            emprestimos_em_atraso = len(self._emprestimos_atrasados)
+            valido_ate = self._vencimentos[0][0] if self._vencimentos else float('inf')
         
-        return {
+        relatorio = {
             'total_livros': total_livros,
             'livros_disponiveis': livros_disponiveis,
             'livros_emprestados': livros_emprestados,
             'livros_por_categoria': livros_por_categoria,
-            'emprestimos_em_atraso': len(emprestimos_em_atraso),
-            'data_relatorio': datetime.now().isoformat()
+            'emprestimos_em_atraso': emprestimos_em_atraso,
+            'data_relatorio': instante
         }
+        self._relatorio_em_cache = (versao, valido_ate, relatorio)
+        return _copiar_relatorio(relatorio)
     
     def salvar_dados(self, arquivo: str = 'biblioteca.json'):
-        "Salva os dados em JSON"
-        dados = {
-            'livros': self.livros,
-            'emprestimos': self.emprestimos,
-            'contador_id': self.contador_id
-        }
-        
-        with open(arquivo, 'w', encoding='utf-8') as f:
-            json.dump(dados, f, ensure_ascii=False, indent=2)
+        "Salva os dados em JSON (JSON Lines se o arquivo terminar em .jsonl, binário se em .bin, segmentado se em .seg)"
+        self._aguardar_carga('dados')
+        with self._trava_registros:
+            if self.historico:
+                self._arquivar_emprestimos(agora() - self._horizonte_historico)
+            if eh_armazem_segmentado(arquivo):
+                self._salvar_segmentado(arquivo)
+            elif eh_snapshot_binario(arquivo):
+                escrever_snapshot(arquivo, self.livros, self.emprestimos, self.contador_id,
+                                  self._proximo_emprestimo_id)
+            else:
+                # Grava em arquivo temporário e troca de uma vez para não deixar snapshot pela metade
+                temporario = arquivo + '.tmp'
+                with open(temporario, 'w', encoding='utf-8') as f:
+                    if _eh_json_lines(arquivo):
+                        self._escrever_json_lines(f)
+                    else:
+                        dados = {
+                            'livros': list(self.livros),
+                            'emprestimos': list(self.emprestimos),
+                            'contador_id': self.contador_id,
+                            'proximo_emprestimo_id': self._proximo_emprestimo_id,
+                            'formato_datas': FORMATO_DATAS
+                        }
+                        json.dump(dados, f, ensure_ascii=False, indent=2, default=dict)
+                os.replace(temporario, arquivo)
+            
+            if self._diario_pertence_a(arquivo):
+                with self._trava_diario:
+                    self._diario.truncate(0)
+    
+    def ativar_historico(self, pasta: str = 'biblioteca.historico', horizonte_dias: int = 365):
+        "Passa a mover para o histórico, a cada salvamento, os empréstimos devolvidos há mais de horizonte_dias"
+        if horizonte_dias < 0:
+            raise ValueError("O horizonte do histórico não pode ser negativo")
+        self._aguardar_carga('dados')
+        with self._trava_registros:
+            self.historico = HistoricoEmprestimos(pasta)
+            self._horizonte_historico = horizonte_dias * SEGUNDOS_POR_DIA
+            self._proximo_emprestimo_id = max(self._proximo_emprestimo_id, self._primeiro_emprestimo_id())
+    
+    def desativar_historico(self):
+        "Deixa de arquivar; o que já foi para o histórico continua na pasta dele"
+        self.historico = None
+    
+    def arquivar_emprestimos(self, antes_de: Optional[int] = None) -> int:
+        "Move para o histórico os empréstimos devolvidos antes do instante (padrão: agora menos o horizonte)"
+        if not self.historico:
+            raise ValueError("Histórico não está ativo")
+        self._aguardar_carga('dados')
+        with self._trava_registros:
+            return self._arquivar_emprestimos(agora() - self._horizonte_historico if antes_de is None else antes_de)
+    
+    def _arquivar_emprestimos(self, antes_de: int) -> int:
+        "Grava as partições e só então tira os empréstimos da lista de trabalho; chamado com a trava de registros"
+        antigos = [emprestimo for emprestimo in self.emprestimos
+                   if emprestimo['devolvido'] and emprestimo['data_devolucao'] < antes_de]
+        if not antigos:
+            return 0
+        self.historico.arquivar(antigos)
+        ids = {emprestimo['id'] for emprestimo in antigos}
+        self.emprestimos = [emprestimo for emprestimo in self.emprestimos if emprestimo['id'] not in ids]
+        # Refeito por inteiro: a lista nova deixa de ser mapeada e não tem mais o índice do snapshot
+        self._emprestimos_por_id = {emprestimo['id']: emprestimo for emprestimo in self.emprestimos}
+        if self._indices_prontos:
+            for chave in {normalizar_pessoa(emprestimo['pessoa']) for emprestimo in antigos}:
+                restantes = [e for e in self._emprestimos_por_pessoa.get(chave, ()) if e['id'] not in ids]
+                if restantes:
+                    self._emprestimos_por_pessoa[chave] = restantes
+                else:
+                    self._emprestimos_por_pessoa.pop(chave, None)
+        # Devolvidos não estão entre os atrasados e suas entradas no heap já são descartadas ao vencer
+        self._alterados['emprestimos'] |= ids
+        self.versao += 1
+        return len(ids)
+    
+    def emprestimos_ativos(self, pessoa: str) -> List[Dict[str, Any]]:
+        "Empréstimos em aberto da pessoa (sem diferenciar acentos, maiúsculas e espaços extras), por id"
+        self._verificar_indices()
+        return [emprestimo for emprestimo in self._emprestimos_por_pessoa.get(normalizar_pessoa(pessoa), ())
+                if not emprestimo['devolvido']]
+    
+    def multa_total(self, pessoa: str) -> float:
+        "Soma das multas da pessoa, incluindo as de empréstimos já movidos para o histórico"
+        self._verificar_indices()
+        chave = normalizar_pessoa(pessoa)
+        total = sum(emprestimo.get('multa') or 0 for emprestimo in self._emprestimos_por_pessoa.get(chave, ()))
+        return total + (self.historico.multa_de(chave) if self.historico else 0.0)
+    
+    def pode_emprestar(self, pessoa: str) -> bool:
+        "Indica se a pessoa está abaixo do limite de empréstimos em aberto"
+        if self.limite_emprestimos is None:
+            return True
+        self._verificar_indices()
+        return self._abertos_por_pessoa[normalizar_pessoa(pessoa)] < self.limite_emprestimos
+    
+    def historico_emprestimos(self, inicio: Optional[int] = None, fim: Optional[int] = None) -> List[Dict[str, Any]]:
+        "Empréstimos feitos entre inicio (incluso) e fim (excluso), da lista de trabalho e do histórico, por id"
+        self._aguardar_carga('dados')
+        with self._trava_registros:
+            resultado = {emprestimo['id']: emprestimo for emprestimo in self.emprestimos
+                         if (inicio is None or emprestimo['data_emprestimo'] >= inicio)
+                         and (fim is None or emprestimo['data_emprestimo'] < fim)}
+            if self.historico:
+                # Depois de uma gravação interrompida, um empréstimo pode estar nos dois; vale o da lista
+                for emprestimo in self.historico.consultar(inicio, fim):
+                    resultado.setdefault(emprestimo['id'], emprestimo)
+        return [resultado[emprestimo_id] for emprestimo_id in sorted(resultado)]
+    
+    def _salvar_segmentado(self, pasta: str) -> int:
+        "Regrava só os segmentos alterados desde o último salvamento nesta pasta; devolve os bytes gravados"
+        pasta = os.path.abspath(pasta)
+        geracao = self._sincronia[1] if self._sincronia and self._sincronia[0] == pasta else None
+        geracao, gravados = salvar_segmentos(pasta, self.livros, self.emprestimos, self.contador_id,
+                                             self._alterados, geracao, self._proximo_emprestimo_id)
+        self._sincronia = (pasta, geracao)
+        self._alterados = {'livros': set(), 'emprestimos': set()}
+        self._acompanhar_registros()
+        return gravados
+    
+    def _acompanhar_registros(self):
+        "Faz cada registro avisar quando é alterado, para o próximo salvamento saber que segmento regravar"
+        # Registros cadastrados depois ficam em segmentos novos, que são gravados de qualquer forma
+        for registros in (self.livros, self.emprestimos):
+            for registro in registros:
+                if isinstance(registro, Registro):
+                    registro._dono = self
+    
+    def _registro_alterado(self, registro: Registro):
+        "Chamado pelo registro alterado direto (ex.: livro['titulo'] = ...)"
+        secao = 'livros' if isinstance(registro, Livro) else 'emprestimos'
+        if 'id' in registro:
+            self._alterados[secao].add(registro['id'])
     
     def carregar_dados(self, arquivo: str = 'biblioteca.json'):
-        "Carrega os dados da biblioteca de arquivo JSON"
+        "Carrega os dados da biblioteca de arquivo JSON, JSON Lines, binário ou segmentado"
+        self._descartar_carga_com_falha()
+        self._aguardar_carga('indices')
+        with self._trava_registros:
+            self._ler_dados(arquivo)
+            # Listas comuns ganham os índices já; o snapshot binário deixa para o primeiro uso
+            if not self._indices_prontos and not isinstance(self.livros, RegistrosMapeados):
+                self._reconstruir_indices()
+            
+            if self._diario_pertence_a(arquivo):
+                self._reproduzir_diario()
+    
+    def carregar_em_segundo_plano(self, arquivo: str = 'biblioteca.json',
+                                  ao_aguardar: Optional[Callable[[Carga, bool], Any]] = None, lote: int = 500) -> Carga:
+        "Carrega os dados numa thread e devolve logo; cada operação espera só pela etapa de que precisa"
+        self._descartar_carga_com_falha()
+        self._aguardar_carga('indices')
+        if isinstance(self._trava_registros, contextlib.nullcontext):
+            # A thread de carga e quem usa a biblioteca passam a disputar os registros
+            self._trava_registros = threading.RLock()
+        carga = Carga(ao_aguardar)
+        self._carga = carga
+        # Daqui em diante quem lê os índices passa a esperar a carga
+        self._indices_prontos = False
+        carga.iniciar(self._carregar_aos_poucos, arquivo, carga, lote)
+        return carga
+    
+    def _carregar_aos_poucos(self, arquivo: str, carga: Carga, lote: int):
+        "Corpo da thread de carga: registros e diário de uma vez, depois os índices lote a lote"
+        try:
+            with self._trava_registros:
+                carga.comecar('dados')
+                self._ler_dados(arquivo)
+                # Os dados só ficam prontos com o diário reaplicado: antes disso, registros que
+                # só existem no diário pareceriam não existir
+                if self._diario_pertence_a(arquivo):
+                    self._reproduzir_diario()
+                carga.concluir('dados')
+            
+            if not self._indices_prontos:
+                carga.comecar('indices', len(self.livros))
+                passos = self._construir_indices(lote)
+                while True:
+                    with self._trava_registros:
+                        passo = next(passos, None)
+                    if passo is None:
+                        break
+                    carga.progredir(*passo)
+            carga.concluir('indices')
+        except BaseException as erro:
+            # A carga com falha continua registrada: toda operação seguinte (inclusive salvar, que
+            # gravaria a biblioteca vazia por cima do arquivo) recebe o erro até uma nova carga
+            carga.falhar(erro)
+        else:
+            if self._carga is carga:
+                self._carga = None
+    
+    def _aguardar_carga(self, etapa: str):
+        "Espera a etapa da carga em segundo plano, se houver uma; se ela falhou, levanta RuntimeError"
+        carga = self._carga
+        if carga is not None:
+            carga.aguardar(etapa)
+    
+    def aguardar_dados(self):
+        "Espera os registros da carga em segundo plano (sem os índices), para quem lê livros e emprestimos direto"
+        self._aguardar_carga('dados')
+    
+    def _descartar_carga_com_falha(self):
+        "Uma nova carga substitui a que falhou"
+        carga = self._carga
+        if carga is not None and carga.erro is not None:
+            self._carga = None
+    
+    @property
+    def erro_carga(self) -> Optional[BaseException]:
+        "Erro da carga em segundo plano, se ela falhou; até uma nova carga, as operações são recusadas"
+        carga = self._carga
+        return carga.erro if carga is not None else None
+    
+    def _ler_dados(self, arquivo: str):
+        "Lê só os registros do arquivo; dos índices, ficam prontos apenas os por id"
         try:
+            if eh_armazem_segmentado(arquivo):
+                self._ler_segmentos(arquivo)
+                return
+            if eh_snapshot_binario(arquivo):
+                self._abrir_snapshot_binario(arquivo)
+                return
             with open(arquivo, 'r', encoding='utf-8') as f:
+                if _eh_json_lines(arquivo):
+                    self._ler_json_lines(f)
+                    return
                 dados = json.load(f)
-            
-            self.livros = dados.get('livros', [])
-            self.emprestimos = dados.get('emprestimos', [])
-            self.contador_id = dados.get('contador_id', 1)
         except FileNotFoundError:
             print("Arquivo não encontrado. Iniciando biblioteca vazia.")
+            return
+        
+        if dados.get('formato_datas') != FORMATO_DATAS:
+            # Arquivo de versão antiga: as datas em texto ISO viram instantes
+            migrar_datas(dados.get('livros', []))
+            migrar_datas(dados.get('emprestimos', []))
+        self.livros = [Livro.de_dict(livro) for livro in dados.get('livros', [])]
+        self.emprestimos = [Emprestimo.de_dict(emprestimo) for emprestimo in dados.get('emprestimos', [])]
+        self.contador_id = dados.get('contador_id', 1)
+        self._emprestimo_id_salvo = dados.get('proximo_emprestimo_id', 1)
+        self._mapear_ids()
+    
+    def _ler_segmentos(self, pasta: str):
+        "Lê o armazenamento segmentado e passa a acompanhar o que muda em relação a ele"
+        self.livros, self.emprestimos, manifesto = carregar_segmentos(pasta)
+        self.contador_id = manifesto['contador_id']
+        self._emprestimo_id_salvo = manifesto.get('proximo_emprestimo_id', 1)
+        self._mapear_ids()
+        self._sincronia = (os.path.abspath(pasta), manifesto['geracao'])
+        self._alterados = {'livros': set(), 'emprestimos': set()}
+        self._acompanhar_registros()
+    
+    def _mapear_ids(self):
+        "Monta só os índices por id, que bastam para cadastrar, emprestar e devolver"
+        self._sincronia = None
+        self._livros_por_id = {livro['id']: livro for livro in self.livros}
+        self._emprestimos_por_id = {emprestimo['id']: emprestimo for emprestimo in self.emprestimos}
+        self._proximo_emprestimo_id = max(max(self._emprestimos_por_id, default=0) + 1, self._primeiro_emprestimo_id())
+        self._indices_prontos = False
+        self.versao += 1
+    
+    def _abrir_snapshot_binario(self, arquivo: str):
+        "Mapeia o snapshot binário; registros e índices ficam para quando forem usados"
+        snapshot = SnapshotBinario(arquivo)
+        self.livros = snapshot.registros('livros')
+        self.emprestimos = snapshot.registros('emprestimos')
+        self.contador_id = snapshot.contador_id
+        self._emprestimo_id_salvo = snapshot.proximo_emprestimo_id
+        self._proximo_emprestimo_id = self._primeiro_emprestimo_id()
+        self._livros_por_id = {}
+        self._emprestimos_por_id = {}
+        self._indices_prontos = False
+        self._sincronia = None
+        self.versao += 1
+    
+    def _escrever_json_lines(self, f):
+        "Escreve um cabeçalho e depois um registro por linha, como lista de valores"
+        # Listas de valores evitam repetir as chaves em cada linha. Campo ausente no meio vira
+        # AUSENTE_JSONL (no fim, como o data_devolucao de um empréstimo aberto, é só omitido)
+        # e campos fora das colunas (ex.: preço) vão num objeto a mais no fim da linha
+        def linha(tipo, registro, campos):
+            valores = [registro.get(campo, AUSENTE_JSONL) for campo in campos]
+            extras = _extras(registro, campos)
+            if extras:
+                valores.append(extras)
+            else:
+                while valores and valores[-1] is AUSENTE_JSONL:
+                    valores.pop()
+            return json.dumps([tipo] + valores, ensure_ascii=False, separators=(',', ':')) + '\n'
+        
+        f.write(json.dumps({'contador_id': self.contador_id, 'proximo_emprestimo_id': self._proximo_emprestimo_id,
+                            'formato_datas': FORMATO_DATAS,
+                            'livro': CAMPOS_LIVRO, 'emprestimo': CAMPOS_EMPRESTIMO}) + '\n')
+        f.writelines(linha('livro', livro, CAMPOS_LIVRO) for livro in self.livros)
+        f.writelines(linha('emprestimo', emprestimo, CAMPOS_EMPRESTIMO) for emprestimo in self.emprestimos)
+    
+    def _ler_json_lines(self, f):
+        "Lê um registro por vez, montando as listas e os índices por id à medida que avança"
+        self.livros = []
+        self.emprestimos = []
+        self.contador_id = 1
+        cabecalho, registros = _percorrer_json_lines(f)
+        self.contador_id = cabecalho.get('contador_id', 1)
+        self._emprestimo_id_salvo = cabecalho.get('proximo_emprestimo_id', 1)
+        self._mapear_ids()
+        
+        inserir = {'livro': self._inserir_livro, 'emprestimo': self._inserir_emprestimo}
+        for tipo, registro in registros:
+            inserir[tipo](registro)
+    
+    def ativar_diario(self, arquivo: str = 'biblioteca.json', fsync: bool = False):
+        "Passa a registrar cada alteração no diário do snapshot informado"
+        self.desativar_diario()
+        self._arquivo_snapshot = os.path.abspath(arquivo)
+        self._fsync_diario = fsync
+        self._diario = open(self.caminho_diario, 'a', encoding='utf-8')
+    
+    def desativar_diario(self):
+        "Fecha o diário, se estiver ativo"
+        if self._diario:
+            self._diario.close()
+        self._diario = None
+        self._arquivo_snapshot = None
+    
+    def ativar_metricas(self, metricas: Optional[Metricas] = None) -> Metricas:
+        "Passa a medir chamadas, latência e erros dos métodos públicos e da persistência"
+        self.desativar_metricas()
+        self.metricas = metricas or self.metricas or Metricas()
+        instrumentar(self, self.metricas, self._metodos_medidos())
+        return self.metricas
+    
+    def desativar_metricas(self):
+        "Para de medir; o que já foi medido continua em self.metricas"
+        desinstrumentar(self, self._metodos_medidos())
+    
+    @property
+    def metricas_ativas(self) -> bool:
+        "Indica se as chamadas estão sendo medidas"
+        return 'buscar_livros' in vars(self)
+    
+    def _metodos_medidos(self) -> List[str]:
+        "Métodos públicos da classe (exceto os de ligar e desligar as métricas) e os de persistência"
+        publicos = [nome for nome, _ in inspect.getmembers(type(self), inspect.isfunction)
+                    if not nome.startswith('_') and nome not in ('ativar_metricas', 'desativar_metricas')]
+        return publicos + [nome for nome in METODOS_PERSISTENCIA if hasattr(type(self), nome)]
+    
+    @property
+    def caminho_diario(self) -> Optional[str]:
+        "Caminho do arquivo de diário associado ao snapshot"
+        return self._arquivo_snapshot + '.diario' if self._arquivo_snapshot else None
+    
+    def compactar_diario(self):
+        "Incorpora o diário ao snapshot e o esvazia"
+        if not self._diario:
+            raise ValueError("Diário não está ativo")
+        self.salvar_dados(self._arquivo_snapshot)
+    
+    def _diario_pertence_a(self, arquivo: str) -> bool:
+        "Indica se o diário ativo acompanha o snapshot informado"
+        return self._diario is not None and os.path.abspath(arquivo) == self._arquivo_snapshot
+    
+    def _registrar_no_diario(self, registro: Dict[str, Any]):
+        "Acrescenta uma linha compacta ao diário"
+        self._registrar_lote_no_diario((registro,))
+    
+    def _registrar_lote_no_diario(self, registros: Iterable[Dict[str, Any]]):
+        "Acrescenta vários registros ao diário com uma única descarga em disco"
+        if not self._diario:
+            return
+        linhas = [json.dumps(registro, ensure_ascii=False, separators=(',', ':'), default=dict) + '\n'
+                  for registro in registros]
+        with self._trava_diario:
+            self._diario.writelines(linhas)
+            self._diario.flush()
+            if self._fsync_diario:
+                os.fsync(self._diario.fileno())
+    
+    def _reproduzir_diario(self):
+        "Reaplica sobre o snapshot carregado as alterações registradas no diário"
+        self._diario.flush()
+        with open(self.caminho_diario, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha incompleta de uma gravação interrompida
+                    break
+                self._aplicar_registro(registro)
+    
+    def _aplicar_registro(self, registro: Dict[str, Any]):
+        "Aplica um registro do diário; registros já presentes no snapshot são ignorados"
+        # Diários de versões antigas trazem datas em texto ISO
+        operacao = registro['op']
+        if operacao == 'cadastrar':
+            if self._obter_livro(registro['livro']['id']) is None:
+                migrar_datas((registro['livro'],))
+                self._inserir_livro(registro['livro'])
+        elif operacao == 'emprestar':
+            if self._obter_emprestimo(registro['emprestimo']['id']) is None:
+                migrar_datas((registro['emprestimo'],))
+                self._inserir_emprestimo(registro['emprestimo'])
+        elif operacao == 'devolver':
+            emprestimo = self._obter_emprestimo(registro['id'])
+            if emprestimo and not emprestimo['devolvido']:
+                self._concluir_devolucao(emprestimo, para_instante(registro['data_devolucao']), registro['multa'])
+
 
 
 
+def criar_biblioteca(backend: str = 'memoria', **opcoes) -> Biblioteca:
+    "Cria uma biblioteca com o backend escolhido ('memoria', 'sqlite' ou 'fragmentado')"
+    if backend == 'memoria':
+        return Biblioteca(**opcoes)
+    if backend == 'sqlite':
+        from biblioteca_sqlite import BibliotecaSQLite
+        return BibliotecaSQLite(**opcoes)
+    if backend == 'fragmentado':
+        from fragmentos import BibliotecaFragmentada
+        return BibliotecaFragmentada(**opcoes)
+    raise ValueError(f"Backend desconhecido: {backend}")
+
+
+def converter_arquivo(origem: str, destino: str):
+    "Converte o snapshot entre JSON, JSON Lines, binário e segmentado, conforme a extensão de cada arquivo"
+    if not os.path.exists(origem):
+        raise FileNotFoundError(f"Arquivo não encontrado: {origem}")
+    biblioteca = Biblioteca(indexar_busca=False)
+    # Alterações ainda só no diário da origem também vão para o destino
+    if os.path.exists(origem + '.diario'):
+        biblioteca.ativar_diario(origem)
+    biblioteca.carregar_dados(origem)
+    biblioteca.desativar_diario()
+    biblioteca.salvar_dados(destino)
+
 
 def criar_funcao_desconto(percentual: float) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
     "Cria uma função de desconto"
     
     def aplicar_desconto(livro: Dict[str, Any]) -> Dict[str, Any]:
-        livro_com_desconto = livro.copy()
-        if 'preco' in livro_com_desconto:
-            livro_com_desconto['preco'] *= (1 - percentual)
-        return livro_com_desconto
+        # Sobrepõe o preço em vez de copiar o livro inteiro; a visão é só de leitura, então
+        # quem recebe não altera o acervo. Sem preço, devolve uma cópia, como sempre
+        if 'preco' in livro:
+            return LivroComPreco(livro, livro['preco'] * (1 - percentual))
+        return dict(livro)
     
     return aplicar_desconto
 
@@ -195,24 +1120,10 @@ def processar_livros_funcional(livros: List[Dict[str, Any]],
                               transformacao: Callable[[Dict[str, Any]], Any]) -> List[Any]:
     "Processa livros"
                                   
-    return [transformacao(livro) for livro in livros if filtro(livro)]
+    return Consulta(livros).onde(filtro).mapear(transformacao).listar()
 
 
 def calcular_estatisticas_livros(livros: List[Dict[str, Any]]) -> Dict[str, Any]:
     "Calcula estatísticas dos livros"
-    if not livros:
-        return {'total': 0, 'media_ano': 0, 'categorias_unicas': 0}
-    
-  
-    anos = [livro['ano'] for livro in livros]
-    
-  
-    categorias_unicas = len(set(livro['categoria'] for livro in livros))
-    
-    return {
-        'total': len(livros),
-        'media_ano': sum(anos) / len(anos),
-        'categorias_unicas': categorias_unicas,
-        'ano_mais_antigo': min(anos),
-        'ano_mais_recente': max(anos)
-    }
+    
+    return EstatisticasAcervo(livros).resumo()
@@ -0,0 +1,389 @@
+"Backend SQLite para o Sistema de Gerenciamento de Biblioteca Pessoal"
+"Mantém livros e empréstimos em tabelas indexadas, com uma transação por operação"
+
+from collections import Counter
+from typing import List, Dict, Any, Callable, Optional, Iterable, Union
+import contextlib
+import os
+import sqlite3
+
+from biblioteca import Biblioteca, CAMPOS_BUSCA, _ler_entradas_de_arquivo, _normalizar_entradas
+from busca import montar_pagina, normalizar, normalizar_pessoa, ranquear, validar_pagina
+from carga import Carga
+from consulta import Consulta
+from datas import SEGUNDOS_POR_DIA, agora, de_iso
+from estatisticas import EstatisticasAcervo
+from segmentos import salvar_segmentos
+
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS livros (
+    id INTEGER PRIMARY KEY,
+    titulo TEXT NOT NULL,
+    autor TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    categoria TEXT NOT NULL,
+    disponivel INTEGER NOT NULL DEFAULT 1,
+    data_cadastro INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_livros_titulo ON livros (titulo);
+CREATE INDEX IF NOT EXISTS idx_livros_autor ON livros (autor);
+CREATE INDEX IF NOT EXISTS idx_livros_categoria ON livros (categoria);
+
+CREATE TABLE IF NOT EXISTS emprestimos (
+    id INTEGER PRIMARY KEY,
+    livro_id INTEGER NOT NULL REFERENCES livros (id),
+    pessoa TEXT NOT NULL,
+    data_emprestimo INTEGER NOT NULL,
+    data_vencimento INTEGER NOT NULL,
+    devolvido INTEGER NOT NULL DEFAULT 0,
+    data_devolucao INTEGER,
+    multa REAL
+);
+CREATE INDEX IF NOT EXISTS idx_emprestimos_livro ON emprestimos (livro_id);
+CREATE INDEX IF NOT EXISTS idx_emprestimos_abertos ON emprestimos (data_vencimento) WHERE devolvido = 0;
+"""
+
+# Chave normalizada da pessoa de cada empréstimo, mantida por gatilho; depende da função
+# normalizar_pessoa registrada na conexão
+ESQUEMA_PESSOAS = """
+CREATE TABLE IF NOT EXISTS emprestimos_pessoa (
+    emprestimo_id INTEGER PRIMARY KEY REFERENCES emprestimos (id),
+    chave TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_emprestimos_pessoa_chave ON emprestimos_pessoa (chave);
+CREATE TRIGGER IF NOT EXISTS emprestimos_pessoa_inserir AFTER INSERT ON emprestimos BEGIN
+    INSERT OR REPLACE INTO emprestimos_pessoa (emprestimo_id, chave) VALUES (new.id, normalizar_pessoa(new.pessoa));
+END;
+"""
+
+# Versão 1: datas como instantes em vez de texto ISO; versão 2: índice de trigramas normalizado;
+# versão 3: chaves de pessoa dos empréstimos já existentes
+VERSAO_ESQUEMA = 3
+MIGRACAO_DATAS = """
+UPDATE livros SET data_cadastro = de_iso(data_cadastro) WHERE data_cadastro GLOB '*-*';
+UPDATE emprestimos SET data_emprestimo = de_iso(data_emprestimo) WHERE data_emprestimo GLOB '*-*';
+UPDATE emprestimos SET data_vencimento = de_iso(data_vencimento) WHERE data_vencimento GLOB '*-*';
+UPDATE emprestimos SET data_devolucao = de_iso(data_devolucao) WHERE data_devolucao GLOB '*-*';
+"""
+
+# Índice de trigramas das chaves normalizadas (sem acentos) para busca por substring;
+# depende do FTS5 compilado no SQLite e da função normalizar registrada na conexão
+ESQUEMA_BUSCA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS livros_busca USING fts5 (
+    titulo, autor, categoria, content='', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS livros_busca_inserir AFTER INSERT ON livros BEGIN
+    INSERT INTO livros_busca (rowid, titulo, autor, categoria)
+    VALUES (new.id, normalizar(new.titulo), normalizar(new.autor), normalizar(new.categoria));
+END;
+"""
+MIGRACAO_BUSCA = """
+DROP TRIGGER IF EXISTS livros_busca_inserir;
+DROP TABLE IF EXISTS livros_busca;
+""" + ESQUEMA_BUSCA + """
+INSERT INTO livros_busca (rowid, titulo, autor, categoria)
+SELECT id, normalizar(titulo), normalizar(autor), normalizar(categoria) FROM livros;
+"""
+MIGRACAO_PESSOAS = """
+INSERT OR REPLACE INTO emprestimos_pessoa (emprestimo_id, chave) SELECT id, normalizar_pessoa(pessoa) FROM emprestimos;
+"""
+
+
+def _contem(campo: str, termo: str) -> bool:
+    "Mesma regra de Biblioteca.buscar_livros: o termo, já normalizado, aparece no campo sem acentos"
+    return termo in normalizar(campo)
+
+
+def _livro_de_linha(linha: sqlite3.Row) -> Dict[str, Any]:
+    "Converte uma linha da tabela livros no dicionário usado pela biblioteca"
+    livro = dict(linha)
+    livro['disponivel'] = bool(livro['disponivel'])
+    # Em bancos migrados a coluna ainda é TEXT e o instante volta como texto
+    livro['data_cadastro'] = int(livro['data_cadastro'])
+    return livro
+
+
+def _emprestimo_de_linha(linha: sqlite3.Row) -> Dict[str, Any]:
+    "Converte uma linha da tabela emprestimos no dicionário usado pela biblioteca"
+    emprestimo = dict(linha)
+    emprestimo['devolvido'] = bool(emprestimo['devolvido'])
+    emprestimo['data_emprestimo'] = int(emprestimo['data_emprestimo'])
+    emprestimo['data_vencimento'] = int(emprestimo['data_vencimento'])
+    # Empréstimos abertos não têm estes campos, como no backend em memória
+    if emprestimo['data_devolucao'] is None:
+        del emprestimo['data_devolucao']
+        del emprestimo['multa']
+    else:
+        emprestimo['data_devolucao'] = int(emprestimo['data_devolucao'])
+    return emprestimo
+
+
+class BibliotecaSQLite(Biblioteca):
+    "Biblioteca persistida em SQLite; livros e emprestimos são lidos do banco"
+
+    def __init__(self, caminho: str = 'biblioteca.db', limite_emprestimos: Optional[int] = None):
+        self.caminho = caminho
+        self.limite_emprestimos = limite_emprestimos
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.row_factory = sqlite3.Row
+        self._conexao.create_function('contem', 2, _contem, deterministic=True)
+        self._conexao.create_function('normalizar', 1, normalizar, deterministic=True)
+        self._conexao.create_function('normalizar_pessoa', 1, normalizar_pessoa, deterministic=True)
+        self._conexao.executescript(ESQUEMA)
+        self._conexao.executescript(ESQUEMA_PESSOAS)
+        try:
+            self._conexao.executescript(ESQUEMA_BUSCA)
+            self._busca_indexada = True
+        except sqlite3.OperationalError:
+            self._busca_indexada = False
+        self._migrar_esquema()
+        self._diario = None
+        self._trava_registros = contextlib.nullcontext()
+        self._contagem_cache = Counter()
+        self.metricas = None
+        self._carga = None
+        self.historico = None
+
+    def _migrar_esquema(self):
+        "Atualiza uma única vez bancos de versões antigas"
+        versao = self._conexao.execute("PRAGMA user_version").fetchone()[0]
+        if versao >= VERSAO_ESQUEMA:
+            return
+        self._conexao.create_function('de_iso', 1, de_iso, deterministic=True)
+        with self._conexao:
+            if versao < 1:
+                self._conexao.executescript(MIGRACAO_DATAS)
+            if versao < 2 and self._busca_indexada:
+                self._conexao.executescript(MIGRACAO_BUSCA)
+            if versao < 3:
+                self._conexao.executescript(MIGRACAO_PESSOAS)
+            self._conexao.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+
+    def fechar(self):
+        "Fecha a conexão com o banco"
+        self._conexao.close()
+
+    @property
+    def livros(self) -> List[Dict[str, Any]]:
+        return [_livro_de_linha(l) for l in self._conexao.execute("SELECT * FROM livros ORDER BY id")]
+
+    @property
+    def emprestimos(self) -> List[Dict[str, Any]]:
+        return [_emprestimo_de_linha(e) for e in self._conexao.execute("SELECT * FROM emprestimos ORDER BY id")]
+
+    @property
+    def contador_id(self) -> int:
+        return self._conexao.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM livros").fetchone()[0]
+
+    def cadastrar_livro(self, titulo: str, autor: str, ano: int, categoria: str) -> Dict[str, Any]:
+        "Cadastra um livro em uma transação"
+        with self._conexao:
+            cursor = self._conexao.execute(
+                "INSERT INTO livros (titulo, autor, ano, categoria, disponivel, data_cadastro) VALUES (?, ?, ?, ?, 1, ?)",
+                (titulo, autor, ano, categoria, agora()))
+        return self._obter_livro(cursor.lastrowid)
+
+    def cadastrar_livros_em_lote(self, fonte: Union[str, Iterable[Any]]) -> List[Dict[str, Any]]:
+        "Cadastra vários livros com um único executemany em uma transação"
+        entradas = _ler_entradas_de_arquivo(fonte) if isinstance(fonte, str) else fonte
+        data_cadastro = agora()
+        with self._conexao:
+            primeiro_id = self.contador_id
+            self._conexao.executemany(
+                "INSERT INTO livros (titulo, autor, ano, categoria, disponivel, data_cadastro) VALUES (?, ?, ?, ?, 1, ?)",
+                (entrada + (data_cadastro,) for entrada in _normalizar_entradas(entradas)))
+        linhas = self._conexao.execute("SELECT * FROM livros WHERE id >= ? ORDER BY id", (primeiro_id,))
+        return [_livro_de_linha(l) for l in linhas]
+
+    def buscar_livros(self, criterio: str, valor: str) -> List[Dict[str, Any]]:
+        "Busca por substring usando o índice de trigramas quando possível"
+        if criterio not in CAMPOS_BUSCA:
+            termo = normalizar(valor)
+            return [livro for livro in self.livros if termo in normalizar(livro[criterio])]
+        return [_livro_de_linha(l) for l in self._linhas_encontradas(criterio, valor)]
+
+    def buscar_ranqueado(self, criterio: str, valor: str, limite: int = 10, pagina: int = 1) -> Dict[str, Any]:
+        "Ranqueia as linhas filtradas pelo banco, guardando só as melhores"
+        validar_pagina(limite, pagina)
+        if criterio in CAMPOS_BUSCA:
+            pares = ((normalizar(linha[criterio]), linha) for linha in self._linhas_encontradas(criterio, valor))
+        else:
+            pares = ((normalizar(livro[criterio]), livro) for livro in self.livros)
+        total, melhores = ranquear(pares, normalizar(valor), limite * pagina)
+        pagina_resultados = montar_pagina(total, melhores, limite, pagina)
+        pagina_resultados['livros'] = [_livro_de_linha(linha) if isinstance(linha, sqlite3.Row) else linha
+                                       for linha in pagina_resultados['livros']]
+        return pagina_resultados
+
+    def _linhas_encontradas(self, criterio: str, valor: str) -> sqlite3.Cursor:
+        "Linhas com o valor no campo de busca, pelo índice de trigramas quando possível"
+        termo = normalizar(valor)
+        if self._busca_indexada and len(termo) >= 3:
+            frase = '"' + termo.replace('"', '""') + '"'
+            consulta = (f"SELECT * FROM livros WHERE id IN "
+                        f"(SELECT rowid FROM livros_busca WHERE livros_busca MATCH ?) "
+                        f"AND contem({criterio}, ?) ORDER BY id")
+            parametros = (f"{criterio} : {frase}", termo)
+        else:
+            consulta = f"SELECT * FROM livros WHERE contem({criterio}, ?) ORDER BY id"
+            parametros = (termo,)
+        return self._conexao.execute(consulta, parametros)
+
+    def filtrar_livros_por_categoria(self, categoria: str) -> List[Dict[str, Any]]:
+        "Filtra livros por categoria pelo índice da coluna"
+        linhas = self._conexao.execute("SELECT * FROM livros WHERE categoria = ? ORDER BY id", (categoria,))
+        return [_livro_de_linha(l) for l in linhas]
+
+    def consultar(self) -> Consulta:
+        "Consulta preguiçosa sobre os livros lidos do banco, sem os índices em memória"
+        return Consulta(self.livros)
+
+    def emprestar_livro(self, livro_id: int, pessoa: str) -> Dict[str, Any]:
+        "Registra empréstimo de um livro em uma transação"
+        instante = agora()
+        with self._conexao:
+            atualizados = self._conexao.execute(
+                "UPDATE livros SET disponivel = 0 WHERE id = ? AND disponivel = 1", (livro_id,)).rowcount
+            if not atualizados:
+                if not self._obter_livro(livro_id):
+                    raise ValueError("Livro não encontrado")
+                raise ValueError("Livro não está disponível")
+            # Dentro da transação: recusar desfaz a marcação do livro
+            if self.limite_emprestimos is not None and \
+                    len(self.emprestimos_ativos(pessoa)) >= self.limite_emprestimos:
+                raise ValueError(f"Limite de {self.limite_emprestimos} empréstimos em aberto atingido")
+
+            cursor = self._conexao.execute(
+                "INSERT INTO emprestimos (livro_id, pessoa, data_emprestimo, data_vencimento, devolvido) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (livro_id, pessoa, instante, instante + 15 * SEGUNDOS_POR_DIA))
+        return self._obter_emprestimo(cursor.lastrowid)
+
+    def devolver_livro(self, emprestimo_id: int) -> Dict[str, Any]:
+        "Registra devolução de um livro em uma transação"
+        with self._conexao:
+            emprestimo = self._obter_emprestimo(emprestimo_id)
+            if not emprestimo:
+                raise ValueError("Empréstimo não encontrado")
+            if emprestimo['devolvido']:
+                raise ValueError("Livro já foi devolvido")
+
+            data_vencimento = emprestimo['data_vencimento']
+            data_devolucao = agora()
+            multa = 0
+            if data_devolucao > data_vencimento:
+                multa = (data_devolucao - data_vencimento) // SEGUNDOS_POR_DIA * 2.0
+
+            self._conexao.execute(
+                "UPDATE emprestimos SET devolvido = 1, data_devolucao = ?, multa = ? WHERE id = ?",
+                (data_devolucao, multa, emprestimo_id))
+            self._conexao.execute("UPDATE livros SET disponivel = 1 WHERE id = ?", (emprestimo['livro_id'],))
+        return self._obter_emprestimo(emprestimo_id)
+
+    def _emprestimos_da_pessoa(self, pessoa: str, condicao: str = '') -> sqlite3.Cursor:
+        "Empréstimos da pessoa pelo índice de chaves, com uma condição opcional sobre o empréstimo (e)"
+        return self._conexao.execute(
+            "SELECT e.* FROM emprestimos_pessoa p JOIN emprestimos e ON e.id = p.emprestimo_id "
+            f"WHERE p.chave = ? {condicao} ORDER BY e.id", (normalizar_pessoa(pessoa),))
+
+    def emprestimos_ativos(self, pessoa: str) -> List[Dict[str, Any]]:
+        "Empréstimos em aberto da pessoa, pelo índice de chaves"
+        return [_emprestimo_de_linha(linha) for linha in self._emprestimos_da_pessoa(pessoa, "AND e.devolvido = 0")]
+
+    def multa_total(self, pessoa: str) -> float:
+        "Soma das multas da pessoa; neste backend o histórico inteiro fica no banco"
+        return sum(linha['multa'] or 0 for linha in self._emprestimos_da_pessoa(pessoa))
+
+    def pode_emprestar(self, pessoa: str) -> bool:
+        "Indica se a pessoa está abaixo do limite de empréstimos em aberto"
+        return self.limite_emprestimos is None or len(self.emprestimos_ativos(pessoa)) < self.limite_emprestimos
+
+    def gerar_relatorio(self) -> Dict[str, Any]:
+        "Gera relatório com agregações no banco"
+        instante = agora()
+        total_livros, livros_disponiveis = self._conexao.execute(
+            "SELECT COUNT(*), COALESCE(SUM(disponivel), 0) FROM livros").fetchone()
+        em_atraso = self._conexao.execute(
+            "SELECT COUNT(*) FROM emprestimos WHERE devolvido = 0 AND data_vencimento < ?",
+            (instante,)).fetchone()[0]
+
+        livros_por_categoria = {}
+        for categoria, titulo in self._conexao.execute("SELECT categoria, titulo FROM livros ORDER BY id"):
+            livros_por_categoria.setdefault(categoria, []).append(titulo)
+
+        return {
+            'total_livros': total_livros,
+            'livros_disponiveis': livros_disponiveis,
+            'livros_emprestados': total_livros - livros_disponiveis,
+            'livros_por_categoria': livros_por_categoria,
+            'emprestimos_em_atraso': em_atraso,
+            'data_relatorio': instante
+        }
+
+    @property
+    def estatisticas(self) -> EstatisticasAcervo:
+        "Estatísticas montadas a partir das colunas ano e categoria do banco"
+        return EstatisticasAcervo(self._conexao.execute("SELECT ano, categoria FROM livros ORDER BY id").fetchall())
+
+    def calcular_estatisticas(self) -> Dict[str, Any]:
+        "Calculadas a cada chamada: outras conexões podem alterar o banco sem passar por esta instância"
+        return self.estatisticas.resumo()
+
+    def ativar_historico(self, pasta: str = 'biblioteca.historico', horizonte_dias: int = 365):
+        "Não se aplica a este backend: empréstimos antigos ficam no banco, consultados pelos índices das tabelas"
+        raise ValueError("O backend SQLite não usa histórico em partições")
+
+    def ativar_diario(self, arquivo: str = 'biblioteca.json', fsync: bool = False):
+        "Não se aplica a este backend: cada alteração já é confirmada numa transação do banco"
+        raise ValueError("O backend SQLite não usa diário de alterações")
+
+    def carregar_em_segundo_plano(self, arquivo: str = 'biblioteca.json',
+                                  ao_aguardar: Optional[Callable[[Carga, bool], Any]] = None, lote: int = 500) -> Carga:
+        "Não se aplica a este backend: os registros são lidos do banco a cada consulta"
+        raise ValueError("O backend SQLite não carrega arquivos em segundo plano; use carregar_dados")
+
+    @property
+    def _proximo_emprestimo_id(self) -> int:
+        "Id que o banco dará ao próximo empréstimo (o maior + 1), gravado junto ao exportar"
+        return self._conexao.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM emprestimos").fetchone()[0]
+
+    def _salvar_segmentado(self, pasta: str) -> int:
+        "Grava todos os segmentos: outras conexões podem alterar o banco sem passar por esta instância"
+        return salvar_segmentos(pasta, self.livros, self.emprestimos, self.contador_id,
+                                proximo_emprestimo_id=self._proximo_emprestimo_id)[1]
+
+    def carregar_dados(self, arquivo: str = 'biblioteca.json'):
+        "Importa um arquivo JSON ou JSON Lines, substituindo o conteúdo do banco"
+        if not os.path.exists(arquivo):
+            print("Arquivo não encontrado. Mantendo os dados do banco.")
+            return
+
+        origem = Biblioteca(indexar_busca=False)
+        origem.carregar_dados(arquivo)
+
+        with self._conexao:
+            self._conexao.execute("DELETE FROM emprestimos_pessoa")
+            self._conexao.execute("DELETE FROM emprestimos")
+            self._conexao.execute("DELETE FROM livros")
+            if self._busca_indexada:
+                self._conexao.execute("INSERT INTO livros_busca (livros_busca) VALUES ('delete-all')")
+            self._conexao.executemany(
+                "INSERT INTO livros (id, titulo, autor, ano, categoria, disponivel, data_cadastro) "
+                "VALUES (:id, :titulo, :autor, :ano, :categoria, :disponivel, :data_cadastro)",
+                (dict(livro) for livro in origem.livros))
+            self._conexao.executemany(
+                "INSERT INTO emprestimos (id, livro_id, pessoa, data_emprestimo, data_vencimento, devolvido, "
+                "data_devolucao, multa) VALUES (:id, :livro_id, :pessoa, :data_emprestimo, :data_vencimento, "
+                ":devolvido, :data_devolucao, :multa)",
+                ({'data_devolucao': None, 'multa': None, **e} for e in origem.emprestimos))
+
+    def _obter_livro(self, livro_id: int) -> Optional[Dict[str, Any]]:
+        "Busca um livro pela chave primária"
+        linha = self._conexao.execute("SELECT * FROM livros WHERE id = ?", (livro_id,)).fetchone()
+        return _livro_de_linha(linha) if linha else None
+
+    def _obter_emprestimo(self, emprestimo_id: int) -> Optional[Dict[str, Any]]:
+        "Busca um empréstimo pela chave primária"
+        linha = self._conexao.execute("SELECT * FROM emprestimos WHERE id = ?", (emprestimo_id,)).fetchone()
+        return _emprestimo_de_linha(linha) if linha else None
@@ -0,0 +1,84 @@
+"Chaves de busca normalizadas e busca ranqueada do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Sem acentos e sem diferenciar maiúsculas: 'ficcao' encontra 'Ficção'"
+
+from math import ceil
+from typing import Any, Dict, Iterable, List, Tuple
+import heapq
+import unicodedata
+
+
+# Pontos de cada tipo de ocorrência do termo na chave
+PREFIXO = 3
+PALAVRA_INTEIRA = 2
+SUBSTRING = 1
+
+
+def normalizar(texto: str) -> str:
+    "Chave de busca: casefold e sem acentos"
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize('NFKD', texto.casefold())
+    return ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+
+def normalizar_pessoa(nome: str) -> str:
+    "Chave de uma pessoa: como normalizar, e com os espaços reduzidos a um entre as palavras"
+    return ' '.join(normalizar(nome).split())
+
+
+def pontuar(chave: str, termo: str) -> int:
+    "Pontos do termo (já normalizado) na chave: prefixo, palavra inteira, substring ou 0"
+    posicao = chave.find(termo)
+    if posicao < 0:
+        return 0
+    return PREFIXO if posicao == 0 else _pontuar_ocorrencias(chave, termo, posicao)
+
+
+def _pontuar_ocorrencias(chave: str, termo: str, posicao: int) -> int:
+    "Palavra inteira se alguma ocorrência, a partir da posição, tiver separadores dos dois lados"
+    fim = len(termo)
+    while posicao >= 0:
+        if not chave[posicao - 1].isalnum() and (posicao + fim == len(chave) or not chave[posicao + fim].isalnum()):
+            return PALAVRA_INTEIRA
+        posicao = chave.find(termo, posicao + 1)
+    return SUBSTRING
+
+
+def ranquear(pares: Iterable[Tuple[str, Dict[str, Any]]], termo: str,
+             quantidade: int) -> Tuple[int, List[Tuple[Tuple[int, int, int], Dict[str, Any]]]]:
+    "Total de ocorrências e as melhores (ordem, livro), da mais relevante para a menos relevante"
+    # Heap limitado à quantidade pedida, com o pior dos melhores no topo; a ordem é
+    # (pontos, -tamanho da chave, -id), então chaves mais curtas e ids menores desempatam
+    melhores: List[Tuple[Tuple[int, int, int], Dict[str, Any]]] = []
+    total = 0
+    for chave, livro in pares:
+        posicao = chave.find(termo)
+        if posicao < 0:
+            continue
+        total += 1
+        pontos = PREFIXO if posicao == 0 else _pontuar_ocorrencias(chave, termo, posicao)
+        if len(melhores) < quantidade:
+            heapq.heappush(melhores, ((pontos, -len(chave), -livro['id']), livro))
+        elif pontos >= melhores[0][0][0]:
+            ordem = (pontos, -len(chave), -livro['id'])
+            if ordem > melhores[0][0]:
+                heapq.heapreplace(melhores, (ordem, livro))
+    melhores.sort(key=lambda item: item[0], reverse=True)
+    return total, melhores
+
+
+def validar_pagina(limite: int, pagina: int):
+    "Limite e página começam em 1"
+    if limite < 1 or pagina < 1:
+        raise ValueError("Limite e página devem ser maiores que zero")
+
+
+def montar_pagina(total: int, melhores: List[Tuple[Any, Dict[str, Any]]], limite: int,
+                  pagina: int) -> Dict[str, Any]:
+    "Página de resultados a partir dos limite * pagina melhores"
+    return {
+        'total': total,
+        'pagina': pagina,
+        'paginas': ceil(total / limite),
+        'livros': [livro for _, livro in melhores[(pagina - 1) * limite:pagina * limite]],
+    }
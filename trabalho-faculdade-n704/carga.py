@@ -0,0 +1,93 @@
+"Carga em segundo plano do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Registros primeiro, índices depois; quem precisa de uma etapa espera só por ela, vendo o progresso"
+
+from typing import Any, Callable, Optional
+import threading
+
+
+# Etapas na ordem em que ficam prontas
+ETAPAS = ('dados', 'indices')
+
+
+class Carga:
+    "Andamento de uma carga em outra thread: etapa atual, progresso e um evento por etapa"
+
+    def __init__(self, ao_aguardar: Optional[Callable[['Carga', bool], Any]] = None, intervalo: float = 0.1):
+        self.etapa = 'iniciando'
+        self.feitos = 0
+        self.total = 0
+        self.erro: Optional[BaseException] = None
+        self._ao_aguardar = ao_aguardar
+        self._intervalo = intervalo
+        self._eventos = {etapa: threading.Event() for etapa in ETAPAS}
+        self._iniciada = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self, funcao: Callable[..., Any], *args):
+        "Dispara a thread e só retorna depois que ela avisar que começou (ex.: já segura a trava)"
+        self._thread = threading.Thread(target=funcao, args=args, name='carga-biblioteca', daemon=True)
+        self._thread.start()
+        self._iniciada.wait()
+
+    def comecar(self, etapa: str, total: int = 0):
+        "Chamado pela thread de carga ao entrar numa etapa"
+        self.etapa, self.feitos, self.total = etapa, 0, total
+        self._iniciada.set()
+
+    def progredir(self, feitos: int, total: int):
+        "Chamado pela thread de carga a cada lote"
+        self.feitos, self.total = feitos, total
+
+    def concluir(self, etapa: str):
+        "Marca a etapa (e as anteriores) como prontas"
+        for nome in ETAPAS[:ETAPAS.index(etapa) + 1]:
+            self._eventos[nome].set()
+        if etapa == ETAPAS[-1]:
+            self.etapa = 'pronta'
+
+    def falhar(self, erro: BaseException):
+        "Guarda o erro e libera quem estiver esperando, que recebe o erro"
+        self.erro = erro
+        self.etapa = 'falhou'
+        self._iniciada.set()
+        for evento in self._eventos.values():
+            evento.set()
+
+    @property
+    def concluida(self) -> bool:
+        "Indica se todas as etapas terminaram (com sucesso ou não)"
+        return self._eventos[ETAPAS[-1]].is_set()
+
+    def descricao(self) -> str:
+        "Texto curto do andamento, para mostrar ao usuário"
+        if self.etapa == 'indices':
+            return f"montando índices: {self.feitos}/{self.total} livros ({self.percentual:.0f}%)"
+        return {'pronta': "carga concluída", 'falhou': f"carga falhou: {self.erro}"}.get(self.etapa, "lendo registros")
+
+    @property
+    def percentual(self) -> float:
+        "Progresso da etapa atual, de 0 a 100"
+        if self.concluida:
+            return 100.0
+        return 100.0 * self.feitos / self.total if self.total else 0.0
+
+    def aguardar(self, etapa: str = ETAPAS[-1]):
+        "Espera a etapa ficar pronta, chamando ao_aguardar(carga, True) a cada intervalo e (carga, False) no fim"
+        # A própria thread de carga passa por aqui ao reaplicar o diário e não pode esperar por si
+        if threading.current_thread() is self._thread:
+            return
+        evento = self._eventos[etapa]
+        esperou = False
+        while not evento.wait(self._intervalo):
+            esperou = True
+            if self._ao_aguardar:
+                self._ao_aguardar(self, True)
+        if esperou and self._ao_aguardar:
+            self._ao_aguardar(self, False)
+        if self.erro is not None:
+            raise RuntimeError(f"Falha ao carregar os dados: {self.erro}") from self.erro
+
+    def juntar(self, tempo: Optional[float] = None):
+        "Espera a thread de carga terminar"
+        if self._thread is not None:
+            self._thread.join(tempo)
@@ -0,0 +1,221 @@
+"Consultas preguiçosas sobre o acervo do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Os estágios são geradores; filtros declarativos são levados até os índices da Biblioteca"
+
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import heapq
+
+from busca import normalizar
+
+
+FILTROS = ('igual', 'ano', 'contendo', 'filtrar')
+
+
+class Consulta:
+    "Consulta montada em estágios; nada é executado até ela ser iterada"
+
+    def __init__(self, livros: Sequence[Dict[str, Any]] = (), biblioteca: Any = None,
+                 estagios: Tuple[Tuple, ...] = ()):
+        # Com uma biblioteca, os livros são lidos dela na execução, então a consulta vê o acervo atual
+        self._livros = livros
+        self._biblioteca = biblioteca
+        self._estagios = estagios
+
+    def _com(self, *estagio) -> 'Consulta':
+        "Nova consulta com um estágio a mais; a original não muda"
+        return Consulta(self._livros, self._biblioteca, self._estagios + (estagio,))
+
+    def _com_filtro_declarativo(self, nome: str, *estagio) -> 'Consulta':
+        "Filtros declarativos olham campos do livro, então não podem vir depois de mapear"
+        if any(tipo == 'mapear' for tipo, *_ in self._estagios):
+            raise ValueError(f"{nome} filtra campos do livro e deve vir antes de mapear")
+        return self._com(*estagio)
+
+    def onde(self, funcao: Optional[Callable[[Any], bool]] = None, **campos) -> 'Consulta':
+        "Filtra por igualdade de campos (onde(categoria='Poesia')) ou por uma função"
+        consulta = self
+        if campos:
+            consulta = consulta._com_filtro_declarativo('onde', 'igual', campos)
+        if funcao is not None:
+            consulta = consulta._com('filtrar', funcao)
+        return consulta
+
+    def onde_ano(self, apos: Optional[int] = None, antes: Optional[int] = None,
+                 de: Optional[int] = None, ate: Optional[int] = None) -> 'Consulta':
+        "Filtra pelo ano: apos/antes são exclusivos, de/ate incluem o próprio ano"
+        limites = {'apos': apos, 'antes': antes, 'de': de, 'ate': ate}
+        return self._com_filtro_declarativo('onde_ano', 'ano',
+                                            {nome: ano for nome, ano in limites.items() if ano is not None})
+
+    def contendo(self, campo: str, valor: str) -> 'Consulta':
+        "Filtra por substring sem acentos e sem diferenciar maiúsculas, como buscar_livros"
+        return self._com_filtro_declarativo('contendo', 'contendo', campo, valor)
+
+    def mapear(self, funcao: Callable[[Any], Any]) -> 'Consulta':
+        "Transforma cada item"
+        return self._com('mapear', funcao)
+
+    def ordenar_por(self, chave: Union[str, Callable[[Any], Any]], decrescente: bool = False) -> 'Consulta':
+        "Ordena pelo campo (nome) ou pela função informada"
+        return self._com('ordenar', chave if callable(chave) else itemgetter(chave), decrescente)
+
+    def limitar(self, quantidade: int) -> 'Consulta':
+        "Para depois de produzir a quantidade informada de itens"
+        return self._com('limitar', quantidade)
+
+    def __iter__(self) -> Iterator[Any]:
+        empurrados, resto = self._separar()
+        itens = self._acessar(empurrados)[1]
+        return self._aplicar(itens, resto)
+
+    def listar(self) -> List[Any]:
+        "Executa a consulta e devolve os itens em uma lista"
+        return list(self)
+
+    def primeiro(self) -> Optional[Any]:
+        "Primeiro item da consulta, parando a execução logo nele"
+        return next(iter(self), None)
+
+    def contar(self) -> int:
+        "Quantidade de itens, sem montar a lista"
+        return sum(1 for _ in self)
+
+    def plano(self) -> List[str]:
+        "Descreve como a consulta será executada, sem executá-la"
+        empurrados, resto = self._separar()
+        descricao = [self._acessar(empurrados)[0]]
+        if empurrados:
+            descricao.append(f"filtro: {', '.join(_descrever(estagio) for estagio in empurrados)}")
+        for posicao, estagio in enumerate(resto):
+            if estagio[0] == 'limitar' and posicao and resto[posicao - 1][0] == 'ordenar':
+                descricao[-1] = f"top {estagio[1]}"
+            else:
+                descricao.append(_descrever(estagio))
+        return descricao
+
+    def _separar(self) -> Tuple[List[Tuple], List[Tuple]]:
+        "Filtros antes do primeiro mapear ou limitar comutam entre si e vão para o acesso"
+        empurrados, resto = [], []
+        bloqueado = False
+        for estagio in self._estagios:
+            if estagio[0] in ('mapear', 'limitar'):
+                bloqueado = True
+            if not bloqueado and estagio[0] in FILTROS:
+                empurrados.append(estagio)
+            else:
+                resto.append(estagio)
+        return empurrados, resto
+
+    def _acessar(self, filtros: List[Tuple]) -> Tuple[str, Iterator[Any]]:
+        "Escolhe o caminho de acesso mais seletivo e aplica os filtros em fluxo"
+        livros = self._livros
+        descricao, itens = "varredura", None
+        biblioteca = self._biblioteca
+        if biblioteca is not None:
+            biblioteca._verificar_indices()
+            livros = biblioteca.livros
+            candidatos = [c for c in (_candidatos(biblioteca, livros, estagio) for estagio in filtros) if c]
+            if candidatos:
+                descricao, quantidade, fonte, coberto = min(candidatos, key=itemgetter(1))
+                descricao = f"{descricao} ({quantidade} candidatos)"
+                itens = fonte()
+                filtros = [filtro for filtro in filtros if filtro is not coberto]
+        if itens is None:
+            itens = iter(livros)
+
+        predicados = [_predicado(estagio) for estagio in filtros]
+        if len(predicados) == 1:
+            itens = filter(predicados[0], itens)
+        elif predicados:
+            def aceita(livro):
+                for predicado in predicados:
+                    if not predicado(livro):
+                        return False
+                return True
+            itens = filter(aceita, itens)
+        return descricao, itens
+
+    def _aplicar(self, itens: Iterator[Any], estagios: List[Tuple]) -> Iterator[Any]:
+        "Encadeia os estágios restantes como geradores"
+        posicao = 0
+        while posicao < len(estagios):
+            tipo, *argumentos = estagios[posicao]
+            if tipo == 'ordenar':
+                chave, decrescente = argumentos
+                seguinte = estagios[posicao + 1] if posicao + 1 < len(estagios) else None
+                if seguinte and seguinte[0] == 'limitar':
+                    # Ordenar e limitar viram um top-k com heap, sem ordenar tudo
+                    selecionar = heapq.nlargest if decrescente else heapq.nsmallest
+                    itens = iter(selecionar(seguinte[1], itens, key=chave))
+                    posicao += 2
+                    continue
+                itens = iter(sorted(itens, key=chave, reverse=decrescente))
+            elif tipo == 'limitar':
+                itens = islice(itens, argumentos[0])
+            elif tipo == 'mapear':
+                itens = map(argumentos[0], itens)
+            else:
+                predicado = _predicado((tipo, *argumentos))
+                itens = filter(predicado, itens)
+            posicao += 1
+        return itens
+
+
+def _candidatos(biblioteca: Any, livros: List[Dict[str, Any]], estagio: Tuple) -> Optional[Tuple]:
+    "Acesso por índice para um filtro: (descrição, quantidade, gerador, filtro já garantido) ou None"
+    tipo = estagio[0]
+    if tipo == 'igual':
+        campos = estagio[1]
+        # Se a igualdade é só no campo do índice, os candidatos já a satisfazem
+        coberto = estagio if len(campos) == 1 else None
+        if 'id' in campos:
+            livro = biblioteca._livros_por_id.get(campos['id'])
+            return ("índice de id", int(livro is not None), lambda: iter([livro] if livro else []), coberto)
+        if 'categoria' in campos:
+            posicoes = biblioteca._posicoes_por_categoria.get(campos['categoria'], [])
+            return ("índice de categoria", len(posicoes), lambda: map(livros.__getitem__, posicoes), coberto)
+    elif tipo == 'contendo':
+        _, campo, valor = estagio
+        indice = biblioteca._indices_busca.get(campo)
+        posicoes = indice.candidatos(valor) if indice else None
+        if posicoes is not None:
+            return (f"índice de trigramas de {campo}", len(posicoes), lambda: map(livros.__getitem__, posicoes),
+                    None)
+    return None
+
+
+def _predicado(estagio: Tuple) -> Callable[[Any], bool]:
+    "Função que confere um filtro sobre um item"
+    tipo = estagio[0]
+    if tipo == 'igual':
+        campos = list(estagio[1].items())
+        return lambda livro: all(livro.get(campo) == valor for campo, valor in campos)
+    if tipo == 'ano':
+        limites = estagio[1]
+        apos, antes = limites.get('apos'), limites.get('antes')
+        de, ate = limites.get('de'), limites.get('ate')
+        return lambda livro: ((apos is None or livro['ano'] > apos) and (antes is None or livro['ano'] < antes)
+                              and (de is None or livro['ano'] >= de) and (ate is None or livro['ano'] <= ate))
+    if tipo == 'contendo':
+        _, campo, valor = estagio
+        termo = normalizar(valor)
+        return lambda livro: termo in normalizar(livro[campo])
+    return estagio[1]
+
+
+def _descrever(estagio: Tuple) -> str:
+    "Texto curto de um estágio para o plano"
+    tipo = estagio[0]
+    if tipo == 'igual':
+        return ' e '.join(f"{campo} = {valor!r}" for campo, valor in estagio[1].items())
+    if tipo == 'ano':
+        simbolos = {'apos': '>', 'antes': '<', 'de': '>=', 'ate': '<='}
+        return ' e '.join(f"ano {simbolos[nome]} {ano}" for nome, ano in estagio[1].items())
+    if tipo == 'contendo':
+        return f"{estagio[1]} contém {estagio[2]!r}"
+    if tipo == 'ordenar':
+        return "ordenar" + (" (decrescente)" if estagio[2] else "")
+    if tipo == 'limitar':
+        return f"limitar {estagio[1]}"
+    return tipo
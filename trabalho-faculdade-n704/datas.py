@@ -0,0 +1,57 @@
+"Datas do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Internamente são instantes inteiros (segundos desde a época); texto ISO só na exibição"
+
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Iterable, MutableMapping, Union
+import time
+
+
+SEGUNDOS_POR_DIA = 86400
+CAMPOS_DATA = ('data_cadastro', 'data_emprestimo', 'data_vencimento', 'data_devolucao', 'data_relatorio')
+# Marca gravada nos arquivos; arquivos sem ela são de versões antigas, com datas em texto ISO
+FORMATO_DATAS = 'epoch'
+
+
+def agora() -> int:
+    "Instante atual em segundos"
+    return int(time.time())
+
+
+def para_iso(instante: int) -> str:
+    "Texto ISO no horário local, como o datetime.now().isoformat() das versões antigas"
+    return datetime.fromtimestamp(instante).isoformat()
+
+
+def mes_de(instante: int) -> str:
+    "Mês 'AAAA-MM' do instante, no horário local"
+    return datetime.fromtimestamp(instante).strftime('%Y-%m')
+
+
+def de_iso(texto: str) -> int:
+    "Instante a partir de um texto ISO no horário local"
+    return int(datetime.fromisoformat(texto).timestamp())
+
+
+def para_instante(valor: Union[int, str]) -> int:
+    "Aceita um instante ou um texto ISO de arquivo antigo"
+    return de_iso(valor) if isinstance(valor, str) else valor
+
+
+def migrar_datas(registros: Iterable[MutableMapping[str, Any]]):
+    "Converte para instantes os campos de data em texto ISO dos registros"
+    for registro in registros:
+        for campo in CAMPOS_DATA:
+            valor = registro.get(campo)
+            if isinstance(valor, str):
+                registro[campo] = de_iso(valor)
+
+
+def datas_para_iso(dados: Any) -> Any:
+    "Cópia dos dados com os campos de data em texto ISO, para exibição ou para clientes externos"
+    if isinstance(dados, Mapping):
+        return {chave: para_iso(valor) if chave in CAMPOS_DATA and isinstance(valor, int) else datas_para_iso(valor)
+                for chave, valor in dados.items()}
+    if isinstance(dados, list):
+        return [datas_para_iso(item) for item in dados]
+    return dados
@@ -1,5 +1,6 @@
 
 from biblioteca import Biblioteca, criar_funcao_desconto, processar_livros_funcional, calcular_estatisticas_livros
+from precos import TabelaPrecos
 
 
 def demonstrar_conceitos_funcionais():
@@ -63,11 +64,10 @@ def demonstrar_conceitos_funcionais():
     print("="*60)
     
 
-    livros_com_preco = []
-    for livro in biblioteca.livros[:3]:
-        livro_com_preco = livro.copy()
-        livro_com_preco['preco'] = 50.0
-        livros_com_preco.append(livro_com_preco)
+    # Os preços ficam numa coluna à parte; as visões mostram o livro com o preço sem copiá-lo
+    tabela_precos = TabelaPrecos()
+    tabela_precos.definir_lote((livro['id'], 50.0) for livro in biblioteca.livros[:3])
+    livros_com_preco = list(tabela_precos.visoes(biblioteca.livros[:3]))
     
     print("Preços originais:")
     for livro in livros_com_preco:
@@ -0,0 +1,174 @@
+"Estatísticas do acervo sobre uma coluna compacta de anos de publicação"
+"Usa NumPy quando disponível; sem ele, as contagens são feitas pelo Counter da biblioteca padrão"
+
+from array import array
+from collections import Counter
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class EstatisticasAcervo:
+    "Colunas de anos e categorias com contagens por (categoria, ano) atualizadas a cada inclusão"
+
+    def __init__(self, livros: Iterable[Mapping[str, Any]] = ()):
+        self.anos = array('i')
+        self.categorias = array('i')
+        self._codigos: Dict[str, int] = {}
+        self._nomes: List[str] = []
+        # Tudo é derivado destas contagens, que têm no máximo categorias x anos distintos entradas
+        self._contagens: Counter = Counter()
+        self.adicionar_lote(livros)
+
+    def __len__(self) -> int:
+        return len(self.anos)
+
+    def _codigo(self, categoria: str) -> int:
+        codigo = self._codigos.get(categoria)
+        if codigo is None:
+            codigo = self._codigos[categoria] = len(self._nomes)
+            self._nomes.append(categoria)
+        return codigo
+
+    def adicionar(self, livro: Mapping[str, Any]):
+        "Inclui um livro nas colunas e nas contagens"
+        ano = _coluna_anos([livro['ano']])[0]
+        codigo = self._codigo(livro['categoria'])
+        self.anos.append(ano)
+        self.categorias.append(codigo)
+        self._contagens[codigo, ano] += 1
+
+    def adicionar_lote(self, livros: Iterable[Mapping[str, Any]]):
+        "Estende as colunas e conta os novos pares (categoria, ano) numa passada só"
+        livros = livros if isinstance(livros, list) else list(livros)
+        inicio = len(self.anos)
+        # Converte os anos antes de tocar nas colunas: um valor inválido não deixa nada pela metade
+        anos = _coluna_anos(_valores(livros, 'ano'))
+        nomes = _valores(livros, 'categoria')
+        for categoria in dict.fromkeys(nomes):
+            self._codigo(categoria)
+        self.anos.extend(anos)
+        self.categorias.extend(map(self._codigos.__getitem__, nomes))
+        if len(self.anos) > inicio:
+            self._contar(inicio)
+
+    def _contar(self, inicio: int):
+        "Soma às contagens os pares a partir da posição informada"
+        if numpy is not None:
+            anos = numpy.frombuffer(self.anos, dtype=numpy.int32)[inicio:].astype(numpy.int64)
+            categorias = numpy.frombuffer(self.categorias, dtype=numpy.int32)[inicio:].astype(numpy.int64)
+            deslocamento = int(anos.min())
+            largura = int(anos.max()) - deslocamento + 1
+            chaves, quantidades = numpy.unique(categorias * largura + (anos - deslocamento), return_counts=True)
+            for chave, quantidade in zip(chaves.tolist(), quantidades.tolist()):
+                self._contagens[chave // largura, chave % largura + deslocamento] += quantidade
+        else:
+            self._contagens.update(zip(self.categorias[inicio:], self.anos[inicio:]))
+
+    def recalcular(self):
+        "Refaz as contagens a partir das colunas"
+        self._contagens = Counter()
+        if self.anos:
+            self._contar(0)
+
+    def contagem_por_ano(self, categoria: Optional[str] = None) -> Dict[int, int]:
+        "Quantidade de livros por ano, em ordem crescente, opcionalmente de uma categoria"
+        codigo = self._codigos.get(categoria) if categoria is not None else None
+        if categoria is not None and codigo is None:
+            return {}
+        por_ano: Counter = Counter()
+        # list() copia as contagens de uma vez, então cadastros simultâneos não quebram a iteração
+        for (codigo_par, ano), quantidade in list(self._contagens.items()):
+            if codigo is None or codigo_par == codigo:
+                por_ano[ano] += quantidade
+        return dict(sorted(por_ano.items()))
+
+    def resumo(self) -> Dict[str, Any]:
+        "Mesmas chaves de calcular_estatisticas_livros"
+        return _resumir(self.contagem_por_ano(), len(self._nomes))
+
+    def percentis(self, fracoes: Sequence[float] = (0.25, 0.5, 0.75, 0.9, 0.99),
+                  categoria: Optional[str] = None) -> Dict[str, float]:
+        "Percentis do ano de publicação por interpolação linear, como numpy.percentile"
+        por_ano = list(self.contagem_por_ano(categoria).items())
+        total = sum(quantidade for _, quantidade in por_ano)
+        if not total:
+            return {}
+        return {f"p{fracao * 100:g}": _percentil(por_ano, total, fracao) for fracao in fracoes}
+
+    def histograma(self, largura: int = 10, categoria: Optional[str] = None) -> Dict[int, int]:
+        "Quantidade de livros por faixa de anos; a chave é o início da faixa (ex.: décadas)"
+        faixas: Dict[int, int] = {}
+        for ano, quantidade in self.contagem_por_ano(categoria).items():
+            inicio = ano - ano % largura
+            faixas[inicio] = faixas.get(inicio, 0) + quantidade
+        return faixas
+
+    def por_categoria(self) -> Dict[str, Dict[str, Any]]:
+        "Resumo de cada categoria, na ordem em que as categorias apareceram"
+        por_codigo: Dict[int, Counter] = {}
+        for (codigo, ano), quantidade in list(self._contagens.items()):
+            por_codigo.setdefault(codigo, Counter())[ano] += quantidade
+        return {
+            self._nomes[codigo]: _resumir(dict(sorted(por_codigo[codigo].items())))
+            for codigo in sorted(por_codigo)
+        }
+
+
+def _valores(livros: List[Mapping[str, Any]], campo: str) -> List[Any]:
+    "Valores de um campo de cada livro, lendo o slot direto quando todos são registros"
+    try:
+        return list(map(attrgetter(campo), livros))
+    except AttributeError:
+        return list(map(itemgetter(campo), livros))
+
+
+def _coluna_anos(anos: List[Any]) -> array:
+    "Coluna com os anos informados; recusa o primeiro que não cabe num inteiro de 32 bits"
+    try:
+        return array('i', anos)
+    except (TypeError, OverflowError):
+        pass
+    coluna = array('i')
+    for ano in anos:
+        try:
+            coluna.append(ano)
+        except (TypeError, OverflowError):
+            raise ValueError(f"Ano inválido: {ano!r}") from None
+    return coluna
+
+
+def _resumir(por_ano: Dict[int, int], categorias_unicas: Optional[int] = None) -> Dict[str, Any]:
+    "Total, média, mínimo e máximo a partir das contagens por ano já ordenadas"
+    total = sum(por_ano.values())
+    resumo: Dict[str, Any] = {'total': total, 'media_ano': 0}
+    if categorias_unicas is not None:
+        resumo['categorias_unicas'] = categorias_unicas
+    if total:
+        anos = list(por_ano)
+        resumo['media_ano'] = sum(ano * quantidade for ano, quantidade in por_ano.items()) / total
+        resumo['ano_mais_antigo'] = anos[0]
+        resumo['ano_mais_recente'] = anos[-1]
+    return resumo
+
+
+def _percentil(por_ano: List[Tuple[int, int]], total: int, fracao: float) -> float:
+    "Percentil sobre contagens ordenadas, sem expandir a coluna"
+    posicao = (total - 1) * fracao
+    inferior = int(posicao)
+    valores = []
+    acumulado = 0
+    # Valores nas posições inferior e inferior + 1 da coluna ordenada
+    for ano, quantidade in por_ano:
+        acumulado += quantidade
+        while len(valores) < 2 and inferior + len(valores) < acumulado:
+            valores.append(ano)
+        if len(valores) == 2:
+            break
+    if len(valores) == 1:
+        return float(valores[0])
+    return valores[0] + (valores[1] - valores[0]) * (posicao - inferior)
@@ -0,0 +1,379 @@
+"Modo fragmentado do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Distribui livros e empréstimos entre processos para usar vários núcleos apesar do GIL"
+
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import heapq
+import json
+import multiprocessing
+import os
+import threading
+
+from biblioteca import (Biblioteca, _eh_json_lines, _ler_entradas_de_arquivo, _normalizar_entradas,
+                        _percorrer_json_lines)
+from busca import montar_pagina, validar_pagina
+from datas import FORMATO_DATAS, agora, migrar_datas
+from registros import Emprestimo, Livro
+from segmentos import eh_armazem_segmentado, percorrer_segmentos
+from snapshot import SnapshotBinario, eh_snapshot_binario
+
+
+SEM_FRAGMENTO = 255
+
+
+class _Fragmento(Biblioteca):
+    "Biblioteca de um processo trabalhador; guarda só os livros com (id - 1) % total == indice"
+
+    def __init__(self, indice: int, total: int, indexar_busca: bool = True):
+        super().__init__(indexar_busca=indexar_busca)
+        self.indice = indice
+        self.total = total
+
+    def inserir_livros(self, entradas: List[Tuple]) -> List[Dict[str, Any]]:
+        "Insere livros com ids já atribuídos pelo coordenador e indexa todos de uma vez"
+        inicio = len(self.livros)
+        self.livros.extend(Livro(*entrada) for entrada in entradas)
+        self.contador_id = max(self.contador_id, self.livros[-1]['id'] + 1) if entradas else self.contador_id
+        self._indexar_lote(inicio)
+        novos = self.livros[inicio:]
+        self._registrar_lote_no_diario({'op': 'cadastrar', 'livro': livro} for livro in novos)
+        return novos
+
+    def emprestar_com_id(self, emprestimo_id: int, livro_id: int, pessoa: str) -> Dict[str, Any]:
+        "Empresta usando o id global reservado pelo coordenador"
+        self._proximo_emprestimo_id = emprestimo_id
+        return self.emprestar_livro(livro_id, pessoa)
+
+    def relatorio_parcial(self) -> Dict[str, Any]:
+        "Parte do relatório deste fragmento; os títulos levam o id para a intercalação"
+        self._atualizar_atrasos(agora())
+        return {
+            'total_livros': len(self.livros),
+            'livros_disponiveis': self._livros_disponiveis,
+            'emprestimos_em_atraso': len(self._emprestimos_atrasados),
+            'livros_por_categoria': {
+                categoria: [(self.livros[posicao]['id'], self.livros[posicao]['titulo']) for posicao in posicoes]
+                for categoria, posicoes in self._posicoes_por_categoria.items()
+            },
+        }
+
+    def ranking_parcial(self, criterio: str, valor: str, quantidade: int) -> Tuple[int, List[Tuple]]:
+        "Total e as melhores ocorrências deste fragmento, já ordenadas para a intercalação"
+        return self._ranquear(criterio, valor, quantidade)
+
+    def estatisticas_parciais(self) -> Tuple[int, int, Optional[int], Optional[int], set]:
+        "Somatórios para calcular as estatísticas do acervo inteiro no coordenador"
+        anos = [livro['ano'] for livro in self.livros]
+        return (len(anos), sum(anos), min(anos, default=None), max(anos, default=None),
+                {livro['categoria'] for livro in self.livros})
+
+    def carregar_fragmento(self, arquivo: str) -> Tuple[int, List[int], int]:
+        "Lê o arquivo guardando só a parte deste fragmento; devolve o contador, os ids de empréstimo e o próximo id gravado"
+        cabecalho, self.livros, self.emprestimos = _ler_parte(
+            arquivo, lambda livro_id: (livro_id - 1) % self.total == self.indice)
+        self.contador_id = cabecalho.get('contador_id', 1)
+        self._reconstruir_indices()
+        return (self.contador_id, [emprestimo['id'] for emprestimo in self.emprestimos],
+                cabecalho.get('proximo_emprestimo_id', 1))
+
+    def listar(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        "Livros e empréstimos deste fragmento"
+        return self.livros, self.emprestimos
+
+
+def _ler_parte(arquivo: str, do_fragmento: Callable[[int], bool]) -> Tuple[Dict[str, Any], List[Livro], List[Emprestimo]]:
+    "Cabeçalho (contadores de ids), livros e empréstimos do fragmento (pelo id do livro), lidos aos poucos"
+    if eh_snapshot_binario(arquivo):
+        # No binário os ids saem direto das colunas: só os registros do fragmento são decodificados
+        snapshot = SnapshotBinario(arquivo)
+        cabecalho = {'contador_id': snapshot.contador_id, 'proximo_emprestimo_id': snapshot.proximo_emprestimo_id}
+        return (cabecalho, list(snapshot.registros('livros').onde('id', do_fragmento)),
+                list(snapshot.registros('emprestimos').onde('livro_id', do_fragmento)))
+
+    livros: List[Livro] = []
+    emprestimos: List[Emprestimo] = []
+
+    def guardar(registros: Iterable[Any]):
+        for registro in registros:
+            if isinstance(registro, Livro):
+                if do_fragmento(registro['id']):
+                    livros.append(registro)
+            elif do_fragmento(registro['livro_id']):
+                emprestimos.append(registro)
+
+    if eh_armazem_segmentado(arquivo):
+        # Um segmento por vez; os registros dos outros fragmentos saem de memória com ele
+        cabecalho, segmentos = percorrer_segmentos(arquivo)
+        guardar(registro for _, grupo in segmentos for registro in grupo)
+    elif _eh_json_lines(arquivo):
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            cabecalho, registros = _percorrer_json_lines(f)
+            guardar(registro for _, registro in registros)
+    else:
+        # O JSON comum só se lê de uma vez, mas só a parte do fragmento vira registro
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        cabecalho = {chave: dados[chave] for chave in ('contador_id', 'proximo_emprestimo_id') if chave in dados}
+        livros = [Livro.de_dict(livro) for livro in dados.get('livros', []) if do_fragmento(livro['id'])]
+        emprestimos = [Emprestimo.de_dict(emprestimo) for emprestimo in dados.get('emprestimos', [])
+                       if do_fragmento(emprestimo['livro_id'])]
+        if dados.get('formato_datas') != FORMATO_DATAS:
+            migrar_datas(livros)
+            migrar_datas(emprestimos)
+    return cabecalho, livros, emprestimos
+
+
+def _executar_fragmento(conexao, indice: int, total: int, indexar_busca: bool):
+    "Laço do processo trabalhador: recebe (método, argumentos) e devolve (ok, resultado)"
+    fragmento = _Fragmento(indice, total, indexar_busca)
+    while True:
+        try:
+            mensagem = conexao.recv()
+        except EOFError:
+            break
+        if mensagem is None:
+            break
+        metodo, argumentos = mensagem
+        try:
+            conexao.send((True, getattr(fragmento, metodo)(*argumentos)))
+        except Exception as erro:
+            conexao.send((False, erro))
+    conexao.close()
+
+
+class BibliotecaFragmentada:
+    "Coordenador: reparte os livros por hash do id entre processos e junta as respostas"
+
+    def __init__(self, fragmentos: Optional[int] = None, indexar_busca: bool = True,
+                 limite_emprestimos: Optional[int] = None):
+        self.total = fragmentos or os.cpu_count() or 1
+        if not 1 <= self.total < SEM_FRAGMENTO:
+            raise ValueError(f"Número de fragmentos deve estar entre 1 e {SEM_FRAGMENTO - 1}")
+        self.contador_id = 1
+        self._proximo_emprestimo_id = 1
+        # Os empréstimos de uma pessoa se espalham pelos fragmentos dos livros: o limite é
+        # conferido aqui, somando os fragmentos, e a trava impede duas retiradas passarem juntas
+        self.limite_emprestimos = limite_emprestimos
+        self._trava_limite = threading.Lock()
+        # Fragmento dono de cada empréstimo, indexado por id - 1; um byte por empréstimo
+        self._fragmento_por_emprestimo = bytearray()
+        self._trava_ids = threading.Lock()
+        self._travas = [threading.Lock() for _ in range(self.total)]
+        self._conexoes = []
+        self._processos = []
+        for indice in range(self.total):
+            local, remota = multiprocessing.Pipe()
+            processo = multiprocessing.Process(target=_executar_fragmento, daemon=True,
+                                               args=(remota, indice, self.total, indexar_busca))
+            processo.start()
+            remota.close()
+            self._conexoes.append(local)
+            self._processos.append(processo)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def fechar(self):
+        "Encerra os processos trabalhadores"
+        for conexao, processo in zip(self._conexoes, self._processos):
+            try:
+                conexao.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            processo.join(timeout=5)
+            conexao.close()
+        self._conexoes = []
+
+    def _fragmento_do_livro(self, livro_id: int) -> int:
+        return (livro_id - 1) % self.total
+
+    def _chamar(self, indice: int, metodo: str, *argumentos) -> Any:
+        "Executa um método em um único fragmento"
+        with self._travas[indice]:
+            self._conexoes[indice].send((metodo, argumentos))
+            ok, resultado = self._conexoes[indice].recv()
+        if not ok:
+            raise resultado
+        return resultado
+
+    def _espalhar(self, metodo: str, *argumentos, por_fragmento: Optional[List[Tuple]] = None) -> List[Any]:
+        "Envia a chamada a todos os fragmentos antes de esperar as respostas, para rodarem em paralelo"
+        # As travas são tomadas sempre na mesma ordem, então não há impasse com _chamar
+        for trava in self._travas:
+            trava.acquire()
+        try:
+            for indice, conexao in enumerate(self._conexoes):
+                conexao.send((metodo, por_fragmento[indice] if por_fragmento else argumentos))
+            respostas = [conexao.recv() for conexao in self._conexoes]
+        finally:
+            for trava in self._travas:
+                trava.release()
+        for ok, resultado in respostas:
+            if not ok:
+                raise resultado
+        return [resultado for _, resultado in respostas]
+
+    @staticmethod
+    def _intercalar(listas: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        "Junta listas já ordenadas por id numa só, na ordem do backend em memória"
+        return list(heapq.merge(*listas, key=itemgetter('id')))
+
+    @property
+    def livros(self) -> List[Dict[str, Any]]:
+        return self._intercalar(livros for livros, _ in self._espalhar('listar'))
+
+    @property
+    def emprestimos(self) -> List[Dict[str, Any]]:
+        return self._intercalar(emprestimos for _, emprestimos in self._espalhar('listar'))
+
+    def cadastrar_livro(self, titulo: str, autor: str, ano: int, categoria: str) -> Dict[str, Any]:
+        "Cadastra um livro no fragmento dono do novo id"
+        with self._trava_ids:
+            livro_id = self.contador_id
+            self.contador_id += 1
+        entrada = (livro_id, titulo, autor, ano, categoria, True, agora())
+        return self._chamar(self._fragmento_do_livro(livro_id), 'inserir_livros', [entrada])[0]
+
+    def cadastrar_livros_em_lote(self, fonte: Union[str, Iterable[Any]]) -> List[Dict[str, Any]]:
+        "Valida o lote inteiro no coordenador e depois cadastra cada parte no seu fragmento em paralelo"
+        entradas = _ler_entradas_de_arquivo(fonte) if isinstance(fonte, str) else fonte
+        normalizadas = list(_normalizar_entradas(entradas))
+        data_cadastro = agora()
+        with self._trava_ids:
+            primeiro_id = self.contador_id
+            self.contador_id += len(normalizadas)
+
+        partes: List[List[Tuple]] = [[] for _ in range(self.total)]
+        for livro_id, entrada in enumerate(normalizadas, primeiro_id):
+            partes[self._fragmento_do_livro(livro_id)].append((livro_id, *entrada, True, data_cadastro))
+        return self._intercalar(self._espalhar('inserir_livros', por_fragmento=[(parte,) for parte in partes]))
+
+    def buscar_livros(self, criterio: str, valor: str) -> List[Dict[str, Any]]:
+        "Busca em todos os fragmentos ao mesmo tempo"
+        return self._intercalar(self._espalhar('buscar_livros', criterio, valor))
+
+    def buscar_ranqueado(self, criterio: str, valor: str, limite: int = 10, pagina: int = 1) -> Dict[str, Any]:
+        "Cada fragmento devolve só as suas melhores ocorrências; o coordenador intercala as listas"
+        validar_pagina(limite, pagina)
+        quantidade = limite * pagina
+        parciais = self._espalhar('ranking_parcial', criterio, valor, quantidade)
+        melhores = heapq.merge(*(parcial for _, parcial in parciais), key=itemgetter(0), reverse=True)
+        return montar_pagina(sum(total for total, _ in parciais), list(islice(melhores, quantidade)), limite, pagina)
+
+    def filtrar_livros_por_categoria(self, categoria: str) -> List[Dict[str, Any]]:
+        "Filtra em todos os fragmentos ao mesmo tempo"
+        return self._intercalar(self._espalhar('filtrar_livros_por_categoria', categoria))
+
+    def emprestar_livro(self, livro_id: int, pessoa: str) -> Dict[str, Any]:
+        "Empresta no fragmento dono do livro, conferindo antes o limite da pessoa, se houver"
+        if self.limite_emprestimos is None:
+            return self._emprestar(livro_id, pessoa)
+        with self._trava_limite:
+            if not self.pode_emprestar(pessoa):
+                raise ValueError(f"Limite de {self.limite_emprestimos} empréstimos em aberto atingido")
+            return self._emprestar(livro_id, pessoa)
+
+    def _emprestar(self, livro_id: int, pessoa: str) -> Dict[str, Any]:
+        "Reserva o id e empresta no fragmento dono do livro"
+        # O id é reservado antes da chamada para não serializar empréstimos de fragmentos
+        # diferentes; uma tentativa recusada deixa uma lacuna na numeração
+        with self._trava_ids:
+            emprestimo_id = self._proximo_emprestimo_id
+            self._proximo_emprestimo_id += 1
+            self._fragmento_por_emprestimo.append(SEM_FRAGMENTO)
+        indice = self._fragmento_do_livro(livro_id)
+        emprestimo = self._chamar(indice, 'emprestar_com_id', emprestimo_id, livro_id, pessoa)
+        self._fragmento_por_emprestimo[emprestimo_id - 1] = indice
+        return emprestimo
+
+    def devolver_livro(self, emprestimo_id: int) -> Dict[str, Any]:
+        "Devolve no fragmento que registrou o empréstimo"
+        indice = SEM_FRAGMENTO
+        if 0 < emprestimo_id <= len(self._fragmento_por_emprestimo):
+            indice = self._fragmento_por_emprestimo[emprestimo_id - 1]
+        if indice == SEM_FRAGMENTO:
+            raise ValueError("Empréstimo não encontrado")
+        return self._chamar(indice, 'devolver_livro', emprestimo_id)
+
+    def emprestimos_ativos(self, pessoa: str) -> List[Dict[str, Any]]:
+        "Junta os empréstimos em aberto da pessoa em todos os fragmentos"
+        return self._intercalar(self._espalhar('emprestimos_ativos', pessoa))
+
+    def multa_total(self, pessoa: str) -> float:
+        "Soma as multas da pessoa em todos os fragmentos"
+        return sum(self._espalhar('multa_total', pessoa))
+
+    def pode_emprestar(self, pessoa: str) -> bool:
+        "Indica se a pessoa está abaixo do limite de empréstimos em aberto"
+        return self.limite_emprestimos is None or len(self.emprestimos_ativos(pessoa)) < self.limite_emprestimos
+
+    def gerar_relatorio(self) -> Dict[str, Any]:
+        "Soma os relatórios parciais e intercala os títulos de cada categoria pela ordem de cadastro"
+        parciais = self._espalhar('relatorio_parcial')
+        total_livros = sum(parcial['total_livros'] for parcial in parciais)
+        livros_disponiveis = sum(parcial['livros_disponiveis'] for parcial in parciais)
+
+        por_categoria: Dict[str, List[List[Tuple[int, str]]]] = {}
+        for parcial in parciais:
+            for categoria, titulos in parcial['livros_por_categoria'].items():
+                por_categoria.setdefault(categoria, []).append(titulos)
+        # Categorias na ordem em que apareceram pela primeira vez, como no backend em memória
+        ordem = sorted(por_categoria, key=lambda categoria: min(titulos[0][0] for titulos in por_categoria[categoria]))
+
+        return {
+            'total_livros': total_livros,
+            'livros_disponiveis': livros_disponiveis,
+            'livros_emprestados': total_livros - livros_disponiveis,
+            'livros_por_categoria': {
+                categoria: [titulo for _, titulo in heapq.merge(*por_categoria[categoria])] for categoria in ordem
+            },
+            'emprestimos_em_atraso': sum(parcial['emprestimos_em_atraso'] for parcial in parciais),
+            'data_relatorio': agora()
+        }
+
+    def calcular_estatisticas(self) -> Dict[str, Any]:
+        "Mesmo resultado de calcular_estatisticas_livros, somando as partes de cada fragmento"
+        parciais = self._espalhar('estatisticas_parciais')
+        total = sum(parcial[0] for parcial in parciais)
+        if not total:
+            return {'total': 0, 'media_ano': 0, 'categorias_unicas': 0}
+        return {
+            'total': total,
+            'media_ano': sum(parcial[1] for parcial in parciais) / total,
+            'categorias_unicas': len(set().union(*(parcial[4] for parcial in parciais))),
+            'ano_mais_antigo': min(parcial[2] for parcial in parciais if parcial[0]),
+            'ano_mais_recente': max(parcial[3] for parcial in parciais if parcial[0])
+        }
+
+    def salvar_dados(self, arquivo: str = 'biblioteca.json'):
+        "Junta os fragmentos e grava no mesmo formato do backend em memória"
+        partes = self._espalhar('listar')
+        destino = Biblioteca(indexar_busca=False)
+        destino.livros = self._intercalar(livros for livros, _ in partes)
+        destino.emprestimos = self._intercalar(emprestimos for _, emprestimos in partes)
+        destino.contador_id = self.contador_id
+        destino._proximo_emprestimo_id = self._proximo_emprestimo_id
+        destino.salvar_dados(arquivo)
+
+    def carregar_dados(self, arquivo: str = 'biblioteca.json'):
+        "Cada fragmento lê o arquivo em paralelo e guarda só a sua parte"
+        if not os.path.exists(arquivo):
+            print("Arquivo não encontrado. Iniciando biblioteca vazia.")
+            return
+
+        resultados = self._espalhar('carregar_fragmento', arquivo)
+        # Ids até o próximo gravado ficam reservados, mesmo os de empréstimos que já não estão no arquivo
+        maior_id = max(max((max(ids, default=0) for _, ids, _ in resultados), default=0),
+                       max(proximo for _, _, proximo in resultados) - 1)
+        mapa = bytearray([SEM_FRAGMENTO]) * maior_id
+        for indice, (_, ids, _) in enumerate(resultados):
+            for emprestimo_id in ids:
+                mapa[emprestimo_id - 1] = indice
+        with self._trava_ids:
+            self.contador_id = max(contador for contador, _, _ in resultados)
+            self._fragmento_por_emprestimo = mapa
+            self._proximo_emprestimo_id = len(mapa) + 1
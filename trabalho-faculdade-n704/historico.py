@@ -0,0 +1,141 @@
+"Histórico de empréstimos do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Empréstimos devolvidos há muito tempo saem da lista de trabalho para partições mensais, lidas só quando consultadas"
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import json
+import os
+import zlib
+
+from busca import normalizar_pessoa
+from datas import mes_de
+from registros import Emprestimo
+from segmentos import _gravar_atomicamente, _sincronizar_pasta
+
+
+INDICE = 'indice.json'
+PREFIXO = 'emprestimos-'
+EXTENSAO = '.json.z'
+
+
+class HistoricoEmprestimos:
+    "Pasta com um arquivo comprimido por mês de empréstimo e um índice com os meses, o maior id e as multas por pessoa"
+
+    def __init__(self, pasta: str):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+        # Partições já lidas, por mês
+        self._particoes: Dict[str, List[Emprestimo]] = {}
+        try:
+            with open(os.path.join(pasta, INDICE), 'r', encoding='utf-8') as f:
+                self._indice = json.load(f)
+        except FileNotFoundError:
+            self._indice = {'maior_id': 0, 'meses': {}}
+        if 'multas_por_mes' not in self._indice:
+            # Índice perdido ou de antes das multas por mês: tudo nele se refaz a partir das partições
+            self._reconstruir_indice()
+        self._multas = self._somar_multas()
+
+    @property
+    def maior_id(self) -> int:
+        "Maior id de empréstimo já arquivado; ids novos precisam ficar acima dele"
+        return self._indice['maior_id']
+
+    @property
+    def meses(self) -> List[str]:
+        "Meses com empréstimos arquivados, em ordem"
+        return sorted(self._indice['meses'])
+
+    @property
+    def total(self) -> int:
+        "Quantidade de empréstimos arquivados"
+        return sum(self._indice['meses'].values())
+
+    def multa_de(self, chave: str) -> float:
+        "Soma das multas arquivadas da pessoa (chave de normalizar_pessoa), sem ler as partições"
+        return self._multas.get(chave, 0.0)
+
+    def _somar_multas(self) -> Dict[str, float]:
+        "Multas de cada pessoa somadas em todos os meses do índice"
+        multas: Dict[str, float] = {}
+        for do_mes in self._indice['multas_por_mes'].values():
+            for chave, valor in do_mes.items():
+                multas[chave] = multas.get(chave, 0.0) + valor
+        return multas
+
+    def _contabilizar(self, mes: str, particao: List[Any]):
+        "Refaz a entrada do mês no índice (e o total de multas) a partir do conteúdo completo da partição"
+        multas: Dict[str, float] = {}
+        for emprestimo in particao:
+            if emprestimo.get('multa'):
+                chave = normalizar_pessoa(emprestimo['pessoa'])
+                multas[chave] = multas.get(chave, 0.0) + emprestimo['multa']
+        self._indice['meses'][mes] = len(particao)
+        self._indice['multas_por_mes'][mes] = multas
+        if particao:
+            self._indice['maior_id'] = max(self.maior_id, particao[-1]['id'])
+        self._multas = self._somar_multas()
+
+    def _reconstruir_indice(self):
+        "Monta o índice lendo todas as partições da pasta"
+        self._indice = {'maior_id': self._indice.get('maior_id', 0), 'meses': {}, 'multas_por_mes': {}}
+        for nome in sorted(os.listdir(self.pasta)):
+            if nome.startswith(PREFIXO) and nome.endswith(EXTENSAO):
+                mes = nome[len(PREFIXO):-len(EXTENSAO)]
+                self._contabilizar(mes, self.particao(mes))
+        self._particoes.clear()
+
+    @property
+    def carregadas(self) -> int:
+        "Quantidade de partições já lidas do disco"
+        return len(self._particoes)
+
+    def _caminho(self, mes: str) -> str:
+        "Arquivo da partição do mês"
+        return os.path.join(self.pasta, f"{PREFIXO}{mes}{EXTENSAO}")
+
+    def particao(self, mes: str) -> List[Emprestimo]:
+        "Empréstimos arquivados do mês, lidos do disco na primeira vez"
+        if mes not in self._particoes:
+            try:
+                with open(self._caminho(mes), 'rb') as f:
+                    registros = json.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                registros = []
+            self._particoes[mes] = [Emprestimo.de_dict(registro) for registro in registros]
+        return self._particoes[mes]
+
+    def arquivar(self, emprestimos: Iterable[Any]) -> int:
+        "Acrescenta os empréstimos às partições dos seus meses; devolve quantos foram arquivados"
+        # Partições primeiro, índice por último: se a gravação parar no meio, os empréstimos
+        # continuam na lista de trabalho e o próximo arquivamento junta os repetidos pelo id.
+        # Contagem e multas do mês são recalculadas da partição inteira, então repetidos não somam duas vezes
+        por_mes: Dict[str, List[Any]] = {}
+        for emprestimo in emprestimos:
+            por_mes.setdefault(mes_de(emprestimo['data_emprestimo']), []).append(emprestimo)
+        total = 0
+        for mes, novos in por_mes.items():
+            registros = {emprestimo['id']: emprestimo for emprestimo in self.particao(mes)}
+            registros.update((emprestimo['id'], Emprestimo.de_dict(emprestimo)) for emprestimo in novos)
+            particao = sorted(registros.values(), key=lambda emprestimo: emprestimo['id'])
+            conteudo = json.dumps(particao, ensure_ascii=False, separators=(',', ':'), default=dict)
+            _gravar_atomicamente(self._caminho(mes), zlib.compress(conteudo.encode('utf-8')))
+            self._particoes[mes] = particao
+            self._contabilizar(mes, particao)
+            total += len(novos)
+        if por_mes:
+            _gravar_atomicamente(os.path.join(self.pasta, INDICE),
+                                 json.dumps(self._indice, ensure_ascii=False).encode('utf-8'))
+            _sincronizar_pasta(self.pasta)
+        return total
+
+    def consultar(self, inicio: Optional[int] = None, fim: Optional[int] = None) -> Iterator[Emprestimo]:
+        "Empréstimos arquivados feitos entre os instantes inicio (incluso) e fim (excluso), lendo só os meses do período"
+        primeiro = mes_de(inicio) if inicio is not None else None
+        ultimo = mes_de(fim) if fim is not None else None
+        for mes in self.meses:
+            if (primeiro and mes < primeiro) or (ultimo and mes > ultimo):
+                continue
+            for emprestimo in self.particao(mes):
+                if (inicio is None or emprestimo['data_emprestimo'] >= inicio) and \
+                        (fim is None or emprestimo['data_emprestimo'] < fim):
+                    yield emprestimo
@@ -1,8 +1,18 @@
 "Interface principal do Sistema de Gerenciamento de Biblioteca Pessoal"
 "Demonstra uso de conceitos de programação funcional"
 
-from biblioteca import Biblioteca, criar_funcao_desconto, processar_livros_funcional, calcular_estatisticas_livros
-from datetime import datetime
+import os
+
+from biblioteca import Biblioteca, converter_arquivo, criar_funcao_desconto, processar_livros_funcional
+from precos import TabelaPrecos
+from datas import para_iso
+
+
+# Armazenamento segmentado: salvar regrava só os segmentos alterados; arquivos de versões
+# anteriores (binário ou JSON) são convertidos uma única vez
+ARQUIVO_DADOS = 'biblioteca.seg'
+ARQUIVOS_ANTIGOS = ('biblioteca.bin', 'biblioteca.json')
+PASTA_HISTORICO = 'biblioteca.historico'
 
 
 def exibir_menu():
@@ -18,6 +28,7 @@ def exibir_menu():
     print("6. Demonstrar conceitos funcionais")
     print("7. Salvar dados")
     print("8. Carregar dados")
+    print("9. Métricas de desempenho")
     print("0. Sair")
     print("="*50)
 
@@ -73,15 +84,26 @@ def buscar_livros_interativo(biblioteca: Biblioteca):
         print("Valor não pode estar vazio!")
         return
     
-    livros = biblioteca.buscar_livros(criterio, valor)
-    
-    if not livros:
-        print("Nenhum livro encontrado!")
-    else:
-        print(f"\n📚 {len(livros)} livro(s) encontrado(s):")
-        for livro in livros:
+    # Mais relevantes primeiro, dez por página
+    pagina = 1
+    while True:
+        resultado = biblioteca.buscar_ranqueado(criterio, valor, limite=10, pagina=pagina)
+        if not resultado['total']:
+            print("Nenhum livro encontrado!")
+            return
+        
+        if pagina == 1:
+            print(f"\n📚 {resultado['total']} livro(s) encontrado(s):")
+        for livro in resultado['livros']:
             status = "✅ Disponível" if livro['disponivel'] else "❌ Emprestado"
             print(f"  {livro['id']}. {livro['titulo']} - {livro['autor']} ({livro['ano']}) - {status}")
+        
+        if pagina >= resultado['paginas']:
+            return
+        continuar = input(f"Página {pagina} de {resultado['paginas']}. Enter para a próxima, 's' para sair: ")
+        if continuar.strip().lower() == 's':
+            return
+        pagina += 1
 
 
 def emprestar_livro_interativo(biblioteca: Biblioteca):
@@ -104,7 +126,7 @@ def emprestar_livro_interativo(biblioteca: Biblioteca):
         emprestimo = biblioteca.emprestar_livro(livro_id, pessoa)
         print(f"\n✅ Empréstimo realizado com sucesso!")
         print(f"ID do empréstimo: {emprestimo['id']}")
-        print(f"Data de vencimento: {emprestimo['data_vencimento']}")
+        print(f"Data de vencimento: {para_iso(emprestimo['data_vencimento'])}")
     except ValueError as e:
         print(f"❌ Erro: {e}")
 
@@ -151,6 +173,8 @@ def demonstrar_conceitos_funcionais(biblioteca: Biblioteca):
     """Demonstra os conceitos de programação funcional"""
     print("\n--- DEMONSTRAÇÃO DE CONCEITOS FUNCIONAIS ---")
     
+    # A demonstração percorre biblioteca.livros direto, então espera a carga terminar de ler
+    biblioteca.aguardar_dados()
     if not biblioteca.livros:
         print("Cadastre alguns livros primeiro para ver a demonstração!")
         return
@@ -188,11 +212,10 @@ def demonstrar_conceitos_funcionais(biblioteca: Biblioteca):
     funcao_desconto = criar_funcao_desconto(0.2)
     
 
-    livros_com_preco = []
-    for livro in biblioteca.livros[:3]:  
-        livro_com_preco = livro.copy()
-        livro_com_preco['preco'] = 50.0  
-        livros_com_preco.append(livro_com_preco)
+    # Os preços ficam numa coluna à parte; as visões mostram o livro com o preço sem copiá-lo
+    tabela_precos = TabelaPrecos()
+    tabela_precos.definir_lote((livro['id'], 50.0) for livro in biblioteca.livros[:3])
+    livros_com_preco = list(tabela_precos.visoes(biblioteca.livros[:3]))
     
     livros_com_desconto = biblioteca.aplicar_desconto_livros(livros_com_preco, funcao_desconto)
     
@@ -219,12 +242,76 @@ def demonstrar_conceitos_funcionais(biblioteca: Biblioteca):
     
    
     print("\n6️⃣ ESTATÍSTICAS FUNCIONAIS:")
-    stats = calcular_estatisticas_livros(biblioteca.livros)
+    stats = biblioteca.calcular_estatisticas()
     print(f"  Total de livros: {stats['total']}")
     print(f"  Média de ano de publicação: {stats['media_ano']:.1f}")
     print(f"  Categorias únicas: {stats['categorias_unicas']}")
     print(f"  Livro mais antigo: {stats['ano_mais_antigo']}")
     print(f"  Livro mais recente: {stats['ano_mais_recente']}")
+    percentis = biblioteca.estatisticas.percentis((0.5, 0.9))
+    if percentis:
+        print(f"  Mediana / p90 do ano: {percentis['p50']:.0f} / {percentis['p90']:.0f}")
+
+
+def exibir_metricas_interativo(biblioteca: Biblioteca):
+    """Interface para ligar a coleta de métricas e exportá-las"""
+    print("\n--- MÉTRICAS DE DESEMPENHO ---")
+    print(f"Coleta {'ligada' if biblioteca.metricas_ativas else 'desligada'}")
+    print("1. Ligar/desligar a coleta")
+    print("2. Exibir resumo")
+    print("3. Exportar em JSON (metricas.json)")
+    print("4. Exportar no formato Prometheus (metricas.prom)")
+    
+    opcao = input("Escolha uma opção: ").strip()
+    
+    if opcao == "1":
+        if biblioteca.metricas_ativas:
+            biblioteca.desativar_metricas()
+            print("✅ Coleta desligada")
+        else:
+            biblioteca.ativar_metricas()
+            print("✅ Coleta ligada")
+        return
+    if opcao not in ("2", "3", "4"):
+        print("Opção inválida!")
+        return
+    if biblioteca.metricas is None:
+        print("Nenhuma métrica coletada. Ligue a coleta primeiro (opção 1).")
+        return
+    
+    if opcao == "2":
+        resumo = biblioteca.metricas.resumo()
+        if not resumo:
+            print("Nenhuma operação medida ainda.")
+            return
+        print(f"\n  {'Operação':<30} {'Chamadas':>9} {'Erros':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for nome, medidas in resumo.items():
+            print(f"  {nome:<30} {medidas['chamadas']:>9} {medidas['erros']:>6} {medidas['p50_ms']:>9.3f} "
+                  f"{medidas['p95_ms']:>9.3f} {medidas['p99_ms']:>9.3f}")
+    else:
+        arquivo, conteudo = (('metricas.json', biblioteca.metricas.para_json()) if opcao == "3" else
+                             ('metricas.prom', biblioteca.metricas.para_prometheus()))
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+        print(f"✅ Métricas exportadas para {arquivo}")
+
+
+def exibir_progresso_carga(carga, esperando: bool):
+    """Mostra, na mesma linha, o andamento da carga enquanto uma operação espera por ela"""
+    if esperando:
+        print(f"\r⏳ Aguardando a carga ({carga.descricao()})...", end="", flush=True)
+    elif carga.erro is not None:
+        print(f"\r❌ {carga.descricao()}" + " " * 20)
+    else:
+        print(f"\r✅ Dados prontos ({carga.descricao()})" + " " * 20)
+
+
+def salvar_ao_sair(biblioteca: Biblioteca):
+    """Salva antes de sair, a menos que a carga tenha falhado (salvar gravaria os dados vazios por cima)"""
+    if biblioteca.erro_carga is not None:
+        print(f"⚠️ Dados não salvos: a carga de {ARQUIVO_DADOS} falhou e o arquivo foi mantido como estava")
+    else:
+        biblioteca.salvar_dados(ARQUIVO_DADOS)
 
 
 def main():
@@ -234,18 +321,31 @@ def main():
     
     biblioteca = Biblioteca()
     
-   
-    biblioteca.carregar_dados()
+    antigos = [arquivo for arquivo in ARQUIVOS_ANTIGOS if os.path.exists(arquivo)]
+    if not os.path.exists(ARQUIVO_DADOS) and antigos:
+        converter_arquivo(antigos[0], ARQUIVO_DADOS)
+        print(f"📦 {antigos[0]} convertido para {ARQUIVO_DADOS}")
+    
+    # Cada alteração vai para o diário; salvar compacta o diário no snapshot. A carga roda em
+    # segundo plano: o menu aparece já e só espera quem precisar de algo ainda não carregado
+    biblioteca.ativar_diario(ARQUIVO_DADOS)
+    # Empréstimos devolvidos há mais de um ano vão, ao salvar, para partições mensais à parte
+    biblioteca.ativar_historico(PASTA_HISTORICO)
+    carga = biblioteca.carregar_em_segundo_plano(ARQUIVO_DADOS, ao_aguardar=exibir_progresso_carga)
     
     while True:
         exibir_menu()
+        if biblioteca.erro_carga is not None:
+            print(f"❌ A carga falhou: {biblioteca.erro_carga}. Nada será salvo; corrija o arquivo e use a opção 8")
+        elif not carga.concluida:
+            print(f"⏳ Carregando em segundo plano: {carga.descricao()}")
         
         try:
             opcao = input("\nEscolha uma opção: ").strip()
             
             if opcao == "0":
                 print("\n👋 Obrigado por usar o sistema!")
-                biblioteca.salvar_dados()
+                salvar_ao_sair(biblioteca)
                 break
             elif opcao == "1":
                 cadastrar_livro_interativo(biblioteca)
@@ -260,11 +360,13 @@ def main():
             elif opcao == "6":
                 demonstrar_conceitos_funcionais(biblioteca)
             elif opcao == "7":
-                biblioteca.salvar_dados()
+                biblioteca.salvar_dados(ARQUIVO_DADOS)
                 print("✅ Dados salvos com sucesso!")
             elif opcao == "8":
-                biblioteca.carregar_dados()
+                biblioteca.carregar_dados(ARQUIVO_DADOS)
                 print("✅ Dados carregados com sucesso!")
+            elif opcao == "9":
+                exibir_metricas_interativo(biblioteca)
             else:
                 print("❌ Opção inválida!")
             
@@ -272,7 +374,7 @@ def main():
             
         except KeyboardInterrupt:
             print("\n\n👋 Programa interrompido pelo usuário!")
-            biblioteca.salvar_dados()
+            salvar_ao_sair(biblioteca)
             break
         except Exception as e:
             print(f"\n❌ Erro inesperado: {e}")
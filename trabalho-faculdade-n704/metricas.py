@@ -0,0 +1,164 @@
+"Métricas de chamadas, latência e erros das operações do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Os métodos são embrulhados na instância; desligar remove os embrulhos e não sobra custo algum"
+
+from functools import wraps
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import threading
+import time
+
+
+# Faixas de latência em potências de 2, de 1 µs (2**10 ns) a cerca de 9 minutos (2**39 ns);
+# a última faixa junta tudo o que passar disso
+PRIMEIRA_FAIXA = 10
+FAIXAS = 31
+
+
+def _faixa(duracao_ns: int) -> int:
+    "Faixa do histograma: a menor potência de 2 (a partir de 2**10 ns) que não é menor que a duração"
+    return min(FAIXAS - 1, max(0, (duracao_ns - 1).bit_length() - PRIMEIRA_FAIXA))
+
+
+def _limite_ns(faixa: int) -> int:
+    "Limite superior da faixa em nanossegundos"
+    return 1 << (faixa + PRIMEIRA_FAIXA)
+
+
+class _Operacao:
+    "Contagens de uma operação: chamadas, erros, soma das durações e histograma"
+
+    __slots__ = ('chamadas', 'erros', 'total_ns', 'faixas')
+
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.total_ns = 0
+        self.faixas = [0] * FAIXAS
+
+
+def _percentil(faixas: List[int], chamadas: int, fracao: float) -> float:
+    "Percentil em ms, interpolado dentro da faixa do histograma"
+    alvo = fracao * chamadas
+    acumulado = 0
+    for faixa, quantidade in enumerate(faixas):
+        if quantidade and acumulado + quantidade >= alvo:
+            inicio = _limite_ns(faixa - 1) if faixa else 0
+            fim = _limite_ns(faixa)
+            return (inicio + (fim - inicio) * (alvo - acumulado) / quantidade) / 1e6
+        acumulado += quantidade
+    return 0.0
+
+
+class Metricas:
+    "Registro das operações medidas, exportável em JSON ou no formato de texto do Prometheus"
+
+    def __init__(self):
+        self._operacoes: Dict[str, _Operacao] = {}
+        self._trava = threading.Lock()
+
+    def _operacao(self, nome: str) -> _Operacao:
+        with self._trava:
+            operacao = self._operacoes.get(nome)
+            if operacao is None:
+                operacao = self._operacoes[nome] = _Operacao()
+            return operacao
+
+    def registrar(self, nome: str, duracao_ns: int, erro: bool = False):
+        "Conta uma chamada da operação com a duração informada"
+        operacao = self._operacao(nome)
+        with self._trava:
+            operacao.chamadas += 1
+            operacao.erros += erro
+            operacao.total_ns += duracao_ns
+            operacao.faixas[_faixa(duracao_ns)] += 1
+
+    def medir(self, nome: str, funcao):
+        "Embrulha a função para registrar cada chamada com este nome"
+        # O embrulho já guarda as contagens da operação, sem procurar pelo nome a cada chamada
+        operacao = self._operacao(nome)
+        faixas = operacao.faixas
+        trava = self._trava
+        relogio = time.perf_counter_ns
+        ultima = FAIXAS - 1
+
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = relogio()
+            try:
+                return funcao(*args, **kwargs)
+            except BaseException:
+                with trava:
+                    operacao.erros += 1
+                raise
+            finally:
+                duracao = relogio() - inicio
+                faixa = (duracao - 1).bit_length() - PRIMEIRA_FAIXA
+                with trava:
+                    operacao.chamadas += 1
+                    operacao.total_ns += duracao
+                    faixas[0 if faixa < 0 else ultima if faixa > ultima else faixa] += 1
+
+        return medida
+
+    def zerar(self):
+        "Descarta tudo o que foi medido; os embrulhos existentes continuam contando"
+        with self._trava:
+            for operacao in self._operacoes.values():
+                operacao.chamadas = operacao.erros = operacao.total_ns = 0
+                operacao.faixas[:] = [0] * FAIXAS
+
+    def _copia(self) -> List[Tuple[str, int, int, int, List[int]]]:
+        "Cópia consistente das contagens, ordenada pelo nome da operação"
+        with self._trava:
+            return [(nome, op.chamadas, op.erros, op.total_ns, list(op.faixas))
+                    for nome, op in sorted(self._operacoes.items()) if op.chamadas]
+
+    def resumo(self) -> Dict[str, Dict[str, Any]]:
+        "Chamadas, erros, média e percentis (ms) de cada operação"
+        resultado = {}
+        for nome, chamadas, erros, total_ns, faixas in self._copia():
+            resultado[nome] = {
+                'chamadas': chamadas,
+                'erros': erros,
+                'total_ms': total_ns / 1e6,
+                'media_ms': total_ns / chamadas / 1e6,
+                'p50_ms': _percentil(faixas, chamadas, 0.50),
+                'p95_ms': _percentil(faixas, chamadas, 0.95),
+                'p99_ms': _percentil(faixas, chamadas, 0.99),
+            }
+        return resultado
+
+    def para_json(self, indent: Optional[int] = 2) -> str:
+        "Resumo em JSON"
+        return json.dumps(self.resumo(), ensure_ascii=False, indent=indent)
+
+    def para_prometheus(self, prefixo: str = 'biblioteca') -> str:
+        "Histogramas e contadores no formato de texto do Prometheus"
+        linhas = [f"# HELP {prefixo}_operacao_segundos Latência das operações",
+                  f"# TYPE {prefixo}_operacao_segundos histogram"]
+        copia = self._copia()
+        for nome, chamadas, _, total_ns, faixas in copia:
+            acumulado = 0
+            for faixa, quantidade in enumerate(faixas[:-1]):
+                acumulado += quantidade
+                linhas.append(f'{prefixo}_operacao_segundos_bucket{{operacao="{nome}",le="{_limite_ns(faixa) / 1e9:g}"}} '
+                              f'{acumulado}')
+            linhas.append(f'{prefixo}_operacao_segundos_bucket{{operacao="{nome}",le="+Inf"}} {chamadas}')
+            linhas.append(f'{prefixo}_operacao_segundos_sum{{operacao="{nome}"}} {total_ns / 1e9:g}')
+            linhas.append(f'{prefixo}_operacao_segundos_count{{operacao="{nome}"}} {chamadas}')
+        linhas += [f"# HELP {prefixo}_operacao_erros_total Chamadas que terminaram em exceção",
+                   f"# TYPE {prefixo}_operacao_erros_total counter"]
+        linhas += [f'{prefixo}_operacao_erros_total{{operacao="{nome}"}} {erros}' for nome, _, erros, _, _ in copia]
+        return '\n'.join(linhas) + '\n'
+
+
+def instrumentar(objeto: Any, metricas: Metricas, nomes: Iterable[str]):
+    "Troca, só nesta instância, cada método pelo embrulho que mede as chamadas"
+    for nome in nomes:
+        setattr(objeto, nome, metricas.medir(nome, getattr(objeto, nome)))
+
+
+def desinstrumentar(objeto: Any, nomes: Iterable[str]):
+    "Remove os embrulhos; as chamadas voltam a ir direto aos métodos da classe"
+    for nome in nomes:
+        vars(objeto).pop(nome, None)
@@ -0,0 +1,144 @@
+"Preços dos livros em uma coluna compacta, separada dos registros"
+"Descontos são aplicados à coluna inteira de uma vez; os livros não são copiados"
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+SEM_PRECO = float('nan')
+
+
+class LivroComPreco(Mapping):
+    "Visão de um livro com preço: lê os campos do livro original e sobrepõe só o preço"
+
+    __slots__ = ('livro', 'preco')
+
+    def __init__(self, livro: Mapping, preco: float):
+        # Um desconto sobre outra visão aponta direto para o livro, sem encadear visões
+        self.livro = livro.livro if isinstance(livro, LivroComPreco) else livro
+        self.preco = preco
+
+    def __getitem__(self, chave: str) -> Any:
+        if chave == 'preco':
+            return self.preco
+        return self.livro[chave]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from (chave for chave in self.livro if chave != 'preco')
+        yield 'preco'
+
+    def __len__(self) -> int:
+        return len(self.livro) + ('preco' not in self.livro)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class DescontoPercentual:
+    "Mesmo percentual de desconto para todos os preços"
+
+    def __init__(self, percentual: float):
+        self.fator = 1 - percentual
+
+    def __call__(self, preco: float) -> float:
+        return preco * self.fator
+
+    def aplicar(self, precos: array) -> array:
+        "Coluna nova com o desconto aplicado a todos os preços"
+        if numpy is not None:
+            destino = _coluna_vazia(len(precos))
+            numpy.multiply(numpy.frombuffer(precos), self.fator, out=numpy.frombuffer(destino))
+            return destino
+        return array('d', map(self.fator.__mul__, precos))
+
+
+class DescontoPorFaixas:
+    "Percentual conforme a faixa de preço, ex.: [(0, 0.1), (100, 0.25)] dá 25% a partir de R$ 100"
+
+    def __init__(self, faixas: Iterable[Tuple[float, float]]):
+        faixas = sorted(faixas)
+        self.limites = [limite for limite, _ in faixas]
+        self.fatores = [1 - percentual for _, percentual in faixas]
+
+    def __call__(self, preco: float) -> float:
+        faixa = bisect_right(self.limites, preco) - 1
+        return preco * self.fatores[faixa] if faixa >= 0 else preco
+
+    def aplicar(self, precos: array) -> array:
+        "Coluna nova com o desconto da faixa de cada preço"
+        if numpy is not None:
+            coluna = numpy.frombuffer(precos)
+            faixas = numpy.searchsorted(self.limites, coluna, side='right')
+            fatores = numpy.array([1.0] + self.fatores)  # abaixo do primeiro limite fica sem desconto
+            destino = _coluna_vazia(len(precos))
+            saida = numpy.frombuffer(destino)
+            numpy.take(fatores, faixas, out=saida)
+            numpy.multiply(saida, coluna, out=saida)
+            return destino
+        return array('d', map(self, precos))
+
+
+def _coluna_vazia(tamanho: int) -> array:
+    "array('d') alocado de uma vez no tamanho final, para o NumPy escrever direto nele sem cópias"
+    return array('d', [0.0]) * tamanho
+
+
+class TabelaPrecos:
+    "Preços em array('d') indexado pelo id do livro; NaN marca livro sem preço"
+
+    def __init__(self, precos: Optional[array] = None):
+        self.precos = precos if precos is not None else array('d')
+
+    def __contains__(self, livro_id: int) -> bool:
+        return self.preco(livro_id) is not None
+
+    def _garantir(self, livro_id: int):
+        # Índice negativo cairia no fim da coluna, no preço de outro livro
+        if livro_id < 0:
+            raise ValueError(f"Id de livro inválido: {livro_id}")
+        if livro_id >= len(self.precos):
+            self.precos.extend([SEM_PRECO] * (livro_id + 1 - len(self.precos)))
+
+    def definir(self, livro_id: int, preco: float):
+        "Define o preço de um livro"
+        self._garantir(livro_id)
+        self.precos[livro_id] = preco
+
+    def definir_lote(self, precos: Iterable[Tuple[int, float]]):
+        "Define vários preços a partir de pares (id, preço)"
+        for livro_id, preco in precos:
+            self.definir(livro_id, preco)
+
+    def preco(self, livro_id: int) -> Optional[float]:
+        "Preço do livro, ou None se não tiver"
+        if 0 <= livro_id < len(self.precos):
+            preco = self.precos[livro_id]
+            if preco == preco:  # NaN é diferente de si mesmo
+                return preco
+        return None
+
+    def precos_de(self, livro_ids: Sequence[int]) -> array:
+        "Coluna com os preços dos ids informados, na mesma ordem (NaN se não houver)"
+        tamanho = len(self.precos)
+        return array('d', (self.precos[livro_id] if 0 <= livro_id < tamanho else SEM_PRECO for livro_id in livro_ids))
+
+    def com_desconto(self, regra) -> 'TabelaPrecos':
+        "Nova tabela com a regra aplicada a todos os preços; esta não muda"
+        return TabelaPrecos(regra.aplicar(self.precos))
+
+    def aplicar_desconto(self, regra):
+        "Aplica a regra a todos os preços desta tabela"
+        self.precos = regra.aplicar(self.precos)
+
+    def visoes(self, livros: Iterable[Mapping]) -> Iterator[Mapping]:
+        "Livros com o campo preco sobreposto; livros sem preço saem como estão"
+        for livro in livros:
+            preco = self.preco(livro['id'])
+            yield LivroComPreco(livro, preco) if preco is not None else livro
@@ -0,0 +1,114 @@
+"Registros compactos de livros e empréstimos"
+"Guardam os campos em __slots__ e se comportam como dicionários para quem já usa livro['titulo']"
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Tuple
+
+
+class Registro(MutableMapping):
+    "Base dos registros: campos fixos em slots e campos extras em um dicionário opcional"
+
+    # _dono: quem acompanha as alterações do registro (a biblioteca ligada a um armazenamento
+    # segmentado, que precisa saber quais segmentos regravar), ou None
+    __slots__ = ('_extras', '_dono')
+    CAMPOS: Tuple[str, ...] = ()
+
+    def __init__(self, *valores, **campos):
+        # Valores ausentes no fim (ex.: data_devolucao de um empréstimo aberto) ficam sem atribuir
+        self._extras = None
+        self._dono = None
+        for campo, valor in zip(self.CAMPOS, valores):
+            setattr(self, campo, valor)
+        for campo, valor in campos.items():
+            self[campo] = valor
+
+    @classmethod
+    def de_dict(cls, dados: Dict[str, Any]) -> 'Registro':
+        "Converte um dicionário (ex.: lido de JSON) em registro"
+        if isinstance(dados, cls):
+            return dados
+        registro = cls()
+        for chave, valor in dados.items():
+            registro[chave] = valor
+        return registro
+
+    def __getitem__(self, chave: str) -> Any:
+        if chave in self.CAMPOS:
+            try:
+                return getattr(self, chave)
+            except AttributeError:
+                raise KeyError(chave) from None
+        if self._extras and chave in self._extras:
+            return self._extras[chave]
+        raise KeyError(chave)
+
+    def __setitem__(self, chave: str, valor: Any):
+        if chave in self.CAMPOS:
+            setattr(self, chave, valor)
+        else:
+            if self._extras is None:
+                self._extras = {}
+            self._extras[chave] = valor
+        if self._dono is not None:
+            self._dono._registro_alterado(self)
+
+    def __delitem__(self, chave: str):
+        if chave in self.CAMPOS:
+            try:
+                delattr(self, chave)
+            except AttributeError:
+                raise KeyError(chave) from None
+        elif self._extras and chave in self._extras:
+            del self._extras[chave]
+        else:
+            raise KeyError(chave)
+        if self._dono is not None:
+            self._dono._registro_alterado(self)
+
+    def __getstate__(self):
+        # O dono não vai junto ao copiar o registro ou enviá-lo a outro processo
+        campos = {campo: getattr(self, campo) for campo in self.CAMPOS if hasattr(self, campo)}
+        return self._extras, campos
+
+    def __setstate__(self, estado):
+        self._extras, campos = estado
+        self._dono = None
+        for campo, valor in campos.items():
+            setattr(self, campo, valor)
+
+    def __iter__(self) -> Iterator[str]:
+        for campo in self.CAMPOS:
+            if hasattr(self, campo):
+                yield campo
+        if self._extras:
+            yield from self._extras
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, chave: object) -> bool:
+        if chave in self.CAMPOS:
+            return hasattr(self, chave)
+        return bool(self._extras) and chave in self._extras
+
+    def copy(self) -> Dict[str, Any]:
+        "Cópia como dicionário comum, como dict.copy()"
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+
+class Livro(Registro):
+    "Livro do acervo"
+
+    __slots__ = ('id', 'titulo', 'autor', 'ano', 'categoria', 'disponivel', 'data_cadastro')
+    CAMPOS = __slots__
+
+
+class Emprestimo(Registro):
+    "Empréstimo de um livro; data_devolucao e multa só existem depois da devolução"
+
+    __slots__ = ('id', 'livro_id', 'pessoa', 'data_emprestimo', 'data_vencimento', 'devolvido',
+                 'data_devolucao', 'multa')
+    CAMPOS = __slots__
@@ -0,0 +1,192 @@
+"Armazenamento segmentado do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Livros e empréstimos em segmentos de ids, comprimidos e com checksum; salvar regrava só os segmentos alterados"
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import hashlib
+import json
+import lzma
+import os
+import uuid
+import zlib
+
+from datas import FORMATO_DATAS, migrar_datas
+from registros import Emprestimo, Livro, Registro
+
+
+MANIFESTO = 'manifesto.json'
+VERSAO_FORMATO = 1
+SECOES = ('livros', 'emprestimos')
+CLASSES = {'livros': Livro, 'emprestimos': Emprestimo}
+TAMANHO_SEGMENTO = 1000
+
+# Compressão: (extensão do arquivo do segmento, comprimir, descomprimir)
+COMPRESSOES = {
+    'nenhuma': ('.json', bytes, bytes),
+    'zlib': ('.json.z', zlib.compress, zlib.decompress),
+    'lzma': ('.json.xz', lzma.compress, lzma.decompress),
+}
+
+
+def eh_armazem_segmentado(arquivo: str) -> bool:
+    "Indica se o caminho é um armazenamento segmentado (uma pasta terminada em .seg)"
+    return arquivo.rstrip('/\\').endswith('.seg')
+
+
+def _ler_manifesto(pasta: str) -> Optional[Dict[str, Any]]:
+    "Lê o manifesto da pasta, ou None se ela ainda não tiver um"
+    try:
+        with open(os.path.join(pasta, MANIFESTO), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _gravar_atomicamente(caminho: str, conteudo: bytes):
+    "Grava em arquivo temporário, força para o disco e troca de uma vez"
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(conteudo)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def _sincronizar_pasta(pasta: str):
+    "Garante que as trocas de nome da pasta cheguem ao disco (onde o sistema permitir)"
+    try:
+        descritor = os.open(pasta, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descritor)
+    except OSError:
+        pass
+    finally:
+        os.close(descritor)
+
+
+def criar_armazem(pasta: str, compressao: str = 'zlib', tamanho_segmento: int = TAMANHO_SEGMENTO):
+    "Cria um armazenamento vazio com a compressão e o tamanho de segmento escolhidos"
+    if compressao not in COMPRESSOES:
+        raise ValueError(f"Compressão desconhecida: {compressao}")
+    if tamanho_segmento < 1:
+        raise ValueError("O tamanho do segmento deve ser positivo")
+    os.makedirs(pasta, exist_ok=True)
+    if _ler_manifesto(pasta) is not None:
+        raise FileExistsError(f"Armazenamento já existe: {pasta}")
+    _gravar_manifesto(pasta, {
+        'versao': VERSAO_FORMATO,
+        'compressao': compressao,
+        'tamanho_segmento': tamanho_segmento,
+        'geracao': None,
+        'contador_id': 1,
+        'formato_datas': FORMATO_DATAS,
+        'segmentos': {secao: {} for secao in SECOES},
+    })
+
+
+def _gravar_manifesto(pasta: str, manifesto: Dict[str, Any]):
+    "Troca o manifesto de uma vez; até a troca, vale o anterior e os segmentos que ele cita"
+    texto = json.dumps(manifesto, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    _gravar_atomicamente(os.path.join(pasta, MANIFESTO), texto)
+    _sincronizar_pasta(pasta)
+
+
+def salvar_segmentos(pasta: str, livros: Iterable[Any], emprestimos: Iterable[Any], contador_id: int,
+                     alterados: Optional[Dict[str, Set[int]]] = None, geracao: Optional[str] = None,
+                     proximo_emprestimo_id: int = 1) -> Tuple[str, int]:
+    "Grava os segmentos alterados e troca o manifesto; devolve a nova geração e os bytes gravados"
+    # Sem a geração do manifesto atual (outra pasta, ou gravada por outra instância), grava tudo
+    os.makedirs(pasta, exist_ok=True)
+    manifesto = _ler_manifesto(pasta)
+    if manifesto is None:
+        criar_armazem(pasta)
+        manifesto = _ler_manifesto(pasta)
+    completo = alterados is None or geracao is None or manifesto['geracao'] != geracao
+    tamanho = manifesto['tamanho_segmento']
+    extensao, comprimir, _ = COMPRESSOES[manifesto['compressao']]
+
+    gravados = 0
+    segmentos = {}
+    for secao, registros in zip(SECOES, (livros, emprestimos)):
+        anteriores = {} if completo else manifesto['segmentos'][secao]
+        # Ids novos ficam do segmento do maior id já salvo em diante; antes dele, só os alterados
+        maior_salvo = max((entrada['ultimo_id'] for entrada in anteriores.values()), default=0)
+        primeiro_novo = 0 if completo else maior_salvo // tamanho
+        sujos = set() if completo else {(registro_id - 1) // tamanho for registro_id in alterados[secao]}
+        grupos: Dict[int, List[Any]] = {}
+        for registro in registros:
+            numero = (registro['id'] - 1) // tamanho
+            if numero >= primeiro_novo or numero in sujos:
+                grupos.setdefault(numero, []).append(registro)
+
+        segmentos[secao] = dict(anteriores)
+        # Segmento alterado que ficou sem registros (empréstimos que foram para o histórico) sai do manifesto
+        for numero in sujos - grupos.keys():
+            segmentos[secao].pop(str(numero), None)
+        for numero, grupo in grupos.items():
+            conteudo = comprimir(json.dumps(grupo, ensure_ascii=False, separators=(',', ':'),
+                                            default=dict).encode('utf-8'))
+            checksum = hashlib.sha256(conteudo).hexdigest()
+            # O nome leva o checksum: um segmento regravado nunca sobrescreve o que o manifesto atual usa
+            nome = f"{secao}-{numero:06d}-{checksum[:16]}{extensao}"
+            if not os.path.exists(os.path.join(pasta, nome)):
+                _gravar_atomicamente(os.path.join(pasta, nome), conteudo)
+                gravados += len(conteudo)
+            segmentos[secao][str(numero)] = {
+                'arquivo': nome,
+                'sha256': checksum,
+                'registros': len(grupo),
+                'ultimo_id': max(registro['id'] for registro in grupo),
+            }
+
+    manifesto.update(geracao=uuid.uuid4().hex, contador_id=contador_id, proximo_emprestimo_id=proximo_emprestimo_id,
+                     formato_datas=FORMATO_DATAS, segmentos=segmentos)
+    _gravar_manifesto(pasta, manifesto)
+    gravados += os.path.getsize(os.path.join(pasta, MANIFESTO))
+    _remover_orfaos(pasta, manifesto)
+    return manifesto['geracao'], gravados
+
+
+def _remover_orfaos(pasta: str, manifesto: Dict[str, Any]):
+    "Apaga segmentos que o manifesto não cita mais (versões antigas ou sobras de gravação interrompida)"
+    em_uso = {entrada['arquivo'] for secao in SECOES for entrada in manifesto['segmentos'][secao].values()}
+    for nome in os.listdir(pasta):
+        if nome.startswith(SECOES) and nome not in em_uso:
+            os.remove(os.path.join(pasta, nome))
+
+
+def percorrer_segmentos(pasta: str) -> Tuple[Dict[str, Any], Iterator[Tuple[str, List[Registro]]]]:
+    "Confere o manifesto; devolve ele e os segmentos, lidos um por vez, como (seção, registros)"
+    manifesto = _ler_manifesto(pasta)
+    if manifesto is None:
+        raise FileNotFoundError(f"Armazenamento não encontrado: {pasta}")
+    if manifesto.get('versao') != VERSAO_FORMATO:
+        raise ValueError(f"Versão de armazenamento não suportada: {manifesto.get('versao')}")
+    _, _, descomprimir = COMPRESSOES[manifesto['compressao']]
+    migrar = manifesto.get('formato_datas') != FORMATO_DATAS
+
+    def segmentos():
+        for secao in SECOES:
+            classe = CLASSES[secao]
+            for numero in sorted(manifesto['segmentos'][secao], key=int):
+                entrada = manifesto['segmentos'][secao][numero]
+                with open(os.path.join(pasta, entrada['arquivo']), 'rb') as f:
+                    conteudo = f.read()
+                if hashlib.sha256(conteudo).hexdigest() != entrada['sha256']:
+                    raise ValueError(f"Segmento corrompido: {entrada['arquivo']}")
+                grupo = json.loads(descomprimir(conteudo))
+                if migrar:
+                    migrar_datas(grupo)
+                yield secao, [classe.de_dict(registro) for registro in grupo]
+
+    return manifesto, segmentos()
+
+
+def carregar_segmentos(pasta: str) -> Tuple[List[Livro], List[Emprestimo], Dict[str, Any]]:
+    "Lê todos os segmentos conferindo o checksum; devolve livros, empréstimos e o manifesto (contador de ids, geração...)"
+    manifesto, segmentos = percorrer_segmentos(pasta)
+    listas: Dict[str, List[Any]] = {secao: [] for secao in SECOES}
+    for secao, grupo in segmentos:
+        listas[secao].extend(grupo)
+    return listas['livros'], listas['emprestimos'], manifesto
@@ -0,0 +1,344 @@
+"Serviço HTTP/JSON assíncrono do Sistema de Gerenciamento de Biblioteca Pessoal"
+"Usa apenas asyncio da biblioteca padrão; inclui um cliente de carga para medir requisições por segundo"
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from biblioteca import Biblioteca
+from datas import datas_para_iso
+
+
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+# Buscas sem limite devolvem no máximo isto
+LIMITE_BUSCA = 100
+
+
+class ErroRequisicao(Exception):
+    "Erro que vira uma resposta HTTP com o status informado"
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _inteiro(valor: Any, campo: str) -> int:
+    "Converte um campo numérico da requisição, respondendo 400 se for inválido"
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"Campo inválido: {campo}") from None
+
+
+def _codificar(dados: Any) -> bytes:
+    # Os clientes continuam recebendo as datas em texto ISO
+    return json.dumps(datas_para_iso(dados), ensure_ascii=False, default=dict).encode('utf-8')
+
+
+def _primeiros(buscar, limite: int) -> List[Dict[str, Any]]:
+    "Só os primeiros resultados da busca"
+    return buscar()[:limite]
+
+
+def _codificar_resultado(funcao, *argumentos) -> bytes:
+    "Chama a função e já codifica o resultado, para as duas coisas rodarem fora do laço de eventos"
+    return _codificar(funcao(*argumentos))
+
+
+class ServidorBiblioteca:
+    "Expõe cadastro, busca, empréstimo, devolução e relatório de uma Biblioteca via HTTP/JSON"
+
+    def __init__(self, biblioteca: Optional[Biblioteca] = None, host: str = '127.0.0.1', porta: int = 8080,
+                 max_conexoes: int = 256, max_requisicoes: int = 64, trabalhadores: int = 2,
+                 tempo_ocioso: float = 30.0):
+        # O relatório roda numa thread do executor enquanto o laço atende empréstimos,
+        # por isso a biblioteca precisa estar no modo concorrente
+        self.biblioteca = biblioteca if biblioteca is not None else Biblioteca(concorrente=True)
+        if not getattr(self.biblioteca, 'concorrente', True):
+            raise ValueError("O servidor exige uma Biblioteca(concorrente=True)")
+        self.host = host
+        self.porta = porta
+        self.max_conexoes = max_conexoes
+        self.tempo_ocioso = tempo_ocioso
+        self._semaforo = asyncio.Semaphore(max_requisicoes)
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='relatorios')
+        self._conexoes = 0
+        self._servidor: Optional[asyncio.AbstractServer] = None
+
+    async def iniciar(self) -> int:
+        "Começa a aceitar conexões e devolve a porta efetiva (útil com porta=0)"
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self.porta
+
+    async def parar(self):
+        "Para de aceitar conexões e libera o executor"
+        if self._servidor:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def servir_para_sempre(self):
+        "Inicia o servidor e atende até ser interrompido"
+        await self.iniciar()
+        print(f"📡 Servidor da biblioteca em http://{self.host}:{self.porta}")
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        "Atende uma conexão, processando requisições em sequência enquanto ela for mantida"
+        self._conexoes += 1
+        try:
+            if self._conexoes > self.max_conexoes:
+                await self._responder(escritor, HTTPStatus.SERVICE_UNAVAILABLE,
+                                      {'erro': 'Limite de conexões atingido'}, manter=False)
+                return
+
+            while True:
+                try:
+                    cabecalho = await asyncio.wait_for(leitor.readuntil(b'\r\n\r\n'), self.tempo_ocioso)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ConnectionError):
+                    break
+
+                try:
+                    metodo, alvo, manter, tamanho = self._ler_cabecalho(cabecalho)
+                    corpo = await leitor.readexactly(tamanho) if tamanho else b''
+                    async with self._semaforo:
+                        status, resposta = await self._despachar(metodo, alvo, corpo)
+                except ErroRequisicao as erro:
+                    status, resposta, manter = erro.status, {'erro': str(erro)}, False
+                except asyncio.IncompleteReadError:
+                    break
+
+                await self._responder(escritor, status, resposta, manter)
+                if not manter:
+                    break
+        finally:
+            self._conexoes -= 1
+            escritor.close()
+
+    def _ler_cabecalho(self, cabecalho: bytes) -> Tuple[str, str, bool, int]:
+        "Interpreta a linha de requisição e os cabeçalhos relevantes"
+        linhas = cabecalho.decode('latin-1').split('\r\n')
+        try:
+            metodo, alvo, versao = linhas[0].split(' ', 2)
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Linha de requisição inválida") from None
+
+        campos = {}
+        for linha in linhas[1:]:
+            if ':' in linha:
+                nome, valor = linha.split(':', 1)
+                campos[nome.strip().lower()] = valor.strip().lower()
+
+        conexao = campos.get('connection', '')
+        manter = conexao == 'keep-alive' if versao == 'HTTP/1.0' else conexao != 'close'
+        try:
+            tamanho = int(campos.get('content-length', 0))
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Content-Length inválido")
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise ErroRequisicao(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição muito grande")
+        return metodo.upper(), alvo, manter, tamanho
+
+    async def _despachar(self, metodo: str, alvo: str, corpo: bytes) -> Tuple[int, Any]:
+        "Encaminha a requisição para a operação da biblioteca"
+        partes = urlsplit(alvo)
+        caminho = [parte for parte in partes.path.split('/') if parte]
+        parametros = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+        try:
+            dados = json.loads(corpo) if corpo else {}
+        except json.JSONDecodeError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "JSON inválido") from None
+
+        try:
+            if caminho == ['livros'] and metodo == 'POST':
+                livro = self.biblioteca.cadastrar_livro(dados['titulo'], dados['autor'], _inteiro(dados['ano'], 'ano'),
+                                                        dados['categoria'])
+                return HTTPStatus.CREATED, livro
+            if caminho == ['livros'] and metodo == 'GET':
+                limite = _inteiro(parametros['limite'], 'limite') if 'limite' in parametros else None
+                if limite is not None and limite < 1:
+                    raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Limite e página devem ser maiores que zero")
+                if 'categoria' in parametros and 'valor' not in parametros:
+                    buscar = partial(_primeiros, partial(self.biblioteca.filtrar_livros_por_categoria,
+                                                         parametros['categoria']), limite or LIMITE_BUSCA)
+                else:
+                    criterio = parametros.get('criterio', 'titulo')
+                    if criterio not in ('titulo', 'autor', 'categoria'):
+                        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Critério inválido")
+                    valor = parametros.get('valor', '')
+                    if 'pagina' in parametros:
+                        pagina = _inteiro(parametros['pagina'], 'pagina')
+                        if pagina < 1:
+                            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Limite e página devem ser maiores que zero")
+                        buscar = partial(self.biblioteca.buscar_ranqueado, criterio, valor, limite or 20, pagina)
+                    else:
+                        buscar = partial(_primeiros, partial(self.biblioteca.buscar_livros, criterio, valor),
+                                         limite or LIMITE_BUSCA)
+                # A busca percorre todas as ocorrências antes de cortar: roda no executor qualquer que seja o limite
+                return HTTPStatus.OK, await self._no_executor(_codificar_resultado, buscar)
+            if caminho == ['emprestimos'] and metodo == 'POST':
+                emprestimo = self.biblioteca.emprestar_livro(_inteiro(dados['livro_id'], 'livro_id'), dados['pessoa'])
+                return HTTPStatus.CREATED, emprestimo
+            if len(caminho) == 3 and caminho[0] == 'emprestimos' and caminho[2] == 'devolucao' and metodo == 'POST':
+                return HTTPStatus.OK, self.biblioteca.devolver_livro(_inteiro(caminho[1], 'id'))
+            # Relatório e estatísticas são montados e codificados no executor; o laço só escreve os bytes
+            if caminho == ['relatorio'] and metodo == 'GET':
+                return HTTPStatus.OK, await self._no_executor(_codificar_resultado, self.biblioteca.gerar_relatorio)
+            if caminho == ['estatisticas'] and metodo == 'GET':
+                return HTTPStatus.OK, await self._no_executor(_codificar_resultado,
+                                                              self.biblioteca.calcular_estatisticas)
+        except (KeyError, TypeError) as erro:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"Campo ausente ou inválido: {erro}") from None
+        except ValueError as erro:
+            status = HTTPStatus.NOT_FOUND if 'não encontrado' in str(erro) else HTTPStatus.CONFLICT
+            return status, {'erro': str(erro)}
+
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, "Rota não encontrada")
+
+    async def _no_executor(self, funcao, *argumentos):
+        "Executa trabalho pesado de CPU fora do laço de eventos"
+        return await asyncio.get_running_loop().run_in_executor(self._executor, funcao, *argumentos)
+
+    async def _responder(self, escritor: asyncio.StreamWriter, status: int, dados: Any, manter: bool):
+        "Escreve a resposta JSON com Content-Length, mantendo ou encerrando a conexão"
+        # Respostas pesadas já chegam codificadas do executor
+        corpo = dados if isinstance(dados, bytes) else _codificar(dados)
+        status = HTTPStatus(status)
+        cabecalho = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(corpo)}\r\n"
+                     f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n")
+        escritor.write(cabecalho.encode('latin-1') + corpo)
+        try:
+            await escritor.drain()
+        except ConnectionError:
+            pass
+
+
+class ClienteBiblioteca:
+    "Cliente HTTP mínimo que reaproveita uma única conexão (keep-alive)"
+
+    def __init__(self, host: str = '127.0.0.1', porta: int = 8080):
+        self.host = host
+        self.porta = porta
+        self._leitor: Optional[asyncio.StreamReader] = None
+        self._escritor: Optional[asyncio.StreamWriter] = None
+
+    async def requisitar(self, metodo: str, caminho: str, dados: Any = None) -> Tuple[int, Any]:
+        "Envia uma requisição e devolve (status, JSON da resposta)"
+        if self._escritor is None:
+            self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta)
+        corpo = _codificar(dados) if dados is not None else b''
+        self._escritor.write((f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+                              f"Content-Length: {len(corpo)}\r\n\r\n").encode('latin-1') + corpo)
+        await self._escritor.drain()
+
+        cabecalho = (await self._leitor.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(cabecalho[0].split(' ')[1])
+        campos = dict((nome.strip().lower(), valor.strip()) for nome, valor in
+                      (linha.split(':', 1) for linha in cabecalho[1:] if ':' in linha))
+        resposta = json.loads(await self._leitor.readexactly(int(campos.get('content-length', 0))) or b'null')
+        if campos.get('connection', '').lower() == 'close':
+            await self.fechar()
+        return status, resposta
+
+    async def fechar(self):
+        "Encerra a conexão"
+        if self._escritor:
+            self._escritor.close()
+            await self._escritor.wait_closed()
+        self._leitor = self._escritor = None
+
+
+async def executar_carga(host: str = '127.0.0.1', porta: int = 8080, conexoes: int = 16,
+                         duracao: float = 5.0, fracao_relatorio: float = 0.01, semente: int = 42) -> Dict[str, Any]:
+    "Dispara buscas, empréstimos/devoluções e relatórios por várias conexões e mede a vazão"
+    aleatorio = random.Random(semente)
+    palavras = ('amor', 'tempo', 'casa', 'mar', 'silva', 'costa', 'ficção', 'rio')
+    contagem: Dict[str, int] = {}
+    latencias: List[float] = []
+    fim = time.perf_counter() + duracao
+
+    async def conexao(numero: int):
+        cliente = ClienteBiblioteca(host, porta)
+        try:
+            while time.perf_counter() < fim:
+                sorteio = aleatorio.random()
+                inicio = time.perf_counter()
+                if sorteio < fracao_relatorio:
+                    status, _ = await cliente.requisitar('GET', '/relatorio')
+                elif sorteio < 0.2:
+                    status, emprestimo = await cliente.requisitar(
+                        'POST', '/emprestimos', {'livro_id': aleatorio.randint(1, 1000), 'pessoa': f"Carga {numero}"})
+                    if status == HTTPStatus.CREATED:
+                        status, _ = await cliente.requisitar('POST', f"/emprestimos/{emprestimo['id']}/devolucao")
+                else:
+                    consulta = urlencode({'criterio': 'titulo', 'valor': aleatorio.choice(palavras), 'limite': 20})
+                    status, _ = await cliente.requisitar('GET', f"/livros?{consulta}")
+                latencias.append(time.perf_counter() - inicio)
+                contagem[str(status)] = contagem.get(str(status), 0) + 1
+        finally:
+            await cliente.fechar()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(conexao(numero) for numero in range(conexoes)))
+    decorrido = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        'conexoes': conexoes,
+        'duracao_s': decorrido,
+        'requisicoes': len(latencias),
+        'requisicoes_por_segundo': len(latencias) / decorrido if decorrido else 0,
+        'p50_ms': latencias[len(latencias) // 2] * 1000 if latencias else None,
+        'p99_ms': latencias[int(len(latencias) * 0.99)] * 1000 if latencias else None,
+        'status': contagem,
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    "Interface de linha de comando: servir a biblioteca ou gerar carga contra um servidor"
+    parser = argparse.ArgumentParser(description="Serviço HTTP da biblioteca")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    servir = subcomandos.add_parser('servir', help="inicia o servidor")
+    servir.add_argument('--host', default='127.0.0.1')
+    servir.add_argument('--porta', type=int, default=8080)
+    servir.add_argument('--arquivo', default='biblioteca.seg', help="dados carregados na inicialização")
+    servir.add_argument('--max-conexoes', type=int, default=256)
+    servir.add_argument('--max-requisicoes', type=int, default=64)
+
+    carga = subcomandos.add_parser('carga', help="mede requisições por segundo contra um servidor")
+    carga.add_argument('--host', default='127.0.0.1')
+    carga.add_argument('--porta', type=int, default=8080)
+    carga.add_argument('--conexoes', type=int, default=16)
+    carga.add_argument('--duracao', type=float, default=5.0)
+
+    opcoes = parser.parse_args(argumentos)
+    if opcoes.comando == 'servir':
+        biblioteca = Biblioteca(concorrente=True)
+        biblioteca.carregar_dados(opcoes.arquivo)
+        servidor = ServidorBiblioteca(biblioteca, opcoes.host, opcoes.porta,
+                                      opcoes.max_conexoes, opcoes.max_requisicoes)
+        try:
+            asyncio.run(servidor.servir_para_sempre())
+        except KeyboardInterrupt:
+            biblioteca.salvar_dados(opcoes.arquivo)
+    else:
+        resultado = asyncio.run(executar_carga(opcoes.host, opcoes.porta, opcoes.conexoes, opcoes.duracao))
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"Snapshot binário do Sistema de Gerenciamento de Biblioteca Pessoal, aberto com mmap"
+"Tabela de textos, colunas de largura fixa e índice de ids; os registros só são decodificados quando acessados"
+
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableSequence, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+from registros import Emprestimo, Livro, Registro
+
+
+# Cabeçalho: marca, versão do formato, posição e tamanho do diretório (JSON com as seções)
+MARCA = b'BIBL'
+VERSAO_FORMATO = 1
+CABECALHO = struct.Struct('<4sIQQ')
+
+# Tipos das colunas: 's' é o número do texto na tabela de textos; os demais são códigos de array
+COLUNAS = {
+    'livros': (('id', 'q'), ('titulo', 's'), ('autor', 's'), ('ano', 'q'), ('categoria', 's'),
+               ('disponivel', 'B'), ('data_cadastro', 'q')),
+    'emprestimos': (('id', 'q'), ('livro_id', 'q'), ('pessoa', 's'), ('data_emprestimo', 'q'),
+                    ('data_vencimento', 'q'), ('devolvido', 'B'), ('data_devolucao', 'q'), ('multa', 'd')),
+}
+CLASSES = {'livros': Livro, 'emprestimos': Emprestimo}
+
+# Valores que marcam um campo ausente (ex.: data_devolucao de empréstimo aberto)
+SEM_TEXTO = 0xFFFFFFFF
+SEM_INTEIRO = -2 ** 63
+SEM_BOOLEANO = 2
+_AUSENTE = object()
+_TIPOS_ARRAY = {'s': 'I', 'q': 'q', 'B': 'B', 'd': 'd'}
+_VAZIOS = {'s': SEM_TEXTO, 'q': SEM_INTEIRO, 'B': SEM_BOOLEANO, 'd': math.nan}
+
+
+def eh_snapshot_binario(arquivo: str) -> bool:
+    "Indica se o arquivo usa o formato binário"
+    return arquivo.endswith('.bin')
+
+
+def _valor(registro: Any, campo: str) -> Any:
+    "Valor do campo ou _AUSENTE, lendo direto do slot quando o registro é compacto"
+    if isinstance(registro, Registro):
+        return getattr(registro, campo, _AUSENTE)
+    return registro.get(campo, _AUSENTE)
+
+
+def _extras(registro: Any, campos: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    "Campos fora das colunas fixas (ex.: preço), guardados à parte em JSON"
+    if isinstance(registro, Registro):
+        return registro._extras or None
+    return {chave: valor for chave, valor in registro.items() if chave not in campos} or None
+
+
+def escrever_snapshot(arquivo: str, livros: Iterable[Any], emprestimos: Iterable[Any], contador_id: int,
+                      proximo_emprestimo_id: int = 1):
+    "Grava o snapshot binário em arquivo temporário e troca de uma vez"
+    textos: Dict[str, int] = {}
+    secoes = {}
+    extras = {}
+    for secao, registros in (('livros', livros), ('emprestimos', emprestimos)):
+        colunas = COLUNAS[secao]
+        campos = tuple(campo for campo, _ in colunas)
+        valores = [array(_TIPOS_ARRAY[tipo]) for _, tipo in colunas]
+        extras[secao] = {}
+        for posicao, registro in enumerate(registros):
+            for (campo, tipo), coluna in zip(colunas, valores):
+                valor = _valor(registro, campo)
+                if valor is _AUSENTE or valor is None:
+                    valor = _VAZIOS[tipo]
+                elif tipo == 's':
+                    valor = textos.setdefault(valor, len(textos))
+                try:
+                    coluna.append(valor)
+                except (TypeError, OverflowError):
+                    raise ValueError(f"Valor de {campo!r} não cabe no formato binário: {valor!r}") from None
+            extra = _extras(registro, campos)
+            if extra:
+                extras[secao][posicao] = extra
+        # Índice de ids: ids em ordem crescente e a posição de cada um na coluna
+        ids = valores[0]
+        ordem = sorted(range(len(ids)), key=ids.__getitem__)
+        secoes[secao] = valores + [array('q', (ids[posicao] for posicao in ordem)), array('q', ordem)]
+
+    dados = [texto.encode('utf-8') for texto in textos]
+    deslocamentos = array('q', [0])
+    for texto in dados:
+        deslocamentos.append(deslocamentos[-1] + len(texto))
+
+    diretorio = {
+        'contador_id': contador_id,
+        'proximo_emprestimo_id': max(max(secoes['emprestimos'][-2], default=0) + 1, proximo_emprestimo_id),
+        'textos': len(dados),
+        'extras': extras,
+    }
+    temporario = arquivo + '.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(b'\0' * CABECALHO.size)
+
+        def gravar(bloco) -> List[int]:
+            # Cada bloco começa alinhado em 8 bytes, para as colunas virarem memoryview sem cópia
+            f.write(b'\0' * (-f.tell() % 8))
+            inicio = f.tell()
+            if isinstance(bloco, array):
+                if sys.byteorder == 'big':
+                    bloco = array(bloco.typecode, bloco)
+                    bloco.byteswap()
+                bloco = bloco.tobytes()
+            f.write(bloco)
+            return [inicio, len(bloco)]
+
+        diretorio['deslocamentos'] = gravar(deslocamentos)
+        diretorio['dados_textos'] = gravar(b''.join(dados))
+        for secao, blocos in secoes.items():
+            diretorio[secao] = {'total': len(blocos[0]), 'colunas': [gravar(bloco) for bloco in blocos]}
+
+        posicao = f.tell()
+        texto = json.dumps(diretorio, ensure_ascii=False, separators=(',', ':'), default=dict).encode('utf-8')
+        f.write(texto)
+        f.seek(0)
+        f.write(CABECALHO.pack(MARCA, VERSAO_FORMATO, posicao, len(texto)))
+    os.replace(temporario, arquivo)
+
+
+class SnapshotBinario:
+    "Snapshot aberto com mmap; abrir custa o mesmo para 10 ou 10 milhões de livros"
+
+    def __init__(self, arquivo: str):
+        with open(arquivo, 'rb') as f:
+            # Arquivo vazio não pode ser mapeado; cai no erro de cabeçalho abaixo
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        if len(self._mapa) < CABECALHO.size:
+            raise ValueError(f"Snapshot binário inválido: {arquivo}")
+        marca, versao, posicao, tamanho = CABECALHO.unpack_from(self._mapa, 0)
+        if marca != MARCA or versao != VERSAO_FORMATO:
+            raise ValueError(f"Snapshot binário inválido ou de outra versão: {arquivo}")
+        self._diretorio = json.loads(self._mapa[posicao:posicao + tamanho])
+        self.contador_id: int = self._diretorio['contador_id']
+        self.proximo_emprestimo_id: int = self._diretorio['proximo_emprestimo_id']
+        self._deslocamentos = self._coluna(self._diretorio['deslocamentos'], 'q')
+        self._inicio_textos = self._diretorio['dados_textos'][0]
+
+    def _coluna(self, bloco: List[int], tipo: str):
+        "Coluna como memoryview sobre o mapa, sem copiar"
+        inicio, tamanho = bloco
+        visao = memoryview(self._mapa)[inicio:inicio + tamanho].cast(tipo)
+        if sys.byteorder == 'big':
+            # O arquivo é little-endian; aqui não há como evitar a cópia
+            visao = array(tipo, visao)
+            visao.byteswap()
+        return visao
+
+    def texto(self, numero: int) -> str:
+        "Texto da tabela de textos"
+        inicio = self._inicio_textos + self._deslocamentos[numero]
+        fim = self._inicio_textos + self._deslocamentos[numero + 1]
+        return str(self._mapa[inicio:fim], 'utf-8')
+
+    def registros(self, secao: str) -> 'RegistrosMapeados':
+        "Sequência preguiçosa dos livros ou empréstimos"
+        return RegistrosMapeados(self, secao)
+
+
+class RegistrosMapeados(MutableSequence):
+    "Lista de registros sobre o snapshot: cada posição é decodificada no primeiro acesso e guardada"
+
+    def __init__(self, snapshot: SnapshotBinario, secao: str):
+        diretorio = snapshot._diretorio[secao]
+        colunas = COLUNAS[secao]
+        blocos = diretorio['colunas']
+        self._snapshot = snapshot
+        self._classe = CLASSES[secao]
+        self._colunas = [(campo, tipo, snapshot._coluna(bloco, _TIPOS_ARRAY[tipo]))
+                         for (campo, tipo), bloco in zip(colunas, blocos)]
+        self._ids_ordenados = snapshot._coluna(blocos[-2], 'q')
+        self._posicoes = snapshot._coluna(blocos[-1], 'q')
+        self._extras = {int(posicao): extra for posicao, extra in snapshot._diretorio['extras'][secao].items()}
+        self._base = diretorio['total']
+        # Registros já decodificados (as alterações ficam neles) e os acrescentados depois
+        self._decodificados: Dict[int, Registro] = {}
+        self._novos: List[Registro] = []
+        self._novos_por_id: Dict[int, Registro] = {}
+
+    def _decodificar(self, posicao: int) -> Registro:
+        "Monta o registro da posição a partir das colunas"
+        registro = self._classe()
+        for campo, tipo, coluna in self._colunas:
+            valor = coluna[posicao]
+            if tipo == 's':
+                if valor != SEM_TEXTO:
+                    setattr(registro, campo, self._snapshot.texto(valor))
+            elif tipo == 'B':
+                if valor != SEM_BOOLEANO:
+                    setattr(registro, campo, bool(valor))
+            elif tipo == 'd':
+                if not math.isnan(valor):
+                    setattr(registro, campo, valor)
+            elif valor != SEM_INTEIRO:
+                setattr(registro, campo, valor)
+        extra = self._extras.get(posicao)
+        if extra:
+            registro.update(extra)
+        return registro
+
+    def __len__(self) -> int:
+        return self._base + len(self._novos)
+
+    def __getitem__(self, posicao):
+        if isinstance(posicao, slice):
+            return [self[indice] for indice in range(*posicao.indices(len(self)))]
+        if posicao < 0:
+            posicao += len(self)
+        if posicao >= self._base:
+            return self._novos[posicao - self._base]
+        if posicao < 0:
+            raise IndexError('índice fora da lista')
+        registro = self._decodificados.get(posicao)
+        if registro is None:
+            # setdefault garante um único objeto por posição mesmo com duas threads decodificando
+            registro = self._decodificados.setdefault(posicao, self._decodificar(posicao))
+        return registro
+
+    def __setitem__(self, posicao, registro):
+        if isinstance(posicao, slice):
+            self._materializar()
+            self._novos[posicao] = registro
+            self._novos_por_id = {item['id']: item for item in self._novos}
+            return
+        posicao = range(len(self))[posicao]
+        if posicao >= self._base:
+            self._novos[posicao - self._base] = registro
+            self._novos_por_id[registro['id']] = registro
+        else:
+            self._decodificados[posicao] = registro
+
+    def __delitem__(self, posicao):
+        if isinstance(posicao, slice):
+            inicio, fim, passo = posicao.indices(len(self))
+            removidos = range(inicio, fim, passo)
+        else:
+            removidos = [range(len(self))[posicao]]
+        if removidos and min(removidos) < self._base:
+            self._materializar()
+        # Desfazer um lote (del livros[inicio:]) só mexe nos acrescentados
+        for indice in sorted(removidos, reverse=True):
+            registro = self._novos.pop(indice - self._base)
+            self._novos_por_id.pop(registro['id'], None)
+
+    def insert(self, posicao: int, registro: Any):
+        if posicao < len(self):
+            self._materializar()
+        self._novos.insert(posicao - self._base, registro)
+        self._novos_por_id[registro['id']] = registro
+
+    def extend(self, registros: Iterable[Any]):
+        for registro in registros:
+            self.append(registro)
+
+    def _materializar(self):
+        "Decodifica tudo para uma lista comum; só acontece ao inserir ou remover no meio"
+        self._novos = list(self)
+        self._novos_por_id = {registro['id']: registro for registro in self._novos}
+        self._decodificados = {}
+        self._base = 0
+
+    def por_id(self, registro_id: int) -> Optional[Registro]:
+        "Registro pelo id, por busca binária no índice do arquivo, sem decodificar os demais"
+        registro = self._novos_por_id.get(registro_id)
+        if registro is not None or not self._base:
+            return registro
+        indice = bisect_left(self._ids_ordenados, registro_id)
+        if indice < len(self._ids_ordenados) and self._ids_ordenados[indice] == registro_id:
+            return self[self._posicoes[indice]]
+        return None
+
+    def onde(self, campo: str, manter: Callable[[int], bool]) -> Iterator[Registro]:
+        "Registros do arquivo cujo campo inteiro passa no filtro; só esses são decodificados, e sem ficar guardados"
+        coluna = next(coluna for nome, _, coluna in self._colunas if nome == campo)
+        for posicao in range(self._base):
+            if manter(coluna[posicao]):
+                yield self._decodificados.get(posicao) or self._decodificar(posicao)
+
+    @property
+    def decodificados(self) -> int:
+        "Quantos registros do arquivo já foram decodificados"
+        return len(self._decodificados)
+
+    def __eq__(self, outra: object) -> bool:
+        if not isinstance(outra, Sequence) or isinstance(outra, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(outra) and all(a == b for a, b in zip(self, outra))
+
+    def __repr__(self) -> str:
+        return f"<RegistrosMapeados {len(self)} registros, {self.decodificados} decodificados>"
+
+
+def main(argumentos: Optional[List[str]] = None):
+    "Interface de linha de comando: converte entre o JSON e o snapshot binário"
+    from biblioteca import converter_arquivo
+
+    parser = argparse.ArgumentParser(description="Conversão entre snapshot JSON (.json/.jsonl) e binário (.bin)")
+    parser.add_argument('origem', help="arquivo lido, ex.: biblioteca.json")
+    parser.add_argument('destino', help="arquivo gravado, ex.: biblioteca.bin")
+    opcoes = parser.parse_args(argumentos)
+    converter_arquivo(opcoes.origem, opcoes.destino)
+    print(f"✅ {opcoes.origem} convertido para {opcoes.destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"Testes para os benchmarks do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import unittest
+from benchmark import comparar_resultados, executar_benchmarks, gerar_biblioteca, gerar_catalogo
+
+
+class TestBenchmark(unittest.TestCase):
+    "Classe de testes para o gerador de carga e os benchmarks"
+
+    def test_gerador_reprodutivel(self):
+        "Testa se a mesma semente gera o mesmo acervo"
+        print("\n🧪 Testando gerador de acervo...")
+
+        self.assertEqual(gerar_catalogo(50, semente=7), gerar_catalogo(50, semente=7))
+        biblioteca = gerar_biblioteca(200, 300)
+        relatorio = biblioteca.gerar_relatorio()
+        self.assertEqual(relatorio['total_livros'], 200)
+        self.assertGreater(len(biblioteca.emprestimos), 0)
+        self.assertEqual(relatorio['livros_emprestados'],
+                         sum(1 for e in biblioteca.emprestimos if not e['devolvido']))
+
+        print("✅ Gerador de acervo funcionando corretamente")
+
+    def test_executar_benchmarks(self):
+        "Testa a execução e a comparação de um cenário pequeno"
+        print("\n🧪 Testando benchmarks...")
+
+        resultado = executar_benchmarks([300], repeticoes=5)
+        operacoes = resultado['cenarios'][0]['operacoes']
+        for nome in ('buscar_livros', 'filtrar_livros_por_categoria', 'emprestar_livro', 'devolver_livro',
+                     'gerar_relatorio', 'calcular_estatisticas_livros', 'salvar_dados_json', 'carregar_dados_json'):
+            self.assertIn(nome, operacoes)
+            self.assertGreater(operacoes[nome]['ops_por_segundo'], 0)
+            self.assertLessEqual(operacoes[nome]['p50_ms'], operacoes[nome]['p99_ms'])
+            self.assertIsNotNone(operacoes[nome]['pico_memoria_bytes'])
+
+        primeiro_menu = resultado['cenarios'][0]['primeiro_menu']
+        self.assertEqual(set(primeiro_menu), {'json', 'jsonl', 'bin', 'seg'})
+        self.assertLessEqual(primeiro_menu['json']['segundo_plano_ms'], primeiro_menu['json']['carga_completa_ms'])
+        self.assertEqual(len(comparar_resultados(resultado, resultado)), len(operacoes))
+
+        print("✅ Benchmarks funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,23 @@
 "Testes para o Sistema de Gerenciamento de Biblioteca Pessoal"
 "Demonstra casos de teste abrangentes para todas as funcionalidades"
 
+import os
+import random
+import statistics
+import sys
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import json
 from datetime import datetime, timedelta
 from biblioteca import Biblioteca, criar_funcao_desconto, processar_livros_funcional, calcular_estatisticas_livros
+from datas import SEGUNDOS_POR_DIA, agora, para_iso
+from registros import Livro, Emprestimo
 
 
 class TestBiblioteca(unittest.TestCase):
-   "Classe de testes para o sistema de biblioteca"
+    "Classe de testes para o sistema de biblioteca"
     
     def setUp(self):
         """Configuração inicial para cada teste"""
@@ -28,7 +38,7 @@ class TestBiblioteca(unittest.TestCase):
         )
     
     def test_cadastrar_livro(self):
-      "Testa o cadastro de livros"
+        "Testa o cadastro de livros"
         print("\n🧪 Testando cadastro de livros...")
         
        
@@ -59,7 +69,7 @@ class TestBiblioteca(unittest.TestCase):
         print("✅ Busca por título funcionando corretamente")
     
     def test_buscar_livros_por_autor(self):
-       "Testa busca de livros por autor"
+        "Testa busca de livros por autor"
         print("\n🧪 Testando busca por autor...")
         
     
@@ -70,7 +80,7 @@ class TestBiblioteca(unittest.TestCase):
         print("✅ Busca por autor funcionando corretamente")
     
     def test_buscar_livros_por_categoria(self):
-       "Testa busca de livros por categoria"
+        "Testa busca de livros por categoria"
         print("\n🧪 Testando busca por categoria...")
         
         
@@ -80,7 +90,7 @@ class TestBiblioteca(unittest.TestCase):
         print("✅ Busca por categoria funcionando corretamente")
     
     def test_emprestar_livro(self):
-      "Testa empréstimo de livros"
+        "Testa empréstimo de livros"
         print("\n🧪 Testando empréstimo de livros...")
         
         
@@ -101,7 +111,7 @@ class TestBiblioteca(unittest.TestCase):
         print("✅ Empréstimo de livros funcionando corretamente")
     
     def test_devolver_livro(self):
-      "Testa devolução de livros"
+        "Testa devolução de livros"
         print("\n🧪 Testando devolução de livros...")
         
       
@@ -277,6 +287,473 @@ class TestBiblioteca(unittest.TestCase):
         self.assertEqual(len(livros), 4)  
         
         print("✅ Casos limite funcionando corretamente")
+    
+    def test_indices_por_id(self):
+        "Testa os índices id -> registro de livros e empréstimos"
+        print("\n🧪 Testando índices por id...")
+        
+        emprestimo = self.biblioteca.emprestar_livro(self.livro3['id'], "Carla Souza")
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'biblioteca.json')
+            self.biblioteca.salvar_dados(arquivo)
+            
+            outra = Biblioteca()
+            outra.carregar_dados(arquivo)
+        
+        devolucao = outra.devolver_livro(emprestimo['id'])
+        self.assertTrue(devolucao['devolvido'])
+        self.assertTrue(next(l for l in outra.livros if l['id'] == self.livro3['id'])['disponivel'])
+        
+        # Livros adicionados direto na lista pública continuam localizáveis
+        outra.livros.append({'id': 50, 'titulo': 'Avulso', 'autor': 'X', 'ano': 2000,
+                             'categoria': 'Teste', 'disponivel': True})
+        self.assertEqual(outra.emprestar_livro(50, "Lia")['livro_id'], 50)
+        
+        print("✅ Índices por id funcionando corretamente")
+    
+    def test_indice_ngramas_busca(self):
+        "Testa se a busca indexada retorna o mesmo que a busca linear"
+        print("\n🧪 Testando índice de n-gramas...")
+        
+        sem_indice = Biblioteca(indexar_busca=False)
+        for livro in self.biblioteca.livros:
+            sem_indice.cadastrar_livro(livro['titulo'], livro['autor'], livro['ano'], livro['categoria'])
+        
+        # Cadastro posterior deve atualizar o índice incrementalmente
+        for biblioteca in (self.biblioteca, sem_indice):
+            biblioteca.cadastrar_livro("A Máquina do Tempo", "H.G. Wells", 1895, "Ficção Científica")
+        
+        consultas = [("titulo", "senhor"), ("titulo", "DO"), ("titulo", "a"), ("titulo", "máquina do"),
+                     ("autor", "ORWELL"), ("autor", "s"), ("categoria", "ficção"), ("categoria", "ção cie"),
+                     ("titulo", "inexistente"), ("titulo", "")]
+        for criterio, valor in consultas:
+            self.assertEqual([l['id'] for l in self.biblioteca.buscar_livros(criterio, valor)],
+                             [l['id'] for l in sem_indice.buscar_livros(criterio, valor)])
+        
+        self.assertEqual(len(self.biblioteca.buscar_livros("categoria", "ficção")), 3)
+        
+        print("✅ Índice de n-gramas funcionando corretamente")
+    
+    def test_indice_categoria(self):
+        "Testa o índice de categoria no filtro e no relatório"
+        print("\n🧪 Testando índice de categoria...")
+        
+        novo = self.biblioteca.cadastrar_livro("Neuromancer", "William Gibson", 1984, "Ficção Científica")
+        
+        livros = self.biblioteca.filtrar_livros_por_categoria("Ficção Científica")
+        self.assertEqual([l['id'] for l in livros], [self.livro2['id'], self.livro4['id'], novo['id']])
+        self.assertEqual(self.biblioteca.filtrar_livros_por_categoria("Ficção"), [])
+        
+        relatorio = self.biblioteca.gerar_relatorio()
+        self.assertEqual(relatorio['livros_por_categoria']['Ficção Científica'], ["1984", "Duna", "Neuromancer"])
+        self.assertEqual(relatorio['livros_por_categoria']['Fantasia'], ["O Senhor dos Anéis"])
+        
+        print("✅ Índice de categoria funcionando corretamente")
+    
+    def test_contadores_e_atrasos(self):
+        "Testa contadores de disponibilidade e heap de vencimentos do relatório"
+        print("\n🧪 Testando contadores e empréstimos em atraso...")
+        
+        atrasado1 = self.biblioteca.emprestar_livro(self.livro1['id'], "Rui")
+        atrasado2 = self.biblioteca.emprestar_livro(self.livro2['id'], "Rui")
+        em_dia = self.biblioteca.emprestar_livro(self.livro3['id'], "Rui")
+        for emprestimo in (atrasado1, atrasado2):
+            emprestimo['data_vencimento'] = agora() - 3 * SEGUNDOS_POR_DIA
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'biblioteca.json')
+            self.biblioteca.salvar_dados(arquivo)
+            outra = Biblioteca()
+            outra.carregar_dados(arquivo)
+        
+        relatorio = outra.gerar_relatorio()
+        self.assertEqual(relatorio['livros_disponiveis'], 1)
+        self.assertEqual(relatorio['livros_emprestados'], 3)
+        self.assertEqual(relatorio['emprestimos_em_atraso'], 2)
+        
+        devolucao = outra.devolver_livro(atrasado1['id'])
+        self.assertGreater(devolucao['multa'], 0)
+        outra.devolver_livro(em_dia['id'])
+        
+        relatorio = outra.gerar_relatorio()
+        self.assertEqual(relatorio['livros_disponiveis'], 3)
+        self.assertEqual(relatorio['livros_emprestados'], 1)
+        self.assertEqual(relatorio['emprestimos_em_atraso'], 1)
+        
+        print("✅ Contadores e atrasos funcionando corretamente")
+    
+    def test_diario_de_alteracoes(self):
+        "Testa a recuperação de alterações pelo diário e a compactação"
+        print("\n🧪 Testando diário de alterações...")
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'biblioteca.json')
+            self.biblioteca.salvar_dados(arquivo)
+            
+            biblioteca = Biblioteca()
+            biblioteca.ativar_diario(arquivo)
+            biblioteca.carregar_dados(arquivo)
+            novo = biblioteca.cadastrar_livro("Vidas Secas", "Graciliano Ramos", 1938, "Literatura Brasileira")
+            emprestimo = biblioteca.emprestar_livro(novo['id'], "Bia")
+            outro = biblioteca.emprestar_livro(self.livro1['id'], "Caio")
+            biblioteca.devolver_livro(outro['id'])
+            biblioteca.desativar_diario()
+            
+            # Simula queda no meio da gravação de um registro
+            with open(arquivo + '.diario', 'a', encoding='utf-8') as f:
+                f.write('{"op":"cadastrar","livro":{"id":9')
+            
+            recuperada = Biblioteca()
+            recuperada.ativar_diario(arquivo)
+            recuperada.carregar_dados(arquivo)
+            self.assertEqual(len(recuperada.livros), 5)
+            self.assertEqual(recuperada.contador_id, novo['id'] + 1)
+            self.assertFalse(recuperada.buscar_livros("titulo", "Vidas Secas")[0]['disponivel'])
+            self.assertTrue(recuperada.emprestimos[1]['devolvido'])
+            self.assertEqual(recuperada.gerar_relatorio()['livros_emprestados'], 1)
+            
+            recuperada.compactar_diario()
+            self.assertEqual(os.path.getsize(arquivo + '.diario'), 0)
+            recuperada.devolver_livro(emprestimo['id'])
+            recuperada.desativar_diario()
+            
+            compactada = Biblioteca()
+            compactada.ativar_diario(arquivo)
+            compactada.carregar_dados(arquivo)
+            compactada.desativar_diario()
+            self.assertEqual(len(compactada.emprestimos), 2)
+            self.assertEqual(compactada.gerar_relatorio()['livros_emprestados'], 0)
+        
+        print("✅ Diário de alterações funcionando corretamente")
+    
+    def test_json_lines(self):
+        "Testa salvar e carregar no formato JSON Lines"
+        print("\n🧪 Testando formato JSON Lines...")
+        
+        emprestimo = self.biblioteca.emprestar_livro(self.livro4['id'], "Davi")
+        # Campos fora das colunas e um campo ausente no meio do registro também voltam
+        self.livro1['preco'] = 42.5
+        self.livro1['isbn'] = "978-0"
+        devolvido = self.biblioteca.devolver_livro(self.biblioteca.emprestar_livro(self.livro2['id'], "Eva")['id'])
+        del devolvido['data_devolucao']
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'biblioteca.jsonl')
+            self.biblioteca.salvar_dados(arquivo)
+            with open(arquivo, encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 7)
+            
+            outra = Biblioteca()
+            outra.cadastrar_livro("Descartado", "Ninguém", 2020, "Teste")
+            outra.carregar_dados(arquivo)
+        
+        self.assertEqual(outra.livros, self.biblioteca.livros)
+        self.assertEqual(outra.emprestimos, self.biblioteca.emprestimos)
+        self.assertEqual(outra.contador_id, self.biblioteca.contador_id)
+        self.assertEqual(outra.livros[0]['preco'], 42.5)
+        self.assertNotIn('data_devolucao', outra.emprestimos[-1])
+        self.assertEqual(outra.emprestimos[-1]['multa'], 0)
+        self.assertEqual(outra.gerar_relatorio()['livros_disponiveis'], 3)
+        self.assertEqual(len(outra.buscar_livros("autor", "herbert")), 1)
+        outra.devolver_livro(emprestimo['id'])
+        
+        print("✅ Formato JSON Lines funcionando corretamente")
+    
+    def test_registros_compactos(self):
+        "Testa a interface de dicionário dos registros com slots"
+        print("\n🧪 Testando registros compactos...")
+        
+        self.assertIsInstance(self.livro1, Livro)
+        self.assertFalse(hasattr(self.livro1, '__dict__'))
+        self.assertEqual(self.livro1.get('autor'), "J.R.R. Tolkien")
+        self.assertIsNone(self.livro1.get('preco'))
+        self.assertEqual(dict(self.livro1), self.livro1.copy())
+        self.assertEqual(list(self.livro1.keys())[:3], ['id', 'titulo', 'autor'])
+        
+        copia = self.livro1.copy()
+        copia['preco'] = 10.0
+        self.assertNotIn('preco', self.livro1)
+        
+        self.livro1['preco'] = 30.0
+        self.assertEqual(self.livro1['preco'], 30.0)
+        del self.livro1['preco']
+        self.assertNotIn('preco', self.livro1)
+        
+        emprestimo = self.biblioteca.emprestar_livro(self.livro2['id'], "Eva")
+        self.assertIsInstance(emprestimo, Emprestimo)
+        self.assertNotIn('multa', emprestimo)
+        with self.assertRaises(KeyError):
+            emprestimo['multa']
+        self.biblioteca.devolver_livro(emprestimo['id'])
+        self.assertEqual(emprestimo['multa'], 0)
+        
+        self.assertEqual(Livro.de_dict(dict(self.livro3)), self.livro3)
+        
+        print("✅ Registros compactos funcionando corretamente")
+    
+    def test_cadastro_em_lote(self):
+        "Testa o cadastro em lote a partir de iterável, CSV e JSON Lines"
+        print("\n🧪 Testando cadastro em lote...")
+        
+        novos = self.biblioteca.cadastrar_livros_em_lote([
+            ("Memórias Póstumas de Brás Cubas", "Machado de Assis", 1881, "Literatura Brasileira"),
+            {'titulo': "Fundação", 'autor': "Isaac Asimov", 'ano': "1951", 'categoria': "Ficção Científica"},
+        ])
+        self.assertEqual([l['id'] for l in novos], [5, 6])
+        self.assertEqual(novos[0]['data_cadastro'], novos[1]['data_cadastro'])
+        self.assertEqual(novos[1]['ano'], 1951)
+        self.assertEqual(len(self.biblioteca.buscar_livros("autor", "machado")), 2)
+        self.assertEqual(len(self.biblioteca.filtrar_livros_por_categoria("Ficção Científica")), 3)
+        self.assertEqual(self.biblioteca.gerar_relatorio()['livros_disponiveis'], 6)
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo_csv = os.path.join(pasta, 'acervo.csv')
+            with open(arquivo_csv, 'w', encoding='utf-8') as f:
+                f.write("titulo,autor,ano,categoria\nIracema,José de Alencar,1865,Literatura Brasileira\n")
+            arquivo_jsonl = os.path.join(pasta, 'acervo.jsonl')
+            with open(arquivo_jsonl, 'w', encoding='utf-8') as f:
+                f.write('{"titulo": "Neuromancer", "autor": "William Gibson", "ano": 1984, "categoria": "Cyberpunk"}\n')
+            
+            self.assertEqual(self.biblioteca.cadastrar_livros_em_lote(arquivo_csv)[0]['id'], 7)
+            self.assertEqual(self.biblioteca.cadastrar_livros_em_lote(arquivo_jsonl)[0]['id'], 8)
+        
+        # Uma entrada inválida desfaz o lote inteiro
+        with self.assertRaises(ValueError):
+            self.biblioteca.cadastrar_livros_em_lote([("Válido", "A", 2000, "B"), ("Inválido", "A", "x", "B")])
+        self.assertEqual(len(self.biblioteca.livros), 8)
+        self.assertEqual(self.biblioteca.cadastrar_livro("Próximo", "A", 2001, "B")['id'], 9)
+        
+        print("✅ Cadastro em lote funcionando corretamente")
+    
+    def test_concorrencia_sem_emprestimo_duplo(self):
+        "Testa empréstimos e devoluções simultâneos no modo concorrente"
+        print("\n🧪 Testando empréstimos concorrentes...")
+        
+        biblioteca = Biblioteca(concorrente=True, listras=8)
+        livros = biblioteca.cadastrar_livros_em_lote(
+            (f"Livro {i}", f"Autor {i}", 2000, "Teste") for i in range(20))
+        sucessos = []
+        
+        def terminal(semente):
+            aleatorio = random.Random(semente)
+            for _ in range(300):
+                livro_id = aleatorio.choice(livros)['id']
+                try:
+                    emprestimo = biblioteca.emprestar_livro(livro_id, f"Terminal {semente}")
+                except ValueError:
+                    continue
+                sucessos.append(emprestimo)
+                if aleatorio.random() < 0.7:
+                    biblioteca.devolver_livro(emprestimo['id'])
+                biblioteca.buscar_livros("titulo", "Livro 1")
+                biblioteca.gerar_relatorio()
+        
+        intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                list(executor.map(terminal, range(16)))
+        finally:
+            sys.setswitchinterval(intervalo)
+        
+        ids = [e['id'] for e in biblioteca.emprestimos]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), len(sucessos))
+        
+        abertos_por_livro = {}
+        for emprestimo in biblioteca.emprestimos:
+            if not emprestimo['devolvido']:
+                abertos_por_livro[emprestimo['livro_id']] = abertos_por_livro.get(emprestimo['livro_id'], 0) + 1
+        self.assertTrue(all(quantidade == 1 for quantidade in abertos_por_livro.values()))
+        
+        relatorio = biblioteca.gerar_relatorio()
+        self.assertEqual(relatorio['livros_emprestados'], len(abertos_por_livro))
+        self.assertEqual(relatorio['livros_disponiveis'], sum(1 for l in biblioteca.livros if l['disponivel']))
+        
+        print("✅ Empréstimos concorrentes funcionando corretamente")
+    
+    def test_motor_de_estatisticas(self):
+        "Testa estatísticas incrementais, percentis, histograma e resumo por categoria"
+        print("\n🧪 Testando motor de estatísticas...")
+        
+        self.assertEqual(self.biblioteca.calcular_estatisticas(), calcular_estatisticas_livros(self.biblioteca.livros))
+        self.assertEqual(calcular_estatisticas_livros([]), {'total': 0, 'media_ano': 0, 'categorias_unicas': 0})
+        
+        aleatorio = random.Random(5)
+        self.biblioteca.cadastrar_livros_em_lote(
+            (f"Livro {i}", "Autor", aleatorio.randint(1850, 2020), aleatorio.choice(["Poesia", "Fantasia"]))
+            for i in range(500))
+        self.biblioteca.cadastrar_livro("Avulso", "Autor", 1999, "Poesia")
+        livros = self.biblioteca.livros
+        self.assertEqual(self.biblioteca.calcular_estatisticas(), calcular_estatisticas_livros(livros))
+        
+        estatisticas = self.biblioteca.estatisticas
+        anos = sorted(livro['ano'] for livro in livros)
+        esperados = statistics.quantiles(anos, n=4, method='inclusive')
+        self.assertEqual(list(estatisticas.percentis((0.25, 0.5, 0.75)).values()), esperados)
+        self.assertEqual(estatisticas.percentis((0.0, 1.0)), {'p0': anos[0], 'p100': anos[-1]})
+        
+        histograma = estatisticas.histograma(largura=50)
+        self.assertEqual(sum(histograma.values()), len(livros))
+        self.assertEqual(histograma[1900], sum(1 for ano in anos if 1900 <= ano < 1950))
+        
+        poesia = [livro['ano'] for livro in livros if livro['categoria'] == "Poesia"]
+        resumo_poesia = estatisticas.por_categoria()["Poesia"]
+        self.assertEqual(resumo_poesia['total'], len(poesia))
+        self.assertEqual(resumo_poesia['media_ano'], sum(poesia) / len(poesia))
+        self.assertEqual(resumo_poesia['ano_mais_recente'], max(poesia))
+        self.assertEqual(estatisticas.contagem_por_ano("Inexistente"), {})
+        
+        # Ano que não cabe na coluna é recusado sem deixar o livro pela metade nos índices
+        total, proximo_id = len(livros), self.biblioteca.contador_id
+        for ano in ("1999", 2**40, 1999.5):
+            with self.assertRaises(ValueError):
+                self.biblioteca.cadastrar_livro("Inválido", "Autor", ano, "Poesia")
+        self.assertEqual(len(self.biblioteca.livros), total)
+        self.assertEqual(self.biblioteca.contador_id, proximo_id)
+        self.assertEqual(len(estatisticas), total)
+        self.assertEqual(self.biblioteca.buscar_livros('titulo', "Inválido"), [])
+        self.assertIsNone(self.biblioteca._obter_livro(proximo_id))
+        self.assertIs(self.biblioteca.estatisticas, estatisticas)
+        with self.assertRaises(ValueError):
+            estatisticas.adicionar_lote([Livro(1, "A", "B", 2000, "Poesia", True, 0), Livro(2, "A", "B", "x", "Poesia", True, 0)])
+        self.assertEqual(len(estatisticas.categorias), total)
+        
+        # Alteração direta da lista reconstrói as estatísticas junto com os índices
+        self.biblioteca.livros.append(Livro(9999, "Antigo", "Autor", 1500, "Poesia", True, 0))
+        self.assertEqual(self.biblioteca.calcular_estatisticas()['ano_mais_antigo'], 1500)
+        
+        print("✅ Motor de estatísticas funcionando corretamente")
+    
+    def test_migracao_de_datas(self):
+        "Testa a leitura de arquivos e diários antigos, com datas em texto ISO"
+        print("\n🧪 Testando migração de datas...")
+        
+        vencido = (datetime.now() - timedelta(days=4)).isoformat()
+        cadastro = datetime(2024, 5, 1, 10, 30).isoformat()
+        livros = [{**livro, 'data_cadastro': cadastro} for livro in map(dict, self.biblioteca.livros)]
+        emprestimo = {'id': 1, 'livro_id': livros[0]['id'], 'pessoa': "Lia", 'data_emprestimo': vencido,
+                      'data_vencimento': vencido, 'devolvido': False}
+        livros[0]['disponivel'] = False
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            antigo_json = os.path.join(pasta, 'antiga.json')
+            with open(antigo_json, 'w', encoding='utf-8') as f:
+                json.dump({'livros': livros, 'emprestimos': [emprestimo], 'contador_id': 5}, f)
+            antigo_jsonl = os.path.join(pasta, 'antiga.jsonl')
+            with open(antigo_jsonl, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'contador_id': 5, 'livro': list(livros[0]), 'emprestimo': list(emprestimo)}) + '\n')
+                for livro in livros:
+                    f.write(json.dumps(['livro'] + list(livro.values())) + '\n')
+                f.write(json.dumps(['emprestimo'] + list(emprestimo.values())) + '\n')
+            
+            for arquivo in (antigo_json, antigo_jsonl):
+                migrada = Biblioteca()
+                migrada.carregar_dados(arquivo)
+                self.assertEqual(migrada.livros[0]['data_cadastro'], int(datetime(2024, 5, 1, 10, 30).timestamp()))
+                self.assertEqual(para_iso(migrada.livros[0]['data_cadastro']), cadastro)
+                self.assertEqual(migrada.gerar_relatorio()['emprestimos_em_atraso'], 1)
+                self.assertEqual(migrada.devolver_livro(1)['multa'], 8.0)
+            
+            # Um diário antigo ainda é reproduzido depois da troca de formato
+            with open(antigo_json + '.diario', 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'op': 'devolver', 'id': 1, 'data_devolucao': datetime.now().isoformat(),
+                                    'multa': 8.0}) + '\n')
+            recuperada = Biblioteca()
+            recuperada.ativar_diario(antigo_json)
+            recuperada.carregar_dados(antigo_json)
+            recuperada.desativar_diario()
+            self.assertIsInstance(recuperada.emprestimos[0]['data_devolucao'], int)
+            
+            novo = os.path.join(pasta, 'nova.json')
+            recuperada.salvar_dados(novo)
+            with open(novo, encoding='utf-8') as f:
+                dados = json.load(f)
+            self.assertEqual(dados['formato_datas'], 'epoch')
+            self.assertIsInstance(dados['emprestimos'][0]['data_vencimento'], int)
+        
+        print("✅ Migração de datas funcionando corretamente")
+    
+    def test_cache_por_versao(self):
+        "Testa o cache de relatório e estatísticas pela versão dos dados e pelo próximo vencimento"
+        print("\n🧪 Testando cache de resultados...")
+        
+        inicio = agora()
+        with mock.patch('biblioteca.agora', return_value=inicio):
+            emprestimo = self.biblioteca.emprestar_livro(self.livro1['id'], "Rui")
+            primeiro = self.biblioteca.gerar_relatorio()
+        versao = self.biblioteca.versao
+        
+        with mock.patch('biblioteca.agora', return_value=inicio + 10 * SEGUNDOS_POR_DIA):
+            repetido = self.biblioteca.gerar_relatorio()
+        self.assertEqual(repetido['data_relatorio'], inicio + 10 * SEGUNDOS_POR_DIA)
+        self.assertEqual({**repetido, 'data_relatorio': inicio}, primeiro)
+        self.assertEqual(self.biblioteca.contagem_cache()['relatorio_acertos'], 1)
+        
+        # Cada chamada recebe listas próprias: alterar uma não muda o relatório em cache
+        repetido['livros_por_categoria']["Fantasia"].append("Intruso")
+        primeiro['livros_por_categoria'].clear()
+        with mock.patch('biblioteca.agora', return_value=inicio):
+            self.assertEqual(self.biblioteca.gerar_relatorio()['livros_por_categoria']["Fantasia"], ["O Senhor dos Anéis"])
+        
+        # Passado o vencimento, o cache expira mesmo sem alterações
+        with mock.patch('biblioteca.agora', return_value=emprestimo['data_vencimento'] + 1):
+            self.assertEqual(self.biblioteca.gerar_relatorio()['emprestimos_em_atraso'], 1)
+        self.assertEqual(self.biblioteca.contagem_cache()['relatorio_falhas'], 2)
+        self.assertEqual(self.biblioteca.versao, versao)
+        
+        self.assertEqual(self.biblioteca.calcular_estatisticas(), self.biblioteca.calcular_estatisticas())
+        self.biblioteca.devolver_livro(emprestimo['id'])
+        self.assertGreater(self.biblioteca.versao, versao)
+        self.assertEqual(self.biblioteca.gerar_relatorio()['emprestimos_em_atraso'], 0)
+        
+        # Alterações diretas nas listas também mudam a versão, pela reconstrução dos índices
+        self.biblioteca.livros.append(Livro(99, "Avulso", "Autor", 1500, "Poesia", True, 0))
+        self.assertEqual(self.biblioteca.calcular_estatisticas()['ano_mais_antigo'], 1500)
+        self.assertEqual(self.biblioteca.gerar_relatorio()['total_livros'], 5)
+        self.assertEqual(self.biblioteca.contagem_cache(), {'relatorio_acertos': 2, 'relatorio_falhas': 4,
+                                                            'estatisticas_acertos': 1, 'estatisticas_falhas': 2})
+        
+        print("✅ Cache de resultados funcionando corretamente")
+    
+    def test_indice_por_pessoa(self):
+        "Testa empréstimos ativos, multa total e limite por pessoa com nomes normalizados"
+        print("\n🧪 Testando índice por pessoa...")
+        
+        self.biblioteca.limite_emprestimos = 2
+        primeiro = self.biblioteca.emprestar_livro(self.livro1['id'], "José  Conceição")
+        self.biblioteca.emprestar_livro(self.livro2['id'], "jose conceicao")
+        self.assertEqual([e['id'] for e in self.biblioteca.emprestimos_ativos(" JOSÉ CONCEIÇÃO ")], [1, 2])
+        self.assertFalse(self.biblioteca.pode_emprestar("José Conceição"))
+        with self.assertRaises(ValueError):
+            self.biblioteca.emprestar_livro(self.livro3['id'], "Jose Conceicao")
+        self.assertTrue(self.biblioteca._obter_livro(self.livro3['id'])['disponivel'])
+        self.assertEqual(self.biblioteca.emprestar_livro(self.livro3['id'], "Maria")['id'], 3)
+        
+        # Devolução com atraso libera uma vaga e soma a multa
+        with mock.patch('biblioteca.agora', return_value=primeiro['data_vencimento'] + 3 * SEGUNDOS_POR_DIA):
+            self.biblioteca.devolver_livro(primeiro['id'])
+        self.assertEqual([e['id'] for e in self.biblioteca.emprestimos_ativos("José Conceição")], [2])
+        self.assertEqual(self.biblioteca.multa_total("josé conceição"), 6.0)
+        self.assertEqual(self.biblioteca.multa_total("Ninguém"), 0)
+        self.assertTrue(self.biblioteca.pode_emprestar("José Conceição"))
+        
+        # O índice volta igual depois de salvar e carregar, e acompanha as multas que vão para o histórico
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'biblioteca.json')
+            self.biblioteca.salvar_dados(arquivo)
+            outra = Biblioteca(limite_emprestimos=1)
+            outra.ativar_historico(os.path.join(pasta, 'historico'))
+            outra.carregar_dados(arquivo)
+            self.assertEqual([e['id'] for e in outra.emprestimos_ativos("JOSE CONCEICAO")], [2])
+            with self.assertRaises(ValueError):
+                outra.emprestar_livro(self.livro4['id'], "maria")
+            self.assertEqual(outra.arquivar_emprestimos(antes_de=primeiro['data_vencimento'] + 4 * SEGUNDOS_POR_DIA), 1)
+            self.assertEqual(outra.multa_total("José Conceição"), 6.0)
+            self.assertEqual(len(outra.emprestimos_ativos("José Conceição")), 1)
+        
+        print("✅ Índice por pessoa funcionando corretamente")
 
 
 def executar_todos_os_testes():
@@ -0,0 +1,181 @@
+"Testes para o backend SQLite do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import os
+import re
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from biblioteca import Biblioteca, calcular_estatisticas_livros, criar_biblioteca
+from biblioteca_sqlite import ESQUEMA, BibliotecaSQLite
+from datas import SEGUNDOS_POR_DIA
+
+
+class TestBibliotecaSQLite(unittest.TestCase):
+    "Classe de testes para o backend SQLite"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.biblioteca = criar_biblioteca('sqlite', caminho=os.path.join(self.pasta.name, 'biblioteca.db'))
+
+        self.livro1 = self.biblioteca.cadastrar_livro(
+            "O Senhor dos Anéis", "J.R.R. Tolkien", 1954, "Fantasia"
+        )
+        self.livro2 = self.biblioteca.cadastrar_livro(
+            "1984", "George Orwell", 1949, "Ficção Científica"
+        )
+        self.livro3 = self.biblioteca.cadastrar_livro(
+            "Duna", "Frank Herbert", 1965, "FICÇÃO CIENTÍFICA"
+        )
+
+    def tearDown(self):
+        self.biblioteca.fechar()
+        self.pasta.cleanup()
+
+    def test_busca_indexada(self):
+        "Testa a busca por substring no banco"
+        print("\n🧪 Testando busca no SQLite...")
+
+        self.assertIsInstance(self.biblioteca, BibliotecaSQLite)
+        self.assertEqual([l['id'] for l in self.biblioteca.buscar_livros("categoria", "ficção")],
+                         [self.livro2['id'], self.livro3['id']])
+        self.assertEqual(len(self.biblioteca.buscar_livros("autor", "or")), 1)
+        self.assertEqual(len(self.biblioteca.buscar_livros("titulo", "")), 3)
+        self.assertEqual(self.biblioteca.buscar_livros("titulo", "Harry Potter"), [])
+        self.assertEqual(len(self.biblioteca.filtrar_livros_por_categoria("Fantasia")), 1)
+
+        print("✅ Busca no SQLite funcionando corretamente")
+
+    def test_emprestimo_e_devolucao(self):
+        "Testa empréstimo, devolução e relatório no banco"
+        print("\n🧪 Testando empréstimo no SQLite...")
+
+        emprestimo = self.biblioteca.emprestar_livro(self.livro1['id'], "João Silva")
+        self.assertFalse(emprestimo['devolvido'])
+        self.assertNotIn('data_devolucao', emprestimo)
+        with self.assertRaises(ValueError):
+            self.biblioteca.emprestar_livro(self.livro1['id'], "Maria Santos")
+        with self.assertRaises(ValueError):
+            self.biblioteca.emprestar_livro(999, "Maria Santos")
+
+        relatorio = self.biblioteca.gerar_relatorio()
+        self.assertEqual(relatorio['livros_disponiveis'], 2)
+        self.assertEqual(relatorio['livros_emprestados'], 1)
+        self.assertEqual(relatorio['emprestimos_em_atraso'], 0)
+        self.assertEqual(relatorio['livros_por_categoria']['Fantasia'], ["O Senhor dos Anéis"])
+
+        devolucao = self.biblioteca.devolver_livro(emprestimo['id'])
+        self.assertTrue(devolucao['devolvido'])
+        self.assertEqual(devolucao['multa'], 0)
+        with self.assertRaises(ValueError):
+            self.biblioteca.devolver_livro(emprestimo['id'])
+        self.assertEqual(self.biblioteca.gerar_relatorio()['livros_disponiveis'], 3)
+
+        print("✅ Empréstimo no SQLite funcionando corretamente")
+
+    def test_importar_e_exportar_json(self):
+        "Testa a troca de dados com o backend em memória"
+        print("\n🧪 Testando importação e exportação do SQLite...")
+
+        self.biblioteca.emprestar_livro(self.livro2['id'], "Ana Costa")
+        arquivo = os.path.join(self.pasta.name, 'biblioteca.json')
+        self.biblioteca.salvar_dados(arquivo)
+
+        memoria = Biblioteca()
+        memoria.carregar_dados(arquivo)
+        self.assertEqual(memoria.livros, self.biblioteca.livros)
+        self.assertEqual(memoria.emprestimos, self.biblioteca.emprestimos)
+
+        memoria.cadastrar_livro("Dom Casmurro", "Machado de Assis", 1899, "Literatura Brasileira")
+        memoria.salvar_dados(arquivo)
+        self.biblioteca.carregar_dados(arquivo)
+        self.assertEqual(self.biblioteca.livros, memoria.livros)
+        self.assertEqual(len(self.biblioteca.buscar_livros("autor", "machado")), 1)
+        self.assertEqual(self.biblioteca.contador_id, memoria.contador_id)
+
+        print("✅ Importação e exportação do SQLite funcionando corretamente")
+
+    def test_emprestimos_por_pessoa(self):
+        "Testa empréstimos ativos, multa e limite por pessoa no banco"
+        print("\n🧪 Testando índice por pessoa no SQLite...")
+
+        self.biblioteca.limite_emprestimos = 1
+        emprestimo = self.biblioteca.emprestar_livro(self.livro1['id'], "Ana  Conceição")
+        with self.assertRaises(ValueError):
+            self.biblioteca.emprestar_livro(self.livro2['id'], "ana conceicao")
+        self.assertTrue(self.biblioteca._obter_livro(self.livro2['id'])['disponivel'])
+        self.assertEqual([e['id'] for e in self.biblioteca.emprestimos_ativos("ANA CONCEIÇÃO")], [emprestimo['id']])
+
+        with mock.patch('biblioteca_sqlite.agora', return_value=emprestimo['data_vencimento'] + 2 * SEGUNDOS_POR_DIA):
+            self.biblioteca.devolver_livro(emprestimo['id'])
+        self.assertEqual(self.biblioteca.emprestimos_ativos("Ana Conceição"), [])
+        self.assertEqual(self.biblioteca.multa_total("ana conceição"), 4.0)
+        self.assertTrue(self.biblioteca.pode_emprestar("Ana Conceição"))
+
+        print("✅ Índice por pessoa no SQLite funcionando corretamente")
+
+    def test_cadastro_em_lote(self):
+        "Testa o cadastro em lote no banco"
+        print("\n🧪 Testando cadastro em lote no SQLite...")
+
+        novos = self.biblioteca.cadastrar_livros_em_lote([
+            ("Dom Casmurro", "Machado de Assis", 1899, "Literatura Brasileira"),
+            {'titulo': "Fundação", 'autor': "Isaac Asimov", 'ano': 1951, 'categoria': "Ficção Científica"},
+        ])
+        self.assertEqual([l['id'] for l in novos], [4, 5])
+        self.assertEqual(len(self.biblioteca.buscar_livros("categoria", "ficção")), 3)
+        self.assertEqual(self.biblioteca.calcular_estatisticas(), calcular_estatisticas_livros(self.biblioteca.livros))
+
+        print("✅ Cadastro em lote no SQLite funcionando corretamente")
+
+    def test_recursos_de_arquivo_recusados(self):
+        "Testa que diário, histórico em partições e carga em segundo plano são recusados pelo backend"
+        print("\n🧪 Testando recursos recusados no SQLite...")
+
+        snapshot = os.path.join(self.pasta.name, 'biblioteca.json')
+        with self.assertRaises(ValueError):
+            self.biblioteca.ativar_diario(snapshot)
+        self.assertFalse(os.path.exists(snapshot + '.diario'))
+        with self.assertRaises(ValueError):
+            self.biblioteca.ativar_historico(os.path.join(self.pasta.name, 'historico'))
+        with self.assertRaises(ValueError):
+            self.biblioteca.carregar_em_segundo_plano(snapshot)
+        self.assertEqual(len(self.biblioteca.livros), 3)
+
+        print("✅ Recursos recusados no SQLite funcionando corretamente")
+
+    def test_banco_antigo(self):
+        "Testa a migração de um banco com datas em texto ISO"
+        print("\n🧪 Testando migração do SQLite...")
+
+        caminho = os.path.join(self.pasta.name, 'antigo.db')
+        vencido = (datetime.now() - timedelta(days=2)).isoformat()
+        with sqlite3.connect(caminho) as conexao:
+            conexao.executescript(re.sub(r'(data_\w+) INTEGER', r'\1 TEXT', ESQUEMA))
+            conexao.execute("INSERT INTO livros VALUES (1, 'Duna', 'Frank Herbert', 1965, 'Ficção', 0, ?)",
+                            (datetime(2024, 5, 1).isoformat(),))
+            conexao.execute("INSERT INTO emprestimos (id, livro_id, pessoa, data_emprestimo, data_vencimento) "
+                            "VALUES (1, 1, 'Lia', ?, ?)", (vencido, vencido))
+        conexao.close()
+
+        antigo = BibliotecaSQLite(caminho)
+        self.assertEqual(antigo.livros[0]['data_cadastro'], int(datetime(2024, 5, 1).timestamp()))
+        self.assertEqual(antigo.gerar_relatorio()['emprestimos_em_atraso'], 1)
+        self.assertEqual(len(antigo.emprestimos_ativos("LIA")), 1)
+        self.assertEqual(len(antigo.buscar_livros("titulo", "DUNA")), 1)
+        self.assertEqual(antigo.devolver_livro(1)['multa'], 4.0)
+        self.assertIsInstance(antigo.emprestimos[0]['data_devolucao'], int)
+        antigo.fechar()
+
+        # A migração roda uma vez só; abrir de novo não muda nada
+        reaberto = BibliotecaSQLite(caminho)
+        self.assertEqual(reaberto.emprestimos[0]['multa'], 4.0)
+        reaberto.fechar()
+
+        print("✅ Migração do SQLite funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
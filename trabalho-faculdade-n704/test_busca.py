@@ -0,0 +1,84 @@
+"Testes para a busca normalizada e ranqueada do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import os
+import tempfile
+import unittest
+from benchmark import gerar_catalogo
+from biblioteca import Biblioteca, criar_biblioteca
+from busca import PALAVRA_INTEIRA, PREFIXO, SUBSTRING, normalizar, pontuar
+
+
+class TestBusca(unittest.TestCase):
+    "Classe de testes para chaves sem acentos, pontuação e paginação"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.biblioteca = Biblioteca()
+        self.biblioteca.cadastrar_livros_em_lote([
+            ("Ficção e Realidade", "Ana Conceição", 1990, "Ficção Científica"),
+            ("Contos de Ficção", "João Silva", 2001, "FICÇÃO CIENTÍFICA"),
+            ("Superficção", "Maria Souza", 2010, "Ensaios"),
+            ("Coração", "Pedro Gonçalves", 1985, "Poesia"),
+        ])
+
+    def test_chaves_sem_acentos(self):
+        "Testa a normalização e a busca que ignora acentos e maiúsculas"
+        print("\n🧪 Testando chaves de busca sem acentos...")
+
+        self.assertEqual(normalizar("Ficção CIENTÍFICA"), "ficcao cientifica")
+        self.assertEqual(normalizar("Straße"), "strasse")
+        self.assertEqual(normalizar("Duna"), "duna")
+
+        self.assertEqual([l['id'] for l in self.biblioteca.buscar_livros("titulo", "ficcao")], [1, 2, 3])
+        self.assertEqual([l['id'] for l in self.biblioteca.buscar_livros("titulo", "FICÇÃO")], [1, 2, 3])
+        self.assertEqual([l['id'] for l in self.biblioteca.buscar_livros("autor", "conceicao")], [1])
+        self.assertEqual([l['id'] for l in self.biblioteca.buscar_livros("titulo", "ca")], [1, 2, 3, 4])
+        self.assertEqual(self.biblioteca.consultar().contendo('categoria', 'ficcao').contar(), 2)
+        sem_indice = Biblioteca(indexar_busca=False)
+        sem_indice.cadastrar_livros_em_lote(self.biblioteca.livros)
+        self.assertEqual(len(sem_indice.buscar_livros("categoria", "cientifica")), 2)
+
+        with tempfile.TemporaryDirectory() as pasta:
+            banco = criar_biblioteca('sqlite', caminho=os.path.join(pasta, 'biblioteca.db'))
+            banco.cadastrar_livros_em_lote(self.biblioteca.livros)
+            self.assertEqual([l['id'] for l in banco.buscar_livros("titulo", "ficcao")], [1, 2, 3])
+            self.assertEqual([l['id'] for l in banco.buscar_ranqueado("titulo", "ficcao")['livros']], [1, 2, 3])
+            banco.fechar()
+
+        print("✅ Chaves de busca sem acentos funcionando corretamente")
+
+    def test_ranqueamento_e_paginas(self):
+        "Testa a ordem por relevância e a paginação contra uma ordenação completa"
+        print("\n🧪 Testando busca ranqueada...")
+
+        self.assertEqual(pontuar("ficcao e realidade", "ficcao"), PREFIXO)
+        self.assertEqual(pontuar("contos de ficcao", "ficcao"), PALAVRA_INTEIRA)
+        self.assertEqual(pontuar("superficcao", "ficcao"), SUBSTRING)
+        self.assertEqual(pontuar("a ficcaoteca e a ficcao", "ficcao"), PALAVRA_INTEIRA)
+        self.assertEqual(pontuar("coracao", "ficcao"), 0)
+
+        resultado = self.biblioteca.buscar_ranqueado("titulo", "ficcao")
+        self.assertEqual([l['id'] for l in resultado['livros']], [1, 2, 3])
+        self.assertEqual((resultado['total'], resultado['pagina'], resultado['paginas']), (3, 1, 1))
+
+        grande = Biblioteca()
+        grande.cadastrar_livros_em_lote(gerar_catalogo(3000, semente=19))
+        for criterio, valor in (('titulo', 'mar'), ('autor', 'silva'), ('titulo', 'a')):
+            termo = normalizar(valor)
+            esperado = sorted(grande.buscar_livros(criterio, valor),
+                              key=lambda l: (-pontuar(normalizar(l[criterio]), termo), len(l[criterio]), l['id']))
+            for pagina in (1, 2, 5):
+                resultado = grande.buscar_ranqueado(criterio, valor, limite=8, pagina=pagina)
+                self.assertEqual(resultado['total'], len(esperado))
+                self.assertEqual([l['id'] for l in resultado['livros']],
+                                 [l['id'] for l in esperado[(pagina - 1) * 8:pagina * 8]])
+
+        self.assertEqual(grande.buscar_ranqueado('titulo', 'inexistente')['livros'], [])
+        with self.assertRaises(ValueError):
+            grande.buscar_ranqueado('titulo', 'mar', pagina=0)
+
+        print("✅ Busca ranqueada funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
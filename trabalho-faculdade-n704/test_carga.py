@@ -0,0 +1,147 @@
+"Testes para a carga em segundo plano do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from biblioteca import Biblioteca, calcular_estatisticas_livros
+from carga import Carga
+
+
+class TestCarga(unittest.TestCase):
+    "Classe de testes para a carga em thread e a montagem dos índices em lotes"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.origem = Biblioteca()
+        self.origem.cadastrar_livros_em_lote(
+            (f"Livro {numero}", f"Autor {numero % 9}", 1950 + numero % 40, f"Categoria {numero % 4}")
+            for numero in range(100))
+        self.origem.emprestar_livro(7, "Ana")
+
+    def tearDown(self):
+        """Limpeza após cada teste"""
+        self.pasta.cleanup()
+
+    def test_operacoes_durante_a_carga(self):
+        "Testa que cadastro, empréstimo e devolução não esperam pelos índices"
+        print("\n🧪 Testando carga em segundo plano...")
+
+        for formato in ('json', 'jsonl', 'bin'):
+            with self.subTest(formato=formato):
+                arquivo = os.path.join(self.pasta.name, f'biblioteca.{formato}')
+                self.origem.salvar_dados(arquivo)
+                pausada = threading.Event()
+                liberar = threading.Event()
+                avisos = []
+
+                def pausar(carga, feitos, total):
+                    # Segura a thread de carga depois do primeiro lote, já sem a trava
+                    carga.feitos, carga.total = feitos, total
+                    pausada.set()
+                    liberar.wait()
+
+                biblioteca = Biblioteca()
+                with mock.patch.object(Carga, 'progredir', autospec=True, side_effect=pausar):
+                    carga = biblioteca.carregar_em_segundo_plano(
+                        arquivo, ao_aguardar=lambda carga, esperando: avisos.append(esperando), lote=10)
+                    self.assertTrue(pausada.wait(5))
+                    self.assertFalse(carga.concluida)
+                    self.assertFalse(biblioteca._indices_prontos)
+                    self.assertEqual(carga.descricao(), "montando índices: 10/100 livros (10%)")
+
+                    # Livro 5 já está indexado e o 50 ainda não; a contagem final acerta os dois
+                    emprestimo = biblioteca.emprestar_livro(5, "Bia")
+                    self.assertEqual(emprestimo['id'], 2)
+                    biblioteca.emprestar_livro(50, "Caio")
+                    biblioteca.devolver_livro(1)
+                    self.assertEqual(biblioteca.cadastrar_livro("Novo", "Autor", 2024, "Contos")['id'], 101)
+                    with self.assertRaises(ValueError):
+                        biblioteca.emprestar_livro(50, "Dora")
+
+                    # A busca precisa dos índices: espera, avisando o andamento
+                    threading.Timer(0.3, liberar.set).start()
+                    self.assertEqual([l['id'] for l in biblioteca.buscar_livros("titulo", "novo")], [101])
+                carga.juntar(5)
+
+                self.assertTrue(carga.concluida)
+                self.assertEqual(carga.descricao(), "carga concluída")
+                self.assertTrue(avisos and avisos[0] and avisos[-1] is False)
+                relatorio = biblioteca.gerar_relatorio()
+                self.assertEqual((relatorio['total_livros'], relatorio['livros_disponiveis']), (101, 99))
+                self.assertEqual(len(relatorio['livros_por_categoria']['Contos']), 1)
+                self.assertEqual(biblioteca.calcular_estatisticas(), calcular_estatisticas_livros(biblioteca.livros))
+
+        print("✅ Carga em segundo plano funcionando corretamente")
+
+    def test_diario_e_falha(self):
+        "Testa o diário reaplicado pela thread de carga e o erro repassado a quem espera"
+        print("\n🧪 Testando diário e falha na carga em segundo plano...")
+
+        arquivo = os.path.join(self.pasta.name, 'biblioteca.json')
+        self.origem.ativar_diario(arquivo)
+        self.origem.salvar_dados(arquivo)
+        self.origem.cadastrar_livro("Só no diário", "Autor", 2020, "Contos")
+        self.origem.devolver_livro(1)
+        self.origem.desativar_diario()
+
+        # Quem espera os dados só segue depois do diário reaplicado, mesmo que a reaplicação demore
+        reproduzir = Biblioteca._reproduzir_diario
+
+        def reproduzir_devagar(biblioteca):
+            time.sleep(0.2)
+            reproduzir(biblioteca)
+
+        biblioteca = Biblioteca()
+        biblioteca.ativar_diario(arquivo)
+        with mock.patch.object(Biblioteca, '_reproduzir_diario', reproduzir_devagar):
+            carga = biblioteca.carregar_em_segundo_plano(arquivo)
+            biblioteca.aguardar_dados()
+            self.assertEqual(len(biblioteca.livros), 101)
+            self.assertEqual(biblioteca.emprestar_livro(101, "Bia")['livro_id'], 101)
+            biblioteca.devolver_livro(2)
+        self.assertEqual(biblioteca.buscar_livros("titulo", "diário")[0]['id'], 101)
+        self.assertTrue(biblioteca._obter_emprestimo(1)['devolvido'])
+        self.assertEqual(biblioteca.emprestar_livro(7, "Ana")['id'], 3)
+        carga.juntar(5)
+        biblioteca.desativar_diario()
+
+        corrompido = os.path.join(self.pasta.name, 'corrompido.json')
+        with open(corrompido, 'w', encoding='utf-8') as f:
+            f.write('{"livros": [')
+        outra = Biblioteca()
+        carga = outra.carregar_em_segundo_plano(corrompido)
+        with self.assertRaises(RuntimeError):
+            carga.aguardar()
+        self.assertEqual(carga.descricao()[:12], "carga falhou")
+
+        # A falha continua valendo: salvar por cima de um armazenamento que não carregou é recusado
+        armazem = os.path.join(self.pasta.name, 'biblioteca.seg')
+        self.origem.salvar_dados(armazem)
+        segmento = next(nome for nome in sorted(os.listdir(armazem)) if nome.startswith('livros'))
+        with open(os.path.join(armazem, segmento), 'r+b') as f:
+            f.seek(10)
+            f.write(b'\0\0')
+        arquivos = sorted(os.listdir(armazem))
+        quebrada = Biblioteca()
+        quebrada.carregar_em_segundo_plano(armazem).juntar(5)
+        self.assertIsInstance(quebrada.erro_carga, ValueError)
+        with self.assertRaises(RuntimeError):
+            quebrada.salvar_dados(armazem)
+        with self.assertRaises(RuntimeError):
+            quebrada.buscar_livros("titulo", "Livro")
+        self.assertEqual(sorted(os.listdir(armazem)), arquivos)
+
+        # Uma nova carga de um arquivo bom substitui a que falhou
+        quebrada.carregar_dados(arquivo)
+        self.assertIsNone(quebrada.erro_carga)
+        self.assertEqual(len(quebrada.buscar_livros("titulo", "Livro")), 100)
+
+        print("✅ Diário e falha na carga em segundo plano funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
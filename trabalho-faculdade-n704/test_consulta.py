@@ -0,0 +1,81 @@
+"Testes para as consultas preguiçosas do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import unittest
+from benchmark import gerar_catalogo
+from biblioteca import Biblioteca, processar_livros_funcional
+from consulta import Consulta
+
+
+class TestConsulta(unittest.TestCase):
+    "Classe de testes para o construtor de consultas e o planejador"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.biblioteca = Biblioteca()
+        self.biblioteca.cadastrar_livros_em_lote(gerar_catalogo(2000, semente=11))
+        self.livros = self.biblioteca.livros
+
+    def test_resultados_iguais_a_varredura(self):
+        "Testa se os filtros dão o mesmo resultado de uma list comprehension"
+        print("\n🧪 Testando consultas...")
+
+        consulta = (self.biblioteca.consultar()
+                    .onde(categoria="Poesia")
+                    .onde_ano(apos=1900, ate=2000)
+                    .contendo('titulo', 'mar')
+                    .mapear(lambda livro: livro['id']))
+        esperado = [livro['id'] for livro in self.livros
+                    if livro['categoria'] == "Poesia" and 1900 < livro['ano'] <= 2000
+                    and 'mar' in livro['titulo'].lower()]
+        self.assertEqual(consulta.listar(), esperado)
+        self.assertEqual(consulta.contar(), len(esperado))
+
+        ordenados = self.biblioteca.consultar().onde_ano(de=2000).ordenar_por('ano', decrescente=True).limitar(5)
+        self.assertEqual([livro['id'] for livro in ordenados],
+                         [livro['id'] for livro in sorted((l for l in self.livros if l['ano'] >= 2000),
+                                                          key=lambda l: l['ano'], reverse=True)[:5]])
+        self.assertEqual(self.biblioteca.consultar().onde(id=7).primeiro()['id'], 7)
+        self.assertIsNone(self.biblioteca.consultar().onde(id=99999).primeiro())
+        self.assertEqual(self.biblioteca.consultar().onde(categoria="Inexistente").listar(), [])
+
+        # A consulta é lida do acervo na execução, não na montagem
+        consulta = self.biblioteca.consultar().onde(autor="Machado de Assis")
+        self.biblioteca.cadastrar_livro("Dom Casmurro", "Machado de Assis", 1899, "Literatura Brasileira")
+        self.assertEqual(consulta.contar(), 1)
+
+        with self.assertRaises(ValueError):
+            self.biblioteca.consultar().mapear(str).onde(categoria="Poesia")
+
+        print("✅ Consultas funcionando corretamente")
+
+    def test_planejador_e_limite(self):
+        "Testa a escolha do índice e a parada antecipada do limitar"
+        print("\n🧪 Testando planejador de consultas...")
+
+        plano = self.biblioteca.consultar().onde_ano(apos=1950).onde(categoria="Poesia").plano()
+        self.assertTrue(plano[0].startswith("índice de categoria"))
+        plano = self.biblioteca.consultar().onde(categoria="Poesia").contendo('autor', 'silva').plano()
+        self.assertTrue(plano[0].startswith("índice de"))
+        self.assertEqual(self.biblioteca.consultar().onde_ano(apos=1950).plano()[0], "varredura")
+        self.assertEqual(self.biblioteca.consultar().ordenar_por('ano').limitar(3).plano()[-1], "top 3")
+
+        vistos = []
+
+        def registrar(livro):
+            vistos.append(livro['id'])
+            return True
+
+        primeiros = self.biblioteca.consultar().onde(registrar).limitar(3).listar()
+        self.assertEqual(len(primeiros), 3)
+        self.assertEqual(vistos, [1, 2, 3])
+
+        # Sem biblioteca, a consulta varre a lista; processar_livros_funcional continua igual
+        self.assertEqual(Consulta(self.livros).onde(categoria="Poesia").plano()[0], "varredura")
+        self.assertEqual(processar_livros_funcional(self.livros, lambda l: l['ano'] > 2000, lambda l: l['titulo']),
+                         [l['titulo'] for l in self.livros if l['ano'] > 2000])
+
+        print("✅ Planejador de consultas funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"Testes para o modo fragmentado do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import os
+import tempfile
+import unittest
+from benchmark import gerar_catalogo
+from biblioteca import Biblioteca, calcular_estatisticas_livros
+from fragmentos import BibliotecaFragmentada
+
+
+class TestFragmentos(unittest.TestCase):
+    "Classe de testes comparando o coordenador com uma biblioteca única"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fragmentada = BibliotecaFragmentada(fragmentos=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fragmentada.fechar()
+
+    def test_mesmos_resultados_que_biblioteca_unica(self):
+        "Testa cadastro, busca, empréstimo, relatório e estatísticas contra o backend em memória"
+        print("\n🧪 Testando biblioteca fragmentada...")
+
+        unica = Biblioteca()
+        catalogo = gerar_catalogo(300, semente=3)
+        unica.cadastrar_livros_em_lote(catalogo)
+        novos = self.fragmentada.cadastrar_livros_em_lote(catalogo)
+        self.assertEqual([l['id'] for l in novos], list(range(1, 301)))
+        self.assertEqual(self.fragmentada.cadastrar_livro("Duna", "Frank Herbert", 1965, "Ficção")['id'],
+                         unica.cadastrar_livro("Duna", "Frank Herbert", 1965, "Ficção")['id'])
+
+        for criterio, valor in (('titulo', 'mar'), ('autor', 'silva'), ('categoria', 'fic'), ('titulo', 'a')):
+            self.assertEqual([l['id'] for l in self.fragmentada.buscar_livros(criterio, valor)],
+                             [l['id'] for l in unica.buscar_livros(criterio, valor)])
+            for pagina in (1, 3):
+                ranqueado = self.fragmentada.buscar_ranqueado(criterio, valor, limite=7, pagina=pagina)
+                esperado = unica.buscar_ranqueado(criterio, valor, limite=7, pagina=pagina)
+                self.assertEqual([l['id'] for l in ranqueado.pop('livros')], [l['id'] for l in esperado.pop('livros')])
+                self.assertEqual(ranqueado, esperado)
+        self.assertEqual([l['id'] for l in self.fragmentada.filtrar_livros_por_categoria("Ficção")],
+                         [l['id'] for l in unica.filtrar_livros_por_categoria("Ficção")])
+
+        emprestimos = [self.fragmentada.emprestar_livro(livro_id, "Ana") for livro_id in (1, 2, 3, 150)]
+        self.assertEqual([e['id'] for e in emprestimos], [1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            self.fragmentada.emprestar_livro(2, "Bruno")
+        with self.assertRaises(ValueError):
+            self.fragmentada.emprestar_livro(9999, "Bruno")
+        for livro_id in (1, 2, 3, 150):
+            unica.emprestar_livro(livro_id, "Ana")
+
+        self.assertTrue(self.fragmentada.devolver_livro(emprestimos[1]['id'])['devolvido'])
+        unica.devolver_livro(2)
+        with self.assertRaises(ValueError):
+            self.fragmentada.devolver_livro(emprestimos[1]['id'])
+        with self.assertRaises(ValueError):
+            self.fragmentada.devolver_livro(9999)
+
+        relatorio, esperado = self.fragmentada.gerar_relatorio(), unica.gerar_relatorio()
+        del relatorio['data_relatorio'], esperado['data_relatorio']
+        self.assertEqual(relatorio, esperado)
+        self.assertEqual(list(relatorio['livros_por_categoria']), list(esperado['livros_por_categoria']))
+        self.assertEqual(self.fragmentada.calcular_estatisticas(), calcular_estatisticas_livros(unica.livros))
+
+        # Ida e volta pelo arquivo mantém os dados e o roteamento dos empréstimos
+        # (cada fragmento lê só a sua parte, em qualquer formato)
+        with tempfile.TemporaryDirectory() as pasta:
+            for formato in ('json', 'jsonl', 'bin', 'seg'):
+                with self.subTest(formato=formato):
+                    arquivo = os.path.join(pasta, f'biblioteca.{formato}')
+                    self.fragmentada.salvar_dados(arquivo)
+                    recarregada = Biblioteca()
+                    recarregada.carregar_dados(arquivo)
+                    self.assertEqual(len(recarregada.livros), 301)
+
+                    with BibliotecaFragmentada(fragmentos=2) as outra:
+                        outra.carregar_dados(arquivo)
+                        self.assertEqual(list(outra.livros), list(recarregada.livros))
+                        self.assertEqual(list(outra.emprestimos), list(recarregada.emprestimos))
+                        self.assertTrue(outra.devolver_livro(emprestimos[3]['id'])['devolvido'])
+                        # Ids recusados antes de salvar também não voltam a ser usados
+                        self.assertEqual(outra.emprestar_livro(2, "Carla")['id'],
+                                         recarregada.emprestar_livro(2, "Carla")['id'])
+                        self.assertEqual(outra.gerar_relatorio()['livros_emprestados'], 3)
+
+        print("✅ Biblioteca fragmentada funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
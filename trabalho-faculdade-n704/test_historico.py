@@ -0,0 +1,156 @@
+"Testes para o histórico de empréstimos do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+import historico as historico_modulo
+from biblioteca import Biblioteca
+from historico import INDICE, HistoricoEmprestimos
+from datas import SEGUNDOS_POR_DIA, agora
+
+
+def instante(ano, mes, dia=10):
+    return int(datetime(ano, mes, dia).timestamp())
+
+
+class TestHistorico(unittest.TestCase):
+    "Classe de testes para o arquivamento mensal e a consulta sob demanda de empréstimos devolvidos"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.historico = os.path.join(self.pasta.name, 'biblioteca.historico')
+        self.biblioteca = Biblioteca()
+        self.biblioteca.cadastrar_livros_em_lote(
+            (f"Livro {numero}", f"Autor {numero}", 2000, "Romance") for numero in range(10))
+        # Seis empréstimos devolvidos em meses antigos (dois em março) e dois recentes
+        for numero, (ano, mes) in enumerate([(2020, 1), (2020, 3), (2020, 3), (2021, 6), (2022, 2), (2022, 9)]):
+            emprestimo = self.biblioteca.emprestar_livro(numero + 1, "Ana")
+            self.biblioteca.devolver_livro(emprestimo['id'])
+            emprestimo['data_emprestimo'] = instante(ano, mes, 1 + numero)
+            emprestimo['data_devolucao'] = emprestimo['data_emprestimo'] + 5 * SEGUNDOS_POR_DIA
+        self.biblioteca.devolver_livro(self.biblioteca.emprestar_livro(7, "Bia")['id'])
+        self.biblioteca.emprestar_livro(8, "Caio")
+
+    def tearDown(self):
+        """Limpeza após cada teste"""
+        self.pasta.cleanup()
+
+    def test_arquivamento_ao_salvar(self):
+        "Testa que salvar leva os devolvidos antigos para partições mensais e mantém os ids únicos"
+        print("\n🧪 Testando arquivamento de empréstimos antigos...")
+
+        arquivo = os.path.join(self.pasta.name, 'biblioteca.json')
+        self.biblioteca.ativar_historico(self.historico, horizonte_dias=90)
+        self.biblioteca.salvar_dados(arquivo)
+        self.assertEqual([e['id'] for e in self.biblioteca.emprestimos], [7, 8])
+        self.assertEqual(self.biblioteca.historico.meses, ['2020-01', '2020-03', '2021-06', '2022-02', '2022-09'])
+        self.assertEqual(self.biblioteca.historico.total, 6)
+        relatorio = self.biblioteca.gerar_relatorio()
+        self.assertEqual(relatorio['livros_emprestados'], 1)
+
+        # Com o histórico ativo, ids de empréstimo não se repetem mesmo se os mais altos foram arquivados
+        self.biblioteca.devolver_livro(8)
+        self.assertEqual(self.biblioteca.arquivar_emprestimos(antes_de=agora() + 1), 2)
+        self.biblioteca.salvar_dados(arquivo)
+        outra = Biblioteca()
+        outra.ativar_historico(self.historico)
+        outra.carregar_dados(arquivo)
+        self.assertEqual(outra.emprestimos, [])
+        self.assertEqual(outra.emprestar_livro(1, "Dora")['id'], 9)
+
+        sem_historico = Biblioteca()
+        with self.assertRaises(ValueError):
+            sem_historico.arquivar_emprestimos()
+        with self.assertRaises(ValueError):
+            sem_historico.ativar_historico(self.historico, horizonte_dias=-1)
+
+        print("✅ Arquivamento de empréstimos antigos funcionando corretamente")
+
+    def test_ids_arquivados_sem_historico_ativo(self):
+        "Testa que o próximo id de empréstimo vai no arquivo e vale mesmo para quem carrega sem o histórico"
+        print("\n🧪 Testando ids de empréstimo depois do arquivamento...")
+
+        self.biblioteca.ativar_historico(self.historico)
+        self.biblioteca.devolver_livro(8)
+        self.assertEqual(self.biblioteca.arquivar_emprestimos(antes_de=agora() + 1), 8)
+        for formato in ('json', 'jsonl', 'bin', 'seg'):
+            with self.subTest(formato=formato):
+                arquivo = os.path.join(self.pasta.name, f'biblioteca.{formato}')
+                self.biblioteca.salvar_dados(arquivo)
+                self.assertEqual(self.biblioteca.emprestimos, [])
+                sem_historico = Biblioteca()
+                sem_historico.carregar_dados(arquivo)
+                self.assertEqual(sem_historico.emprestar_livro(1, "Eva")['id'], 9)
+                sem_historico.salvar_dados(arquivo)
+                reaberta = Biblioteca()
+                reaberta.carregar_dados(arquivo)
+                self.assertEqual(reaberta.emprestar_livro(2, "Eva")['id'], 10)
+
+        print("✅ Ids de empréstimo depois do arquivamento funcionando corretamente")
+
+    def test_consulta_sob_demanda(self):
+        "Testa que a consulta lê só as partições do período e junta com a lista de trabalho"
+        print("\n🧪 Testando consulta ao histórico...")
+
+        armazem = os.path.join(self.pasta.name, 'biblioteca.seg')
+        self.biblioteca.salvar_dados(armazem)
+        self.biblioteca.ativar_historico(self.historico, horizonte_dias=90)
+        self.biblioteca.salvar_dados(armazem)
+
+        outra = Biblioteca()
+        outra.ativar_historico(self.historico)
+        outra.carregar_dados(armazem)
+        self.assertEqual(len(outra.emprestimos), 2)
+        self.assertEqual(outra.historico.carregadas, 0)
+
+        marco = outra.historico_emprestimos(instante(2020, 3, 1), instante(2020, 4, 1))
+        self.assertEqual([e['id'] for e in marco], [2, 3])
+        self.assertEqual(outra.historico.carregadas, 1)
+        self.assertTrue(all(e['devolvido'] for e in marco))
+
+        todos = outra.historico_emprestimos()
+        self.assertEqual([e['id'] for e in todos], list(range(1, 9)))
+        self.assertEqual(outra.historico.carregadas, 5)
+        self.assertEqual([e['id'] for e in outra.historico_emprestimos(inicio=agora() - SEGUNDOS_POR_DIA)], [7, 8])
+
+        print("✅ Consulta ao histórico funcionando corretamente")
+
+    def test_multas_refeitas_das_particoes(self):
+        "Testa que as multas por mês não somam duas vezes após uma gravação interrompida e se refazem sem o índice"
+        print("\n🧪 Testando multas do histórico...")
+
+        for emprestimo, multa in zip(self.biblioteca.emprestimos[:3], (4.0, 6.0, 2.0)):
+            emprestimo['multa'] = multa
+        antigos = self.biblioteca.emprestimos[:6]
+        historico = HistoricoEmprestimos(self.historico)
+        gravar = historico_modulo._gravar_atomicamente
+
+        def falhar_no_indice(caminho, conteudo):
+            if caminho.endswith(INDICE):
+                raise OSError("queda de energia")
+            gravar(caminho, conteudo)
+
+        with mock.patch('historico._gravar_atomicamente', side_effect=falhar_no_indice):
+            with self.assertRaises(OSError):
+                historico.arquivar(antigos)
+
+        # As partições foram gravadas e o índice não: o próximo arquivamento repete os mesmos empréstimos
+        reaberto = HistoricoEmprestimos(self.historico)
+        self.assertEqual(reaberto.arquivar(antigos), 6)
+        self.assertEqual(reaberto.multa_de("ana"), 12.0)
+        self.assertEqual(reaberto.total, 6)
+        self.assertEqual(HistoricoEmprestimos(self.historico).multa_de("ana"), 12.0)
+
+        os.remove(os.path.join(self.historico, INDICE))
+        refeito = HistoricoEmprestimos(self.historico)
+        self.assertEqual((refeito.multa_de("ana"), refeito.total, refeito.maior_id), (12.0, 6, 6))
+        self.assertEqual(refeito.meses, reaberto.meses)
+
+        print("✅ Multas do histórico funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"Testes para as métricas de desempenho do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import json
+import os
+import tempfile
+import unittest
+from biblioteca import Biblioteca
+from metricas import Metricas
+
+
+class TestMetricas(unittest.TestCase):
+    "Classe de testes para a coleta e a exportação das métricas"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.biblioteca = Biblioteca()
+        self.livro = self.biblioteca.cadastrar_livro("Duna", "Frank Herbert", 1965, "Ficção Científica")
+
+    def test_ligar_e_desligar(self):
+        "Testa a contagem de chamadas e erros e a remoção dos embrulhos"
+        print("\n🧪 Testando coleta de métricas...")
+
+        self.assertFalse(self.biblioteca.metricas_ativas)
+        metricas = self.biblioteca.ativar_metricas()
+        self.assertTrue(self.biblioteca.metricas_ativas)
+        self.assertEqual(self.biblioteca.buscar_livros.__name__, 'buscar_livros')
+
+        emprestimo = self.biblioteca.emprestar_livro(self.livro['id'], "Ana")
+        with self.assertRaises(ValueError):
+            self.biblioteca.emprestar_livro(self.livro['id'], "Bia")
+        self.biblioteca.devolver_livro(emprestimo['id'])
+        for _ in range(10):
+            self.biblioteca.buscar_livros("titulo", "duna")
+        with tempfile.TemporaryDirectory() as pasta:
+            self.biblioteca.salvar_dados(os.path.join(pasta, 'biblioteca.jsonl'))
+
+        resumo = metricas.resumo()
+        self.assertEqual((resumo['emprestar_livro']['chamadas'], resumo['emprestar_livro']['erros']), (2, 1))
+        self.assertEqual(resumo['buscar_livros']['chamadas'], 10)
+        self.assertEqual(resumo['salvar_dados']['chamadas'], 1)
+        self.assertEqual(resumo['_escrever_json_lines']['chamadas'], 1)
+        medidas = resumo['buscar_livros']
+        self.assertTrue(0 < medidas['p50_ms'] <= medidas['p95_ms'] <= medidas['p99_ms'])
+        self.assertNotIn('cadastrar_livro', resumo)
+
+        # Desligada, a instância volta a usar os métodos da classe diretamente
+        self.biblioteca.desativar_metricas()
+        self.assertFalse(self.biblioteca.metricas_ativas)
+        self.assertFalse(any(callable(valor) for valor in vars(self.biblioteca).values()))
+        self.biblioteca.buscar_livros("titulo", "duna")
+        self.assertEqual(metricas.resumo()['buscar_livros']['chamadas'], 10)
+
+        self.assertIs(self.biblioteca.ativar_metricas(), metricas)
+        metricas.zerar()
+        self.assertEqual(metricas.resumo(), {})
+        self.biblioteca.gerar_relatorio()
+        self.assertEqual(list(metricas.resumo()), ['gerar_relatorio'])
+
+        print("✅ Coleta de métricas funcionando corretamente")
+
+    def test_exportacao(self):
+        "Testa os formatos JSON e Prometheus"
+        print("\n🧪 Testando exportação de métricas...")
+
+        metricas = Metricas()
+        for duracao_ns in (500, 3000, 3000, 50_000, 2_000_000):
+            metricas.registrar('operacao', duracao_ns)
+        metricas.registrar('operacao', 1_000, erro=True)
+
+        dados = json.loads(metricas.para_json())
+        self.assertEqual(dados['operacao']['chamadas'], 6)
+        self.assertEqual(dados['operacao']['erros'], 1)
+        self.assertAlmostEqual(dados['operacao']['total_ms'], 2.0575)
+        self.assertTrue(2.048 / 2 <= dados['operacao']['p99_ms'] <= 2.097152)
+
+        texto = metricas.para_prometheus()
+        linhas = texto.splitlines()
+        self.assertIn('# TYPE biblioteca_operacao_segundos histogram', linhas)
+        self.assertIn('biblioteca_operacao_segundos_bucket{operacao="operacao",le="1.024e-06"} 2', linhas)
+        self.assertIn('biblioteca_operacao_segundos_bucket{operacao="operacao",le="4.096e-06"} 4', linhas)
+        self.assertIn('biblioteca_operacao_segundos_bucket{operacao="operacao",le="+Inf"} 6', linhas)
+        self.assertIn('biblioteca_operacao_segundos_count{operacao="operacao"} 6', linhas)
+        self.assertIn('biblioteca_operacao_erros_total{operacao="operacao"} 1', linhas)
+
+        print("✅ Exportação de métricas funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
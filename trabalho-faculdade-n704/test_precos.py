@@ -0,0 +1,88 @@
+"Testes para a tabela de preços do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import tracemalloc
+import unittest
+from unittest import mock
+from benchmark import gerar_catalogo
+from biblioteca import Biblioteca, criar_funcao_desconto
+from precos import DescontoPercentual, DescontoPorFaixas, LivroComPreco, TabelaPrecos
+
+
+class TestPrecos(unittest.TestCase):
+    "Classe de testes para preços em coluna, regras de desconto e visões"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.biblioteca = Biblioteca()
+        self.biblioteca.cadastrar_livros_em_lote(gerar_catalogo(1000, semente=9))
+        self.tabela = TabelaPrecos()
+        self.tabela.definir_lote((livro['id'], 20.0 + livro['id'] % 200) for livro in self.biblioteca.livros)
+
+    def test_regras_de_desconto(self):
+        "Testa desconto percentual e por faixas sobre a coluna inteira"
+        print("\n🧪 Testando regras de desconto...")
+
+        self.assertEqual(self.tabela.preco(10), 30.0)
+        self.assertIsNone(self.tabela.preco(5000))
+        self.assertNotIn(0, self.tabela)
+        with self.assertRaises(ValueError):
+            self.tabela.definir(-1, 5.0)
+        self.assertEqual(self.tabela.preco(1000), 20.0)
+
+        promocao = self.tabela.com_desconto(DescontoPercentual(0.1))
+        self.assertAlmostEqual(promocao.preco(10), 27.0)
+        self.assertEqual(self.tabela.preco(10), 30.0)
+        self.assertIsNone(promocao.preco(0))
+
+        faixas = DescontoPorFaixas([(50, 0.1), (100, 0.3)])
+        self.tabela.aplicar_desconto(faixas)
+        self.assertEqual(self.tabela.preco(10), 30.0)
+        self.assertAlmostEqual(self.tabela.preco(40), 54.0)
+        self.assertAlmostEqual(self.tabela.preco(100), 84.0)
+        self.assertEqual(list(self.tabela.precos_de([10, 100])), [30.0, self.tabela.preco(100)])
+
+        # Com ou sem NumPy, as regras dão a mesma coluna (NaN continua marcando livro sem preço)
+        for regra in (DescontoPercentual(0.15), faixas):
+            with mock.patch('precos.numpy', None):
+                sem_numpy = self.tabela.com_desconto(regra).precos
+            com_numpy = self.tabela.com_desconto(regra).precos
+            self.assertEqual(len(com_numpy), len(sem_numpy))
+            self.assertTrue(all(a == b or a != a and b != b for a, b in zip(com_numpy, sem_numpy)))
+            self.assertEqual(len(TabelaPrecos().com_desconto(regra).precos), 0)
+
+        print("✅ Regras de desconto funcionando corretamente")
+
+    def test_visoes_sem_copia(self):
+        "Testa as visões de livro com preço e o uso de memória de um reajuste"
+        print("\n🧪 Testando visões de preço...")
+
+        livro = self.biblioteca.livros[0]
+        visao = next(self.tabela.visoes([livro]))
+        self.assertIsInstance(visao, LivroComPreco)
+        self.assertIs(visao.livro, livro)
+        self.assertEqual(visao['titulo'], livro['titulo'])
+        self.assertEqual(dict(visao), {**livro, 'preco': 21.0})
+        self.assertNotIn('preco', livro)
+
+        com_desconto = criar_funcao_desconto(0.5)(visao)
+        self.assertEqual(com_desconto['preco'], 10.5)
+        self.assertIs(com_desconto.livro, livro)
+        sem_preco = criar_funcao_desconto(0.5)(livro)
+        self.assertEqual(sem_preco, livro)
+        sem_preco['titulo'] = "Outro"
+        self.assertNotEqual(livro['titulo'], "Outro")
+        with self.assertRaises(TypeError):
+            com_desconto['titulo'] = "Outro"
+
+        # Reajustar o acervo inteiro aloca só a coluna nova, não um dicionário por livro
+        tracemalloc.start()
+        self.tabela.aplicar_desconto(DescontoPercentual(0.2))
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertLess(pico, 16 * len(self.biblioteca.livros) + 4096)
+
+        print("✅ Visões de preço funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"Testes para o armazenamento segmentado do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from biblioteca import Biblioteca, converter_arquivo
+from segmentos import MANIFESTO, criar_armazem
+
+
+class TestSegmentos(unittest.TestCase):
+    "Classe de testes para salvamento incremental, compressão e troca atômica do manifesto"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.armazem = os.path.join(self.pasta.name, 'biblioteca.seg')
+        self.biblioteca = Biblioteca()
+        self.biblioteca.cadastrar_livros_em_lote(
+            (f"Livro {numero}", f"Autor {numero % 7}", 1900 + numero, f"Categoria {numero % 3}")
+            for numero in range(95))
+        for livro_id in (3, 25, 47):
+            self.biblioteca.emprestar_livro(livro_id, "Ana")
+        self.biblioteca.devolver_livro(1)
+
+    def tearDown(self):
+        """Limpeza após cada teste"""
+        self.pasta.cleanup()
+
+    def _manifesto(self):
+        with open(os.path.join(self.armazem, MANIFESTO), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _arquivos(self, secao):
+        manifesto = self._manifesto()
+        return {numero: entrada['arquivo'] for numero, entrada in manifesto['segmentos'][secao].items()}
+
+    def test_salvamento_incremental(self):
+        "Testa que salvar regrava só os segmentos tocados e que os dados voltam iguais"
+        print("\n🧪 Testando salvamento segmentado incremental...")
+
+        criar_armazem(self.armazem, compressao='lzma', tamanho_segmento=10)
+        self.biblioteca.salvar_dados(self.armazem)
+        livros_antes, emprestimos_antes = self._arquivos('livros'), self._arquivos('emprestimos')
+        self.assertEqual(len(livros_antes), 10)
+        self.assertTrue(all(nome.endswith('.json.xz') for nome in livros_antes.values()))
+
+        # Empréstimo do livro 52 (segmento 5), devolução do livro 25 (segmento 2) e um livro novo (segmento 9)
+        self.biblioteca.emprestar_livro(52, "Bia")
+        self.biblioteca.devolver_livro(2)
+        self.biblioteca.cadastrar_livro("Novo", "Autor", 2024, "Contos")
+        self.biblioteca.salvar_dados(self.armazem)
+        livros_depois = self._arquivos('livros')
+        alterados = {numero for numero in livros_antes if livros_antes[numero] != livros_depois[numero]}
+        self.assertEqual(alterados, {'2', '5', '9'})
+        self.assertNotEqual(self._arquivos('emprestimos'), emprestimos_antes)
+
+        # Segmentos substituídos são apagados; sem alterações, nada além do manifesto é regravado
+        em_uso = set(livros_depois.values()) | set(self._arquivos('emprestimos').values())
+        self.assertEqual(set(os.listdir(self.armazem)), em_uso | {MANIFESTO})
+        self.assertLess(self.biblioteca._salvar_segmentado(self.armazem), 2500)
+
+        outra = Biblioteca()
+        outra.carregar_dados(self.armazem)
+        self.assertEqual(outra.livros, self.biblioteca.livros)
+        self.assertEqual(outra.emprestimos, self.biblioteca.emprestimos)
+        self.assertEqual(outra.contador_id, 97)
+        self.assertFalse(outra._obter_livro(52)['disponivel'])
+
+        # Alterações feitas direto no registro também marcam o segmento, na instância que salvou e na que carregou
+        self.biblioteca.livros[5]['titulo'] = "Alterado"
+        self.biblioteca.livros[80]['preco'] = 30.0
+        self.biblioteca.salvar_dados(self.armazem)
+        outra = Biblioteca()
+        outra.carregar_dados(self.armazem)
+        self.assertEqual(outra.livros[5]['titulo'], "Alterado")
+        self.assertEqual(outra.livros[80]['preco'], 30.0)
+        del outra.livros[80]['preco']
+        outra.livros[6]['ano'] = 2001
+        outra.salvar_dados(self.armazem)
+        reaberta = Biblioteca()
+        reaberta.carregar_dados(self.armazem)
+        self.assertEqual(reaberta.livros, outra.livros)
+        self.assertNotIn('preco', reaberta.livros[80])
+        self.assertEqual(reaberta.livros[6]['ano'], 2001)
+        self.biblioteca.carregar_dados(self.armazem)
+
+        # Outra instância que salvou por último invalida a sincronia desta: a próxima gravação é completa
+        outra.emprestar_livro(60, "Caio")
+        outra.salvar_dados(self.armazem)
+        self.biblioteca.emprestar_livro(61, "Dora")
+        self.biblioteca.salvar_dados(self.armazem)
+        terceira = Biblioteca()
+        terceira.carregar_dados(self.armazem)
+        self.assertEqual(terceira.emprestimos, self.biblioteca.emprestimos)
+        self.assertTrue(terceira._obter_livro(60)['disponivel'])
+
+        print("✅ Salvamento segmentado incremental funcionando corretamente")
+
+    def test_falha_no_meio_e_corrupcao(self):
+        "Testa que uma falha antes da troca do manifesto preserva o armazenamento e que o checksum é conferido"
+        print("\n🧪 Testando falha ao salvar e segmento corrompido...")
+
+        self.biblioteca.salvar_dados(self.armazem)
+        manifesto = self._manifesto()
+        self.assertEqual(manifesto['compressao'], 'zlib')
+
+        self.biblioteca.emprestar_livro(10, "Bia")
+        replace = os.replace
+
+        def falhar_no_manifesto(origem, destino):
+            if destino.endswith(MANIFESTO):
+                raise OSError("queda de energia")
+            replace(origem, destino)
+
+        with mock.patch('segmentos.os.replace', side_effect=falhar_no_manifesto):
+            with self.assertRaises(OSError):
+                self.biblioteca.salvar_dados(self.armazem)
+        self.assertEqual(self._manifesto(), manifesto)
+        anterior = Biblioteca()
+        anterior.carregar_dados(self.armazem)
+        self.assertTrue(anterior._obter_livro(10)['disponivel'])
+
+        # A tentativa seguinte completa o salvamento e apaga as sobras da interrompida
+        self.biblioteca.salvar_dados(self.armazem)
+        reaberta = Biblioteca()
+        reaberta.carregar_dados(self.armazem)
+        self.assertFalse(reaberta._obter_livro(10)['disponivel'])
+        self.assertEqual(len(os.listdir(self.armazem)), 1 + sum(len(self._arquivos(s)) for s in ('livros', 'emprestimos')))
+
+        # Conversão para JSON
+        json_destino = os.path.join(self.pasta.name, 'volta.json')
+        converter_arquivo(self.armazem, json_destino)
+        de_json = Biblioteca()
+        de_json.carregar_dados(json_destino)
+        self.assertEqual(de_json.livros, self.biblioteca.livros)
+
+        caminho = os.path.join(self.armazem, self._arquivos('livros')['0'])
+        with open(caminho, 'r+b') as f:
+            f.seek(10)
+            f.write(b'\0\0')
+        with self.assertRaises(ValueError):
+            Biblioteca().carregar_dados(self.armazem)
+        with self.assertRaises(FileExistsError):
+            criar_armazem(self.armazem)
+
+        print("✅ Falha ao salvar e segmento corrompido funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
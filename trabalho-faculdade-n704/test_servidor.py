@@ -0,0 +1,117 @@
+"Testes para o serviço HTTP do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import asyncio
+import threading
+import unittest
+from biblioteca import Biblioteca
+from servidor import LIMITE_BUSCA, ClienteBiblioteca, ServidorBiblioteca, executar_carga
+
+
+class TestServidor(unittest.TestCase):
+    "Classe de testes para o servidor assíncrono"
+
+    def executar(self, corrotina):
+        return asyncio.run(corrotina)
+
+    def test_rotas(self):
+        "Testa cadastro, busca, empréstimo, devolução e relatório pela rede"
+        print("\n🧪 Testando rotas do servidor...")
+
+        async def cenario():
+            servidor = ServidorBiblioteca(Biblioteca(concorrente=True), porta=0)
+            porta = await servidor.iniciar()
+            cliente = ClienteBiblioteca(porta=porta)
+            try:
+                status, livro = await cliente.requisitar('POST', '/livros', {
+                    'titulo': "Dom Casmurro", 'autor': "Machado de Assis", 'ano': 1899,
+                    'categoria': "Literatura Brasileira"})
+                self.assertEqual(status, 201)
+                self.assertEqual(livro['id'], 1)
+
+                # A mesma conexão atende todas as requisições seguintes
+                status, encontrados = await cliente.requisitar('GET', '/livros?criterio=autor&valor=machado')
+                self.assertEqual((status, len(encontrados)), (200, 1))
+                status, encontrados = await cliente.requisitar('GET', '/livros?categoria=Literatura%20Brasileira')
+                self.assertEqual((status, len(encontrados)), (200, 1))
+
+                status, emprestimo = await cliente.requisitar('POST', '/emprestimos',
+                                                              {'livro_id': 1, 'pessoa': "João Silva"})
+                self.assertEqual(status, 201)
+                status, erro = await cliente.requisitar('POST', '/emprestimos', {'livro_id': 1, 'pessoa': "Ana"})
+                self.assertEqual(status, 409)
+                self.assertIn('erro', erro)
+                status, _ = await cliente.requisitar('POST', '/emprestimos', {'livro_id': 99, 'pessoa': "Ana"})
+                self.assertEqual(status, 404)
+
+                status, relatorio = await cliente.requisitar('GET', '/relatorio')
+                self.assertEqual((status, relatorio['livros_emprestados']), (200, 1))
+                status, devolucao = await cliente.requisitar('POST', f"/emprestimos/{emprestimo['id']}/devolucao")
+                self.assertEqual((status, devolucao['devolvido']), (200, True))
+                status, estatisticas = await cliente.requisitar('GET', '/estatisticas')
+                self.assertEqual((status, estatisticas['total']), (200, 1))
+
+                status, _ = await cliente.requisitar('POST', '/livros', {'titulo': "Sem autor"})
+                self.assertEqual(status, 400)
+                status, _ = await ClienteBiblioteca(porta=porta).requisitar('GET', '/inexistente')
+                self.assertEqual(status, 404)
+
+                # Content-Length negativo é recusado com 400 em vez de derrubar a conexão
+                leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+                escritor.write(b"POST /livros HTTP/1.1\r\nContent-Length: -5\r\n\r\n")
+                resposta = await leitor.read()
+                escritor.close()
+                self.assertTrue(resposta.startswith(b"HTTP/1.1 400"))
+            finally:
+                await cliente.fechar()
+                await servidor.parar()
+
+        self.executar(cenario())
+        print("✅ Rotas do servidor funcionando corretamente")
+
+    def test_carga(self):
+        "Testa o cliente de carga contra o servidor com várias conexões simultâneas"
+        print("\n🧪 Testando cliente de carga...")
+
+        async def cenario():
+            biblioteca = Biblioteca(concorrente=True)
+            for i in range(1, 1001):
+                biblioteca.cadastrar_livro(f"Livro do mar {i}", f"Autor {i % 37}", 1900 + i % 120, "Ficção")
+            servidor = ServidorBiblioteca(biblioteca, porta=0, max_requisicoes=4)
+            porta = await servidor.iniciar()
+            try:
+                resultado = await executar_carga(porta=porta, conexoes=8, duracao=0.5, fracao_relatorio=0.05)
+
+                # Sem limite, a busca devolve no máximo LIMITE_BUSCA; qualquer busca sai do laço de eventos
+                threads = []
+                buscar_livros = biblioteca.buscar_livros
+                biblioteca.buscar_livros = lambda *argumentos: threads.append(threading.get_ident()) or buscar_livros(*argumentos)
+                cliente = ClienteBiblioteca(porta=porta)
+                status, encontrados = await cliente.requisitar('GET', '/livros?valor=mar')
+                self.assertEqual((status, len(encontrados)), (200, LIMITE_BUSCA))
+                status, encontrados = await cliente.requisitar('GET', '/livros?valor=mar&limite=5')
+                self.assertEqual((status, len(encontrados)), (200, 5))
+                self.assertEqual(len(threads), 2)
+                self.assertNotIn(threading.get_ident(), threads)
+                status, encontrados = await cliente.requisitar('GET', '/livros?valor=mar&limite=500')
+                self.assertEqual((status, len(encontrados)), (200, 500))
+                status, encontrados = await cliente.requisitar('GET', '/livros?categoria=Fic%C3%A7%C3%A3o&limite=1000')
+                self.assertEqual((status, len(encontrados)), (200, 1000))
+                status, _ = await cliente.requisitar('GET', '/livros?valor=mar&limite=0')
+                self.assertEqual(status, 400)
+                await cliente.fechar()
+            finally:
+                await servidor.parar()
+            return biblioteca, resultado
+
+        biblioteca, resultado = self.executar(cenario())
+        self.assertGreater(resultado['requisicoes_por_segundo'], 0)
+        self.assertTrue(set(resultado['status']) <= {'200', '201', '409'})
+        relatorio = biblioteca.gerar_relatorio()
+        self.assertEqual(relatorio['livros_emprestados'],
+                         sum(1 for e in biblioteca.emprestimos if not e['devolvido']))
+
+        print("✅ Cliente de carga funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()
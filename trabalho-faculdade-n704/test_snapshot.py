@@ -0,0 +1,126 @@
+"Testes para o snapshot binário do Sistema de Gerenciamento de Biblioteca Pessoal"
+
+import json
+import os
+import tempfile
+import unittest
+from biblioteca import Biblioteca, converter_arquivo
+from snapshot import RegistrosMapeados, main
+
+
+class TestSnapshot(unittest.TestCase):
+    "Classe de testes para gravação, abertura preguiçosa e conversão do snapshot binário"
+
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.pasta = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.pasta.name, 'biblioteca.bin')
+        self.biblioteca = Biblioteca()
+        self.biblioteca.cadastrar_livros_em_lote(
+            (f"Livro {numero}", f"Autor {numero % 7}", 1900 + numero, "Romance" if numero % 2 else "Poesia")
+            for numero in range(50))
+        self.biblioteca.cadastrar_livro("Ficção e Realidade", "Conceição", 1990, "Ensaios")
+        emprestimo = self.biblioteca.emprestar_livro(3, "Ana")
+        self.biblioteca.emprestar_livro(4, "Bia")
+        self.biblioteca.devolver_livro(emprestimo['id'])
+        self.biblioteca.livros[0]['preco'] = 42.5
+
+    def tearDown(self):
+        """Limpeza após cada teste"""
+        self.pasta.cleanup()
+
+    def test_abertura_preguicosa(self):
+        "Testa que abrir não decodifica nada e que os registros voltam iguais"
+        print("\n🧪 Testando snapshot binário...")
+
+        self.biblioteca.salvar_dados(self.arquivo)
+        outra = Biblioteca()
+        outra.carregar_dados(self.arquivo)
+        self.assertIsInstance(outra.livros, RegistrosMapeados)
+        self.assertEqual(outra.livros.decodificados, 0)
+        self.assertEqual(len(outra.livros), 51)
+        self.assertEqual(outra.contador_id, self.biblioteca.contador_id)
+        # O filtro por coluna lê os ids do mapa e não guarda os registros que decodifica
+        pares = list(outra.livros.onde('id', lambda livro_id: livro_id % 2 == 0))
+        self.assertEqual([livro['id'] for livro in pares], list(range(2, 52, 2)))
+        self.assertEqual(outra.livros.decodificados, 0)
+
+        # Empréstimo e devolução só decodificam o que tocam; os índices ainda não existem
+        emprestimo = outra.emprestar_livro(10, "Caio")
+        self.assertEqual(emprestimo['id'], 3)
+        outra.devolver_livro(2)
+        self.assertEqual(outra.livros.decodificados, 2)
+        self.assertFalse(outra._indices_prontos)
+
+        self.assertEqual(outra.livros[-1]['titulo'], "Ficção e Realidade")
+        self.assertEqual(outra.livros[0]['preco'], 42.5)
+        self.assertNotIn('data_devolucao', outra.emprestimos[2])
+        self.assertTrue(outra.emprestimos[1]['devolvido'])
+
+        # A primeira busca monta os índices a partir do que já foi alterado
+        self.assertEqual([l['id'] for l in outra.buscar_livros("titulo", "ficcao")], [51])
+        self.assertTrue(outra._indices_prontos)
+        relatorio = outra.gerar_relatorio()
+        self.assertEqual((relatorio['livros_disponiveis'], relatorio['livros_emprestados']), (50, 1))
+
+        # Lote inválido é desfeito sem tocar no que veio do arquivo
+        with self.assertRaises(ValueError):
+            outra.cadastrar_livros_em_lote([("A", "B", 2000, "C"), ("D", "E", "ano?", "F")])
+        self.assertEqual(len(outra.livros), 51)
+        outra.cadastrar_livro("Novo", "Autor", 2024, "Contos")
+
+        outra.salvar_dados(self.arquivo)
+        terceira = Biblioteca()
+        terceira.carregar_dados(self.arquivo)
+        self.assertEqual(terceira.livros, outra.livros)
+        self.assertEqual(terceira.emprestimos, outra.emprestimos)
+
+        print("✅ Snapshot binário funcionando corretamente")
+
+    def test_diario_e_conversao(self):
+        "Testa o diário sobre o snapshot binário e a conversão de e para JSON"
+        print("\n🧪 Testando diário e conversão do snapshot binário...")
+
+        json_original = os.path.join(self.pasta.name, 'biblioteca.json')
+        self.biblioteca.ativar_diario(json_original)
+        self.biblioteca.salvar_dados(json_original)
+        self.biblioteca.cadastrar_livro("Só no diário", "Autor", 2020, "Contos")
+        self.biblioteca.desativar_diario()
+
+        # A conversão leva junto o que ainda estava só no diário da origem
+        converter_arquivo(json_original, self.arquivo)
+        volta = os.path.join(self.pasta.name, 'volta.json')
+        main([self.arquivo, volta])
+        with open(volta, encoding='utf-8') as f:
+            dados = json.load(f)
+        self.assertEqual(dados['livros'], [dict(livro) for livro in self.biblioteca.livros])
+        self.assertEqual(dados['emprestimos'], [dict(e) for e in self.biblioteca.emprestimos])
+        with self.assertRaises(FileNotFoundError):
+            converter_arquivo(os.path.join(self.pasta.name, 'nao_existe.json'), self.arquivo)
+
+        # Alterações feitas sobre o binário vão para o diário e voltam na próxima abertura
+        sessao = Biblioteca()
+        sessao.ativar_diario(self.arquivo)
+        sessao.carregar_dados(self.arquivo)
+        sessao.emprestar_livro(52, "Dora")
+        sessao.desativar_diario()
+
+        reaberta = Biblioteca()
+        reaberta.ativar_diario(self.arquivo)
+        reaberta.carregar_dados(self.arquivo)
+        self.assertFalse(reaberta._obter_livro(52)['disponivel'])
+        self.assertEqual(len(reaberta.emprestimos), 3)
+        reaberta.compactar_diario()
+        self.assertEqual(os.path.getsize(reaberta.caminho_diario), 0)
+        reaberta.desativar_diario()
+
+        with open(self.arquivo, 'wb') as f:
+            f.write(b'{"livros": []}')
+        with self.assertRaises(ValueError):
+            Biblioteca().carregar_dados(self.arquivo)
+
+        print("✅ Diário e conversão do snapshot binário funcionando corretamente")
+
+
+if __name__ == "__main__":
+    unittest.main()